@@ -0,0 +1,264 @@
+"""
+Invoice Archive
+Sharded folder layout for rendered invoice PDFs, with a manifest index.
+Invoices are filed by year/month of their date, or by a hash of their number,
+so no folder grows without bound; the manifest (SQLite, keyed by invoice
+number) records where each PDF is, with its size and SHA-256. Looking an
+invoice up never lists a folder, which keeps it fast at millions of invoices.
+"""
+
+import os
+import re
+import shutil
+import hashlib
+import sqlite3
+import logging
+import datetime
+import threading
+
+log = logging.getLogger("invoice_app.archive")
+
+LAYOUTS = ("month", "hash")
+NUMBER_DIGITS = 6 # invoice numbers in file names are zero-padded to at least this width
+MIGRATE_BATCH = 1000 # files moved per manifest transaction
+FILE_NAME = re.compile(r"Invoice_(\d+)\.pdf$", re.IGNORECASE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS manifest (
+    invoice_no  INTEGER PRIMARY KEY,
+    path        TEXT NOT NULL,       -- relative to the archive folder, '/' separated (absolute if outside it)
+    size        INTEGER NOT NULL,
+    sha256      TEXT NOT NULL,
+    stored_at   TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+MANIFEST_COLUMNS = ("invoice_no", "path", "size", "sha256", "stored_at")
+
+def invoice_filename(invoice_no):
+    return f"Invoice_{invoice_no:0{NUMBER_DIGITS}d}.pdf"
+
+def invoice_number_from_name(name):
+    """Invoice number in an Invoice_NNNN.pdf file name (any padding), or None"""
+    m = FILE_NAME.fullmatch(name)
+    return int(m.group(1)) if m else None
+
+def file_digest(path):
+    """(size, SHA-256 hex) of a file, read in 1 MB blocks"""
+    h = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+            size += len(block)
+    return size, h.hexdigest()
+
+class InvoiceArchive:
+    """Sharded store of invoice PDFs plus their manifest. Thread-safe; several processes may share it."""
+
+    def __init__(self, root, layout="month"):
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown archive layout '{layout}' (choose from {', '.join(LAYOUTS)})")
+        self.root = root
+        self.layout = layout
+        self._known_dirs = set() # shard folders already created by this process
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(root, "manifest.db"), timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    # --- Layout ---
+
+    def shard(self, invoice_no, date_str=None):
+        """Sub-folder an invoice is filed under: "YYYY/MM" (or "undated"), or two levels of a hash of its number"""
+        if self.layout == "hash":
+            h = hashlib.sha1(str(invoice_no).encode()).hexdigest()
+            return f"{h[:2]}/{h[2:4]}"
+        m = re.match(r"(\d{4})-(\d{2})-\d{2}", date_str or "")
+        return f"{m.group(1)}/{m.group(2)}" if m else "undated"
+
+    def path_for(self, invoice_no, date_str=None, create=True):
+        """Where a new invoice's PDF goes; its folder is created unless create is False"""
+        folder = os.path.join(self.root, *self.shard(invoice_no, date_str).split("/"))
+        if create and folder not in self._known_dirs:
+            os.makedirs(folder, exist_ok=True)
+            self._known_dirs.add(folder)
+        return os.path.join(folder, invoice_filename(invoice_no))
+
+    def _relative(self, path):
+        rel = os.path.relpath(os.path.abspath(path), os.path.abspath(self.root))
+        if rel.startswith(os.pardir):
+            return os.path.abspath(path)
+        return rel.replace(os.sep, "/")
+
+    def _absolute(self, stored):
+        return stored if os.path.isabs(stored) else os.path.join(self.root, *stored.split("/"))
+
+    # --- Manifest ---
+
+    def add(self, invoice_no, path):
+        """Records (or updates) where an invoice's PDF is, with its size and checksum"""
+        size, digest = file_digest(path)
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO manifest (invoice_no, path, size, sha256) VALUES (?,?,?,?)",
+                              (invoice_no, self._relative(path), size, digest))
+
+    def _add_many(self, entries):
+        """Records many (invoice_no, path, size, sha256) entries in one transaction"""
+        with self._lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO manifest (invoice_no, path, size, sha256) VALUES (?,?,?,?)",
+                                  [(no, self._relative(path), size, digest) for no, path, size, digest in entries])
+
+    def refresh(self, path):
+        """Updates the size and checksum of a manifest entry after its file was rewritten in place"""
+        no = invoice_number_from_name(os.path.basename(path))
+        entry = self.get(no) if no is not None else None
+        if entry is not None and os.path.abspath(entry["path"]) == os.path.abspath(path):
+            self.add(no, path)
+
+    def get(self, invoice_no):
+        """Manifest entry as a dict (with an absolute path), or None"""
+        with self._lock:
+            row = self.conn.execute(f"SELECT {', '.join(MANIFEST_COLUMNS)} FROM manifest WHERE invoice_no = ?",
+                                    (invoice_no,)).fetchone()
+        if row is None:
+            return None
+        entry = dict(zip(MANIFEST_COLUMNS, row))
+        entry["path"] = self._absolute(entry["path"])
+        return entry
+
+    def find(self, invoice_no):
+        """Path of an invoice's PDF if it is archived and still on disk, else None"""
+        entry = self.get(invoice_no)
+        return entry["path"] if entry and os.path.exists(entry["path"]) else None
+
+    def last_invoice_no(self):
+        with self._lock:
+            row = self.conn.execute("SELECT MAX(invoice_no) FROM manifest").fetchone()
+        return row[0] or 0
+
+    def stats(self):
+        with self._lock:
+            count, size = self.conn.execute("SELECT COUNT(*), TOTAL(size) FROM manifest").fetchone()
+        return {"entries": count, "bytes": int(size), "layout": self.layout, "root": self.root}
+
+    def iter_entries(self, invoice_from=None, invoice_to=None, page_size=10_000):
+        """Yields manifest entries in invoice order, a page at a time"""
+        lo = invoice_from if invoice_from is not None else -1
+        hi = invoice_to if invoice_to is not None else (1 << 62)
+        while True:
+            with self._lock:
+                rows = self.conn.execute(f"SELECT {', '.join(MANIFEST_COLUMNS)} FROM manifest"
+                                         " WHERE invoice_no >= ? AND invoice_no <= ? ORDER BY invoice_no LIMIT ?",
+                                         (lo, hi, page_size)).fetchall()
+            for row in rows:
+                entry = dict(zip(MANIFEST_COLUMNS, row))
+                entry["path"] = self._absolute(entry["path"])
+                yield entry
+            if len(rows) < page_size:
+                return
+            lo = rows[-1][0] + 1
+
+    # --- Maintenance ---
+
+    def verify(self, checksums=False, invoice_from=None, invoice_to=None):
+        """Checks every entry's file exists with the recorded size (and checksum); returns [(invoice_no, problem)]"""
+        problems = []
+        for entry in self.iter_entries(invoice_from, invoice_to):
+            try:
+                if checksums:
+                    size, digest = file_digest(entry["path"])
+                else:
+                    size, digest = os.path.getsize(entry["path"]), entry["sha256"]
+            except OSError:
+                problems.append((entry["invoice_no"], "missing"))
+                continue
+            if size != entry["size"]:
+                problems.append((entry["invoice_no"], f"size {size}, expected {entry['size']}"))
+            elif digest != entry["sha256"]:
+                problems.append((entry["invoice_no"], "checksum mismatch"))
+        return problems
+
+    def migrate(self, source_dir, dates=None, copy=False, dry_run=False, on_batch=None):
+        """Moves flat Invoice_NNNN.pdf files from source_dir into the sharded layout.
+
+        dates(invoice_nos) returns {invoice_no: "YYYY-MM-DD"} for the month
+        layout; invoices it does not know are filed by the file's modification
+        date. Files are moved (or copied) and recorded MIGRATE_BATCH at a time,
+        and on_batch([(invoice_no, new_path), ...]) is called after each batch.
+        A file whose target already exists is left where it is and reported as
+        a conflict. If a migration is interrupted, run it again and then
+        rebuild() to index the last batch. Returns {"moved", "bytes", "conflicts"}.
+        """
+        stats = {"moved": 0, "bytes": 0, "conflicts": []}
+
+        def flush(batch):
+            known = dates([no for no, _ in batch]) if dates and self.layout == "month" else {}
+            done = []
+            for no, entry in batch:
+                date_str = known.get(no)
+                if date_str is None and self.layout == "month":
+                    date_str = datetime.date.fromtimestamp(entry.stat().st_mtime).isoformat()
+                target = self.path_for(no, date_str, create=not dry_run)
+                if os.path.exists(target):
+                    log.warning("Not migrating %s: %s already exists", entry.path, target)
+                    stats["conflicts"].append((no, entry.path))
+                    continue
+                stats["moved"] += 1
+                if dry_run:
+                    stats["bytes"] += entry.stat().st_size
+                    continue
+                if copy:
+                    shutil.copy2(entry.path, target)
+                else:
+                    os.replace(entry.path, target)
+                size, digest = file_digest(target)
+                stats["bytes"] += size
+                done.append((no, target, size, digest))
+            if done:
+                self._add_many(done)
+                if on_batch is not None:
+                    on_batch([(no, path) for no, path, _, _ in done])
+
+        batch = []
+        with os.scandir(source_dir) as it:
+            for entry in it:
+                no = invoice_number_from_name(entry.name)
+                if no is None or not entry.is_file():
+                    continue
+                batch.append((no, entry))
+                if len(batch) >= MIGRATE_BATCH:
+                    flush(batch)
+                    batch = []
+        if batch:
+            flush(batch)
+        return stats
+
+    def rebuild(self):
+        """Re-indexes every Invoice_NNNN.pdf under the archive folder; returns the number of entries added"""
+        added = 0
+        batch = []
+        for folder, dirs, files in os.walk(self.root):
+            for name in files:
+                no = invoice_number_from_name(name)
+                if no is None:
+                    continue
+                path = os.path.join(folder, name)
+                entry = self.get(no)
+                if entry is not None and os.path.abspath(entry["path"]) == os.path.abspath(path) \
+                        and os.path.getsize(path) == entry["size"]:
+                    continue
+                batch.append((no, path) + file_digest(path))
+                if len(batch) >= MIGRATE_BATCH:
+                    self._add_many(batch)
+                    added += len(batch)
+                    batch = []
+        self._add_many(batch)
+        return added + len(batch)
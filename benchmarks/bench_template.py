@@ -0,0 +1,66 @@
+"""
+Benchmark: shared InvoiceTemplate vs. rebuilding the layout on every render
+Rebuilding a fresh InvoiceTemplate per call is exactly what generate_pdf used
+to do (stylesheet, table styles and header flowables built from scratch).
+
+Usage: python benchmarks/bench_template.py [--invoices 200] [--items 10] [--repeat 5]
+"""
+
+import os
+import sys
+import time
+import argparse
+from io import BytesIO
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import invoice_app # noqa: E402
+
+def sample_invoice(n_items):
+    items = [{"desc": f"Service item {i}", "qty": i % 5 + 1, "unit_price": Decimal("149.50")} for i in range(n_items)]
+    subtotal, tax, total = invoice_app.compute_totals(items, 18.0)
+    return (1, "2026-01-31", invoice_app.DEFAULT_SELLER, "Sample Buyer\n42 Market Road", items,
+            subtotal, 18.0, tax, total, "Payment due in 30 days.")
+
+def time_renders(invoice, count, make_template):
+    start = time.process_time()
+    for _ in range(count):
+        invoice_app.generate_pdf(*invoice, pdf_path=BytesIO(), template=make_template())
+    return (time.process_time() - start) / count
+
+def time_setup(count):
+    start = time.process_time()
+    for _ in range(count):
+        invoice_app.InvoiceTemplate()
+    return (time.process_time() - start) / count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--invoices", type=int, default=200, help="renders per timing run (default: %(default)s)")
+    parser.add_argument("--items", type=int, default=10, help="line items per invoice (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5, help="A-B-B-A timing rounds (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    invoice = sample_invoice(args.items)
+    shared = invoice_app.InvoiceTemplate()
+    time_renders(invoice, 5, lambda: shared) # warm up imports and font caches
+
+    # Run the variants in A-B-B-A order so drift in machine load hits both equally
+    rebuilt, reused = [], []
+    for _ in range(args.repeat):
+        rebuilt.append(time_renders(invoice, args.invoices, invoice_app.InvoiceTemplate))
+        reused.append(time_renders(invoice, args.invoices, lambda: shared))
+        reused.append(time_renders(invoice, args.invoices, lambda: shared))
+        rebuilt.append(time_renders(invoice, args.invoices, invoice_app.InvoiceTemplate))
+    rebuilt, reused = sum(rebuilt) / len(rebuilt), sum(reused) / len(reused)
+    setup = min(time_setup(args.invoices) for _ in range(args.repeat))
+
+    print(f"{args.invoices} invoices x {args.items} items (CPU time, mean of {2*args.repeat} runs)")
+    print(f"  layout setup avoided      : {setup*1000:8.3f} ms/invoice")
+    print(f"  rebuild layout per render : {rebuilt*1000:8.2f} ms/invoice")
+    print(f"  shared InvoiceTemplate    : {reused*1000:8.2f} ms/invoice")
+    print(f"  saving                    : {(rebuilt-reused)*1000:8.2f} ms/invoice ({(1 - reused/rebuilt)*100:.1f}%)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,385 @@
+"""
+Benchmark suite for the rendering, ledger and preview hot paths
+Runs headless (no display needed) inside a scratch directory, so the real
+invoices/ folder and ledger are never touched.
+
+  generate_pdf      latency and peak Python memory for 1 to 10k line items, per engine,
+                    rendered from scratch and served from the render cache
+  ledger            next_invoice_number / allocate_invoice_numbers / save_invoice_record
+                    as the ledger grows (up to 1M rows by default)
+  rasterize         PyMuPDF page rasterisation as done by the preview window
+  reports           ledger snapshot build / incremental refresh and the full report set
+  money_fmt         MoneyFormat formatting and parsing throughput for float, Decimal, str
+                    and integer paise inputs, next to the currency_fmt/currency_to_float it replaced
+  output_profile    render time and PDF size per output profile (standard / rupee-glyph), per engine
+
+Every metric is "lower is better" (seconds or bytes), and results are written
+as JSON. Pass --baseline with an older results file to fail on regressions.
+
+Usage: python benchmarks/run_benchmarks.py [--quick] [--only generate_pdf,ledger]
+                                           [-o results.json] [--baseline old.json] [--tolerance 0.25]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+import statistics
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ITEM_COUNTS = (1, 10, 100, 1000, 10000)
+LEDGER_SIZES = (0, 10_000, 100_000, 1_000_000)
+QUICK_ITEM_COUNTS = (1, 10, 100, 1000)
+QUICK_LEDGER_SIZES = (0, 10_000, 100_000)
+
+invoice_app = None # imported by main() once we are inside the scratch directory
+
+# ---------- Measurement ----------
+def measure(fn, min_time=0.5, min_runs=3, max_runs=1000):
+    """Calls fn repeatedly and returns wall-clock stats in seconds"""
+    fn() # warm up
+    samples = []
+    start = time.perf_counter()
+    while len(samples) < max_runs and (len(samples) < min_runs or time.perf_counter() - start < min_time):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples)
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "value": statistics.median(samples),
+        "min": samples[0],
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "runs": len(samples),
+    }
+
+def peak_memory(fn):
+    """Peak bytes allocated by Python while fn runs (tracemalloc)"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def sample_items(n):
+    return [{"desc": f"Service item {i} - consulting hours", "qty": i % 7 + 1, "unit_price": Decimal(f"{100 + i % 900}.50")}
+            for i in range(n)]
+
+def sample_invoice(n_items, invoice_number=1):
+    items = sample_items(n_items)
+    subtotal, tax, total = invoice_app.compute_totals(items, 18.0)
+    return (invoice_number, "2026-01-31", invoice_app.DEFAULT_SELLER, "Sample Buyer\n42 Market Road\nPune", items,
+            subtotal, 18.0, tax, total, "Payment due in 30 days.")
+
+# ---------- Benchmarks ----------
+def bench_generate_pdf(results, args):
+    from io import BytesIO
+    for engine in invoice_app.TEMPLATE_ENGINES:
+        for n in args.item_counts:
+            invoice = sample_invoice(n)
+            render = lambda: invoice_app.generate_pdf(*invoice, pdf_path=BytesIO(), engine=engine, cache=False)
+            stats = measure(render, min_time=args.min_time, max_runs=200)
+            results[f"generate_pdf.latency[{engine},items={n}]"] = dict(stats, unit="s")
+            results[f"generate_pdf.peak_memory[{engine},items={n}]"] = {"value": peak_memory(render), "unit": "bytes"}
+            progress(f"generate_pdf {engine:8s} {n:6d} items: {stats['value']*1000:9.2f} ms")
+
+            cached = lambda: invoice_app.generate_pdf(*invoice, pdf_path=BytesIO(), engine=engine)
+            cached() # first call renders and stores
+            stats = measure(cached, min_time=args.min_time, max_runs=200)
+            results[f"generate_pdf.cached_latency[{engine},items={n}]"] = dict(stats, unit="s")
+            progress(f"generate_pdf {engine:8s} {n:6d} items: {stats['value']*1000:9.2f} ms from the render cache")
+
+def _seed_ledger(ledger, start, count, chunk=50_000):
+    """Bulk-inserts synthetic invoice rows (without line items) numbered from start"""
+    buyers = [f"Buyer {i:04d}" for i in range(2000)]
+    rng = random.Random(start)
+    for lo in range(start, start + count, chunk):
+        hi = min(lo + chunk, start + count)
+        rows = []
+        for no in range(lo, hi):
+            subtotal = rng.randrange(100, 10_000_000)
+            rows.append((no, f"2026-{no % 12 + 1:02d}-{no % 28 + 1:02d}", buyers[no % len(buyers)],
+                         subtotal, subtotal * 18 // 100, subtotal + subtotal * 18 // 100))
+        with ledger.conn:
+            ledger.conn.executemany(
+                "INSERT INTO invoices (invoice_no, date, buyer, subtotal_paise, tax_paise, total_paise) VALUES (?,?,?,?,?,?)",
+                rows)
+
+def bench_ledger(results, args):
+    ledger = invoice_app.get_ledger()
+    items = sample_items(5)
+    subtotal, tax, total = invoice_app.compute_totals(items, 18.0)
+    rows = 0
+    next_no = 1
+    for size in args.ledger_sizes:
+        if size > rows:
+            t0 = time.perf_counter()
+            _seed_ledger(ledger, next_no, size - rows)
+            progress(f"ledger seeded to {size} rows in {time.perf_counter() - t0:.1f}s")
+            next_no += size - rows
+            rows = size
+
+        # Cold: no sequence file yet, so the number comes from the ledger high-water mark
+        def cold_peek():
+            if os.path.exists(invoice_app.INVOICE_SEQ):
+                os.remove(invoice_app.INVOICE_SEQ)
+            invoice_app.next_invoice_number()
+        results[f"next_invoice_number.cold[rows={size}]"] = dict(measure(cold_peek, args.min_time), unit="s")
+        invoice_app.allocate_invoice_numbers(0) # writes the sequence file without reserving anything
+        results[f"next_invoice_number.warm[rows={size}]"] = dict(measure(invoice_app.next_invoice_number, args.min_time), unit="s")
+        results[f"allocate_invoice_numbers[rows={size}]"] = dict(
+            measure(invoice_app.allocate_invoice_numbers, args.min_time, max_runs=200), unit="s")
+
+        samples = []
+        next_no = max(next_no, invoice_app.next_invoice_number())
+        for _ in range(args.ledger_writes):
+            t0 = time.perf_counter()
+            invoice_app.save_invoice_record(next_no, "2026-01-31", "Benchmark Buyer", subtotal, tax, total, items=items,
+                                            buyer_address="42 Market Road", seller="Bench Seller", tax_percent=18.0)
+            samples.append(time.perf_counter() - t0)
+            next_no += 1
+        rows += args.ledger_writes
+        results[f"save_invoice_record[rows={size}]"] = dict(summarize(samples), unit="s")
+        progress(f"ledger {size:8d} rows: save {results[f'save_invoice_record[rows={size}]']['value']*1000:7.3f} ms,"
+                 f" next no (cold) {results[f'next_invoice_number.cold[rows={size}]']['value']*1000:7.3f} ms")
+        # Keep the next seed block clear of the numbers used by the writes above
+        if os.path.exists(invoice_app.INVOICE_SEQ):
+            os.remove(invoice_app.INVOICE_SEQ)
+
+def bench_rasterize(results, args):
+    import fitz
+    for n_items in (10, 200):
+        pdf_bytes = invoice_app.render_pdf_bytes(*sample_invoice(n_items))
+        results[f"preview.open[items={n_items}]"] = dict(
+            measure(lambda: fitz.open(stream=pdf_bytes, filetype="pdf").close(), args.min_time), unit="s")
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        try:
+            for zoom in (1.0, 2.0):
+                stats = measure(lambda: invoice_app.rasterize_page(doc, 0, zoom), args.min_time, max_runs=200)
+                results[f"preview.rasterize_page[items={n_items},zoom={zoom}]"] = dict(stats, unit="s")
+                progress(f"rasterize {n_items:4d} items zoom {zoom}: {stats['value']*1000:8.2f} ms")
+            all_pages = lambda: [invoice_app.rasterize_page(doc, p, 1.0) for p in range(doc.page_count)]
+            results[f"preview.rasterize_all[items={n_items},pages={doc.page_count}]"] = dict(
+                measure(all_pages, args.min_time, max_runs=50), unit="s")
+        finally:
+            doc.close()
+
+def bench_reports(results, args):
+    import reports
+    from ledger import Ledger
+    rows = max(args.ledger_sizes)
+    ledger = Ledger("reports_ledger.db")
+    try:
+        _seed_ledger(ledger, 1, rows)
+        def cold():
+            if os.path.exists("reports_snapshot.pkl"):
+                os.remove("reports_snapshot.pkl")
+            reports.LedgerSnapshot("reports_ledger.db", "reports_snapshot.pkl").refresh()
+        results[f"reports.snapshot_build[rows={rows}]"] = dict(measure(cold, args.min_time, max_runs=3), unit="s")
+        snapshot = reports.LedgerSnapshot("reports_ledger.db", "reports_snapshot.pkl")
+        results[f"reports.snapshot_reopen[rows={rows}]"] = dict(
+            measure(lambda: reports.LedgerSnapshot("reports_ledger.db", "reports_snapshot.pkl").refresh(), args.min_time, max_runs=10), unit="s")
+
+        next_no = [rows + 1]
+        def append_and_refresh():
+            _seed_ledger(ledger, next_no[0], 1000)
+            next_no[0] += 1000
+            t0 = time.perf_counter()
+            snapshot.refresh()
+            return time.perf_counter() - t0
+        snapshot.refresh()
+        samples = [append_and_refresh() for _ in range(5)]
+        results[f"reports.refresh_1000_new[rows={rows}]"] = dict(summarize(samples), unit="s")
+
+        df = snapshot.select("2026-01-01", "2026-12-31")
+        stats = measure(lambda: reports.build_report(df, as_of="2027-01-15"), args.min_time, max_runs=20)
+        results[f"reports.build_report[rows={rows}]"] = dict(stats, unit="s")
+        progress(f"reports {rows:8d} rows: build {results[f'reports.snapshot_build[rows={rows}]']['value']:.2f} s,"
+                 f" refresh +1000 {results[f'reports.refresh_1000_new[rows={rows}]']['value']*1000:.1f} ms,"
+                 f" report {stats['value']*1000:.1f} ms")
+    finally:
+        ledger.close()
+
+def bench_output_profile(results, args):
+    for engine in invoice_app.TEMPLATE_ENGINES:
+        for n in (20, max(args.item_counts[-1] // 10, 20)):
+            for profile, r in invoice_app.compare_profiles(items=n, runs=5, engine=engine).items():
+                results[f"output_profile.latency[{engine},{profile},items={n}]"] = {"value": r["ms"] / 1000, "unit": "s"}
+                results[f"output_profile.size[{engine},{profile},items={n}]"] = {"value": r["bytes"], "unit": "bytes"}
+                progress(f"output_profile {engine:8s} {profile:8s} {n:5d} items: {r['ms']:8.2f} ms {r['bytes']:9,d} bytes")
+
+# The formatters MoneyFormat replaced, kept as the baseline it is measured against
+def legacy_currency_fmt(x):
+    try:
+        if isinstance(x, str):
+            x = x.replace('₹', '').replace(',', '').strip()
+        if isinstance(x, Decimal):
+            return f"₹{x:,.2f}"
+        return f"₹{float(x):,.2f}"
+    except Exception:
+        return "₹0.00"
+
+def legacy_currency_to_float(x):
+    try:
+        if isinstance(x, str):
+            return float(x.replace('₹', '').replace(',', '').strip())
+        return float(x)
+    except Exception:
+        return 0.0
+
+def bench_money_fmt(results, args):
+    rng = random.Random(42)
+    floats = [rng.uniform(0, 10_000_000) for _ in range(args.fmt_values)]
+    money = invoice_app.MONEY
+    decimals = [Decimal(f"{x:.2f}") for x in floats]
+    paise = [money.to_paise(d) for d in decimals]
+    inputs = {"float": floats, "decimal": decimals, "str": money.format_many(decimals)}
+
+    def record(name, fn, n):
+        stats = measure(fn, args.min_time, min_runs=3, max_runs=20)
+        per_call = {k: (v / n if k != "runs" else v) for k, v in stats.items()}
+        results[name] = dict(per_call, unit="s")
+        return per_call["value"]
+
+    for kind, values in inputs.items():
+        old = record(f"money_fmt.legacy_per_call[{kind}]", lambda: [legacy_currency_fmt(v) for v in values], len(values))
+        new = record(f"money_fmt.per_call[{kind}]", lambda: [money.format(v) for v in values], len(values))
+        progress(f"money_fmt {kind:8s}: {1 / new:12,.0f} values/sec ({old / new:.1f}x currency_fmt)")
+    new = record("money_fmt.format_many[decimal]", lambda: money.format_many(decimals), len(decimals))
+    progress(f"money_fmt format_many:       {1 / new:12,.0f} values/sec")
+    new = record("money_fmt.format_paise_many", lambda: money.format_paise_many(paise), len(paise))
+    progress(f"money_fmt format_paise_many: {1 / new:12,.0f} values/sec")
+    # The money columns of an invoice's item table, as the renderers used to build them and as they do now
+    items = invoice_app.LineItems({"desc": f"Item {i}", "qty": rng.randint(1, 20), "unit_price": d}
+                                  for i, d in enumerate(decimals[:1000]))
+    old = record("money_fmt.legacy_item_columns", lambda: [(legacy_currency_fmt(invoice_app.to_money(it['unit_price'])),
+                                                            legacy_currency_fmt(invoice_app.line_total(it))) for it in items], len(items))
+    new = record("money_fmt.item_columns", lambda: invoice_app.item_money_columns(items), len(items))
+    progress(f"money_fmt item columns:      {1 / new:12,.0f} rows/sec ({old / new:.1f}x per-row currency_fmt)")
+    texts = inputs["str"]
+    old = record("money_fmt.legacy_parse[str]", lambda: [legacy_currency_to_float(t) for t in texts], len(texts))
+    new = record("money_fmt.parse[str]", lambda: money.parse_many(texts), len(texts))
+    progress(f"money_fmt parse:             {1 / new:12,.0f} values/sec ({old / new:.1f}x currency_to_float, exact Decimals)")
+
+BENCHMARKS = {
+    "generate_pdf": bench_generate_pdf,
+    "ledger": bench_ledger,
+    "rasterize": bench_rasterize,
+    "reports": bench_reports,
+    "money_fmt": bench_money_fmt,
+    "output_profile": bench_output_profile,
+}
+
+# ---------- Reporting ----------
+def progress(msg):
+    print(msg, file=sys.stderr, flush=True)
+
+def environment():
+    import fitz
+    import PIL
+    import reportlab
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "reportlab": reportlab.Version,
+        "pymupdf": fitz.VersionBind,
+        "pillow": PIL.__version__,
+    }
+
+def compare(results, baseline_path, tolerance):
+    """Returns the metrics that got worse than baseline by more than tolerance (a fraction)"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    for name, res in sorted(results.items()):
+        old = baseline.get(name)
+        if not old or not old.get("value"):
+            continue
+        change = res["value"] / old["value"] - 1
+        if change > tolerance:
+            regressions.append((name, old["value"], res["value"], change))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", help=f"comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes (up to 1k items, 100k ledger rows)")
+    parser.add_argument("--max-ledger-rows", type=int, help="cap the ledger growth sizes")
+    parser.add_argument("--ledger-writes", type=int, default=200, help="timed ledger inserts per size (default: %(default)s)")
+    parser.add_argument("--fmt-values", type=int, default=100_000, help="values per money_fmt run (default: %(default)s)")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds to spend per measurement (default: %(default)s)")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="JSON results file (default: %(default)s)")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown vs the baseline before failing, as a fraction (default: %(default)s)")
+    parser.add_argument("--keep-workdir", action="store_true", help="leave the scratch directory in place")
+    args = parser.parse_args(argv)
+
+    selected = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in selected if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    args.item_counts = QUICK_ITEM_COUNTS if args.quick else ITEM_COUNTS
+    args.ledger_sizes = QUICK_LEDGER_SIZES if args.quick else LEDGER_SIZES
+    if args.max_ledger_rows is not None:
+        args.ledger_sizes = tuple(s for s in args.ledger_sizes if s <= args.max_ledger_rows)
+    output = os.path.abspath(args.output)
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    # invoice_app resolves invoices/ relative to the working directory at import time
+    global invoice_app
+    workdir = tempfile.mkdtemp(prefix="invoice-bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import invoice_app as app
+        invoice_app = app
+        results = {}
+        for name in selected:
+            BENCHMARKS[name](results, args)
+    finally:
+        os.chdir(cwd)
+        if invoice_app is not None and invoice_app._LEDGER is not None:
+            invoice_app._LEDGER.close()
+        if args.keep_workdir:
+            progress(f"scratch directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2, sort_keys=True)
+    print(f"{len(results)} metrics written to {output}")
+
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        for name, old, new, change in regressions:
+            print(f"REGRESSION {name}: {old:.6g} -> {new:.6g} (+{change*100:.0f}%)")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance*100:.0f}% against {baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
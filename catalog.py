@@ -0,0 +1,192 @@
+"""
+Product Catalog
+Products (SKU, name, unit price) imported from a CSV into a local SQLite file,
+for autocomplete in the item dialog. Names are looked up by prefix through a
+B-tree index and by substring through an FTS5 trigram index, so a lookup
+reads a handful of index pages instead of scanning the catalog and stays in
+the low milliseconds at hundreds of thousands of products.
+"""
+
+import os
+import csv
+import sqlite3
+import threading
+
+from ledger import to_paise, from_paise
+
+# Keep the trigram index in step with the products table
+FTS_TRIGGERS = {
+    "products_ai": """CREATE TRIGGER IF NOT EXISTS products_ai AFTER INSERT ON products BEGIN
+    INSERT INTO products_fts (rowid, name, sku) VALUES (new.id, new.name, new.sku);
+END;""",
+    "products_ad": """CREATE TRIGGER IF NOT EXISTS products_ad AFTER DELETE ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, sku) VALUES ('delete', old.id, old.name, old.sku);
+END;""",
+    "products_au": """CREATE TRIGGER IF NOT EXISTS products_au AFTER UPDATE ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, sku) VALUES ('delete', old.id, old.name, old.sku);
+    INSERT INTO products_fts (rowid, name, sku) VALUES (new.id, new.name, new.sku);
+END;""",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id                INTEGER PRIMARY KEY,
+    sku               TEXT NOT NULL UNIQUE,
+    name              TEXT NOT NULL,
+    name_key          TEXT NOT NULL,     -- casefolded name, for prefix lookups
+    unit_price_paise  INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_products_name_key ON products(name_key);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+    name, sku, content='products', content_rowid='id', tokenize='trigram'
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key    TEXT PRIMARY KEY,
+    value  TEXT
+);
+"""
+
+# Accepted CSV headers (case-insensitive) for each field; only a name column is required
+CSV_COLUMNS = {
+    "sku": ("sku", "code", "item_code", "product_code"),
+    "name": ("name", "description", "desc", "product", "item"),
+    "unit_price": ("unit_price", "price", "rate", "mrp"),
+}
+IMPORT_BATCH = 5000 # rows per executemany during an import
+MIN_SUBSTRING = 3   # shorter queries only match the start of a name (trigrams need three characters)
+
+def _column(fieldnames, field):
+    names = {name.strip().lower(): name for name in fieldnames or ()}
+    return next((names[c] for c in CSV_COLUMNS[field] if c in names), None)
+
+class ProductCatalog:
+    """Product catalog with prefix and substring lookups. One instance may be shared between threads."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript(SCHEMA + "\n".join(FTS_TRIGGERS.values()))
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    # --- Import ---
+
+    def import_csv(self, csv_path, replace=False):
+        """Adds or updates products from a CSV; returns {"imported", "skipped"}.
+
+        Rows are matched on SKU (the name when there is no SKU column). With
+        replace, products missing from the CSV are removed. Rows without a
+        name or with an unreadable price are skipped.
+        """
+        stats = {"imported": 0, "skipped": 0}
+        with open(csv_path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            sku_col, name_col, price_col = (_column(reader.fieldnames, k) for k in ("sku", "name", "unit_price"))
+            if name_col is None:
+                raise ValueError(f"{csv_path} has no product name column (expected one of: {', '.join(CSV_COLUMNS['name'])})")
+            with self._lock, self.conn:
+                # Keeping the trigram index in step row by row is most of the cost of a large import, so the
+                # triggers are dropped for the import and the index is rebuilt once at the end (one transaction,
+                # so a failed import leaves the catalog and its triggers as they were)
+                self.conn.execute("BEGIN")
+                for name in FTS_TRIGGERS:
+                    self.conn.execute(f"DROP TRIGGER {name}")
+                if replace:
+                    self.conn.execute("DELETE FROM products")
+                batch = []
+                for row in reader:
+                    name = " ".join((row.get(name_col) or "").split())
+                    sku = (row.get(sku_col) or "").strip() if sku_col else ""
+                    try:
+                        price = to_paise((row.get(price_col) if price_col else None) or 0)
+                    except ArithmeticError:
+                        price = -1
+                    if not name or price < 0:
+                        stats["skipped"] += 1
+                        continue
+                    batch.append((sku or name, name, name.casefold(), price))
+                    if len(batch) >= IMPORT_BATCH:
+                        self._upsert(batch)
+                        stats["imported"] += len(batch)
+                        batch = []
+                self._upsert(batch)
+                stats["imported"] += len(batch)
+                self.conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+                for sql in FTS_TRIGGERS.values():
+                    self.conn.execute(sql)
+                st = os.stat(csv_path)
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                  ("source:" + os.path.abspath(csv_path), f"{st.st_size}:{st.st_mtime_ns}"))
+        return stats
+
+    def _upsert(self, rows):
+        self.conn.executemany(
+            "INSERT INTO products (sku, name, name_key, unit_price_paise) VALUES (?,?,?,?)"
+            " ON CONFLICT(sku) DO UPDATE SET name = excluded.name, name_key = excluded.name_key,"
+            " unit_price_paise = excluded.unit_price_paise", rows)
+
+    def sync_csv(self, csv_path):
+        """Re-imports csv_path (replacing the catalog) if it changed since it was last imported; returns the stats or None"""
+        try:
+            st = os.stat(csv_path)
+        except OSError:
+            return None
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", ("source:" + os.path.abspath(csv_path),)).fetchone()
+        if row and row[0] == f"{st.st_size}:{st.st_mtime_ns}":
+            return None
+        return self.import_csv(csv_path, replace=True)
+
+    def clear(self):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM products")
+            self.conn.execute("DELETE FROM meta WHERE key LIKE 'source:%'")
+
+    def warm(self):
+        """Reads the lookup indexes once, so the first keystrokes do not wait for the disk"""
+        with self._lock:
+            self.conn.execute("SELECT COUNT(*) FROM products INDEXED BY idx_products_name_key").fetchone()
+            self.conn.execute("SELECT COUNT(*) FROM products_fts_data").fetchone()
+
+    # --- Lookups ---
+
+    def suggest(self, text, limit=8):
+        """Products whose name starts with text, then products whose name or SKU contains it.
+
+        Returns up to limit dicts with sku, name and unit_price (a Decimal).
+        Matching ignores case; names are compared with their whitespace collapsed.
+        """
+        key = " ".join((text or "").split()).casefold()
+        if not key:
+            return []
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, sku, name, unit_price_paise FROM products WHERE name_key >= ? AND name_key < ?"
+                " ORDER BY name_key LIMIT ?", (key, key + "\U0010ffff", limit)).fetchall()
+            if len(rows) < limit and len(key) >= MIN_SUBSTRING:
+                seen = {r[0] for r in rows}
+                phrase = '"' + key.replace('"', '""') + '"'
+                more = self.conn.execute(
+                    "SELECT p.id, p.sku, p.name, p.unit_price_paise FROM products_fts"
+                    " JOIN products p ON p.id = products_fts.rowid WHERE products_fts MATCH ? LIMIT ?",
+                    (phrase, limit + len(rows))).fetchall()
+                rows += [r for r in more if r[0] not in seen][:limit - len(rows)]
+        return [{"sku": sku, "name": name, "unit_price": from_paise(price)} for _, sku, name, price in rows]
+
+    def get(self, sku):
+        with self._lock:
+            row = self.conn.execute("SELECT sku, name, unit_price_paise FROM products WHERE sku = ?", (sku,)).fetchone()
+        return {"sku": row[0], "name": row[1], "unit_price": from_paise(row[2])} if row else None
+
+    def stats(self):
+        with self._lock:
+            count = self.conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+        return {"products": count, "path": self.path}
@@ -5,213 +5,1357 @@ FIXED: NameError: name 'ACCENT_BLUE' is not defined
 """
 
 import os
+import sys
 import csv
+import json
+import time
+import logging
+import atexit
+import argparse
 import datetime
-import subprocess
 import platform
+import copy
+import hashlib
+import threading
+import queue
+import multiprocessing
+import importlib.util
+from io import BytesIO
+from collections import OrderedDict
+from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
+from contextlib import contextmanager
+_STARTUP_T0 = time.perf_counter() # reference point for --profile-startup
 from tkinter import (
-    Tk, StringVar, IntVar, DoubleVar, Toplevel,
-    Label, Entry, Button, Frame, LEFT, RIGHT, X, Y, BOTH, TOP, BOTTOM, END, W, E, CENTER, filedialog, Text, Canvas
+    Tk, TclError, StringVar, IntVar, DoubleVar, Toplevel,
+    Button, Listbox, LEFT, RIGHT, X, Y, BOTH, TOP, BOTTOM, END, W, E, CENTER, filedialog, Text, Canvas
 )
 from tkinter import messagebox
 from tkinter import ttk
-from PIL import Image, ImageTk 
 
-# Conditional import for pywin32 (for Windows printing)
+# File locking for the invoice number sequence (fcntl on POSIX, msvcrt on Windows)
 try:
-    import win32api
-    import win32print
-    WIN32_AVAILABLE = True
+    import fcntl
+    msvcrt = None
 except ImportError:
-    win32api = None
-    win32print = None
-    WIN32_AVAILABLE = False
-
-import fitz # PyMuPDF
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.units import mm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
+    fcntl = None
+    import msvcrt
+
+# Heavy dependencies are imported on first use, so the window (or a headless batch)
+# does not wait for them: PyMuPDF and Pillow for preview/bundles (local imports),
+# ReportLab on first render (load_reportlab) and pywin32 for printing (load_win32).
+A4 = colors = mm = None
+SimpleDocTemplate = Table = TableStyle = Paragraph = Spacer = getSampleStyleSheet = None
+pdfcanvas = stringWidth = simpleSplit = None
+
+from ledger import Ledger
+from print_queue import PrintQueue, default_spooler
+from render_cache import RenderCache, cache_key
+from line_items import LineItems
+from money import MoneyFormat
+from archive import InvoiceArchive, invoice_filename, invoice_number_from_name
+from search_index import SearchIndex, extract_pdf_text, parse_invoice_text
+from catalog import ProductCatalog
+import tracing
+
+_STARTUP_IMPORTED = time.perf_counter()
 
 # ---------- Config ----------
 INVOICE_DIR = "invoices"
-INVOICE_CSV = os.path.join(INVOICE_DIR, "invoices.csv")
+INVOICE_CSV = os.path.join(INVOICE_DIR, "invoices.csv") # legacy ledger, imported into INVOICE_DB once
+INVOICE_DB = os.path.join(INVOICE_DIR, "ledger.db")
+INVOICE_SEQ = os.path.join(INVOICE_DIR, "invoice_seq.txt")
+ARCHIVE_DIR = os.path.join(INVOICE_DIR, "archive") # rendered invoices, sharded, with manifest.db
+ARCHIVE_LAYOUT = "month" # "month" files invoices under YYYY/MM/, "hash" spreads them evenly over 65536 folders
+SEARCH_DB = os.path.join(INVOICE_DIR, "search.db") # full-text index of buyers, notes and item descriptions
+SEARCH_DELAY_MS = 200 # debounce for search-as-you-type
+SEARCH_RESULTS = 200
+CATALOG_DB = os.path.join(INVOICE_DIR, "catalog.db") # products offered as you type an item description
+CATALOG_CSV = os.path.join(INVOICE_DIR, "catalog.csv") # re-imported (replacing the catalog) whenever it changes
+CATALOG_SUGGESTIONS = 8
+
+CURRENCY_SYMBOL = "₹"
+MONEY_GROUPING = "indian" # "indian": ₹12,34,567.89 (lakh/crore), "western": ₹1,234,567.89
+
+DEFAULT_ENGINE = "platypus" # "canvas" is the fast fixed-layout engine for high-volume runs
+OUTPUT_PROFILE = "standard" # "rupee-glyph": ₹ drawn from an embedded font subset, which Helvetica cannot draw
+OUTPUT_PROFILES = ("standard", "rupee-glyph")
+INVOICE_LOGO = os.path.join(INVOICE_DIR, "logo.png") # drawn at the top of the first page when the file exists
+LOGO_MAX_SIZE = (40, 14) # mm
+# TrueType fonts the rupee-glyph profile takes the ₹ sign from; the first one found that has it wins
+RUPEE_FONT_CANDIDATES = (
+    os.path.join("fonts", "InvoiceSans.ttf"),
+    r"C:\Windows\Fonts\segoeui.ttf",
+    r"C:\Windows\Fonts\Nirmala.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu-sans-fonts/DejaVuSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+)
+
+TAX_RECALC_DELAY_MS = 150 # debounce for tax-field keystrokes
+TASK_POLL_MS = 50 # how often the UI picks up results from the background worker
+
+PRINT_QUEUE_DB = os.path.join(INVOICE_DIR, "print_queue.db")
+PRINT_BATCH_SIZE = 50 # invoices merged into one spooler submission
+PRINT_MAX_ATTEMPTS = 5
+PRINT_QUEUE_POLL_MS = 1000
+
+BUNDLE_FLUSH_EVERY = 250 # invoices merged in memory before a bundle is flushed to disk
+COMPACT_GARBAGE = 3 # PyMuPDF garbage collection level for `compact` (3 also merges duplicate objects)
+RENDER_CACHE_DIR = os.path.join(INVOICE_DIR, "render_cache")
+RENDER_CACHE_BYTES = 256 * 1024 * 1024 # rendered PDFs kept for repeat previews, prints and reprints
+REPORT_SNAPSHOT = os.path.join(INVOICE_DIR, "ledger_snapshot.pkl") # columnar copy of the ledger for reports
+
+PREVIEW_ZOOM_LEVELS = (0.5, 0.75, 1.0, 1.25, 1.5, 2.0, 3.0)
+PREVIEW_SCREEN_SCALE = 96/72 # zoom 1.0 shows the page at its real size on a 96 dpi screen
+PREVIEW_CACHE_BYTES = 96 * 1024 * 1024
 os.makedirs(INVOICE_DIR, exist_ok=True)
 
+DEFAULT_SELLER = "Your Business Name\n123 Business St\nCity, State, ZIP\nPhone: (555) 123-4567\nEmail: info@yourbusiness.com"
+DEFAULT_TAX_PERCENT = 18.0
+
+log = logging.getLogger("invoice_app")
+
+# ---------- Deferred Imports ----------
+def load_reportlab():
+    """Imports the ReportLab names used by the templates (once; platypus alone takes ~100 ms)"""
+    global A4, colors, mm, SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, getSampleStyleSheet
+    global pdfcanvas, stringWidth, simpleSplit
+    if simpleSplit is not None:
+        return
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.lib.units import mm
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.pdfgen import canvas as pdfcanvas
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    from reportlab.lib.utils import simpleSplit
+    from reportlab import rl_config
+    rl_config.useA85 = 0 # compressed streams are written as binary, not inflated by a quarter as ASCII85
+
+_RUPEE_FONT = None
+
+def load_rupee_font():
+    """Registers the first font in RUPEE_FONT_CANDIDATES that can draw ₹; returns its name, or None.
+
+    Only the glyphs a PDF uses are embedded (asciiReadable would add all of
+    ASCII), but the subset still adds about 7 KB to every PDF.
+    """
+    global _RUPEE_FONT
+    if _RUPEE_FONT is None:
+        load_reportlab()
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        _RUPEE_FONT = False
+        for path in RUPEE_FONT_CANDIDATES:
+            if not os.path.exists(path):
+                continue
+            try:
+                font = TTFont("InvoiceRupee", path, asciiReadable=0)
+            except Exception as e:
+                log.warning("Cannot use font %s: %s", path, e)
+                continue
+            if ord("₹") not in font.face.charToGlyph:
+                continue
+            pdfmetrics.registerFont(font)
+            _RUPEE_FONT = font.fontName
+            log.info("rupee-glyph PDFs take the ₹ sign from %s", path)
+            break
+        else:
+            log.warning("No font with the ₹ sign found (see RUPEE_FONT_CANDIDATES); rupee-glyph PDFs draw it in Helvetica")
+    return _RUPEE_FONT or None
+
+_WIN32 = None
+
+def load_win32():
+    """Returns (win32api, win32print), importing pywin32 on first use, or None where it is unavailable"""
+    global _WIN32
+    if _WIN32 is None:
+        _WIN32 = False
+        if platform.system() == "Windows":
+            try:
+                import win32api
+                import win32print
+                _WIN32 = (win32api, win32print)
+            except ImportError:
+                pass
+    return _WIN32 or None
+
 # ---------- Helper Functions ----------
-def currency_fmt(x):
-    """Formats a float/string into a currency string (e.g., ₹1,234.56)"""
+MONEY = MoneyFormat(CURRENCY_SYMBOL, MONEY_GROUPING) # every amount shown or printed goes through this
+
+PAISA = Decimal("0.01")
+
+def to_money(x):
+    """Converts a number to a Decimal rounded to the paisa (half up)"""
+    if not isinstance(x, Decimal):
+        x = Decimal(str(x))
+    return x.quantize(PAISA, rounding=ROUND_HALF_UP)
+
+def line_total(it):
+    """Line total of one item dict, rounded to the paisa"""
+    return to_money(it['qty'] * to_money(it['unit_price']))
+
+def totals_from_subtotal(subtotal, tax_percent):
+    """Returns (subtotal, tax_amount, total) as Decimals for a known subtotal"""
+    subtotal = to_money(subtotal)
+    tax_amount = to_money(subtotal * Decimal(str(tax_percent)) / 100)
+    return subtotal, tax_amount, subtotal + tax_amount
+
+def item_money_columns(items):
+    """Formatted unit prices and line totals of every item, one batch call per column"""
+    if isinstance(items, LineItems):
+        return MONEY.format_paise_many(items.prices), MONEY.format_paise_many(items.line_totals_paise())
+    return MONEY.format_many([it['unit_price'] for it in items]), MONEY.format_many([line_total(it) for it in items])
+
+def compute_totals(items, tax_percent):
+    """Returns (subtotal, tax_amount, total) as Decimals for a list of item dicts or a LineItems.
+
+    Line totals are rounded before summing, so the rows printed on the invoice
+    always add up to the subtotal.
+    """
+    if isinstance(items, LineItems):
+        return items.totals(tax_percent)
+    return totals_from_subtotal(sum((line_total(it) for it in items), Decimal(0)), tax_percent)
+
+_LEDGER = None
+_PRINT_QUEUE = None
+_RENDER_CACHE = None
+_REPORT_SNAPSHOT = None
+_ARCHIVE = None
+_SEARCH_INDEX = None
+_CATALOG = None
+# Serialises the first use of the singletons below, which the render service's request threads race for
+_SINGLETONS_LOCK = threading.RLock()
+
+def get_ledger():
+    """Returns the process-wide ledger, importing a legacy invoices.csv on first use"""
+    global _LEDGER
+    if _LEDGER is None:
+        with _SINGLETONS_LOCK:
+            if _LEDGER is None:
+                ledger = Ledger(INVOICE_DB)
+                if os.path.exists(INVOICE_CSV):
+                    imported = ledger.import_csv(INVOICE_CSV)
+                    if imported:
+                        log.info("Imported %d invoices from %s into %s", imported, INVOICE_CSV, INVOICE_DB)
+                _LEDGER = ledger
+    return _LEDGER
+
+def save_invoice_record(inv_no, date_str, buyer, subtotal, tax, total, items=(), buyer_address="",
+                        seller="", tax_percent=0.0, notes="", pdf_path=None):
+    """Records one invoice (with its line items) in the ledger (raises on errors)"""
+    ledger = get_ledger()
+    with tracing.span("ledger.append"):
+        ledger.record_invoice(inv_no, date_str, buyer, subtotal, tax, total, items=items,
+                              buyer_address=buyer_address, seller=seller, tax_percent=tax_percent,
+                              notes=notes, pdf_path=pdf_path)
+    if pdf_path:
+        with tracing.span("archive.add"):
+            try:
+                get_archive().add(inv_no, pdf_path)
+            except Exception as e:
+                # The invoice is recorded; `archive rebuild` indexes the file later
+                log.warning("Invoice %04d is not in the archive manifest: %s", inv_no, e)
+    with tracing.span("search.index"):
+        try:
+            get_search_index().add(inv_no, date_str, buyer, buyer_address, notes, items)
+        except Exception as e:
+            # `search-index backfill` picks it up later
+            log.warning("Invoice %04d is not in the search index: %s", inv_no, e)
+
+def get_print_queue(spooler=None):
+    """Returns the process-wide print queue (jobs left over from a previous run are kept)"""
+    global _PRINT_QUEUE
+    if _PRINT_QUEUE is None:
+        with _SINGLETONS_LOCK:
+            if _PRINT_QUEUE is None:
+                _PRINT_QUEUE = PrintQueue(PRINT_QUEUE_DB, spooler=spooler, batch_size=PRINT_BATCH_SIZE,
+                                          max_attempts=PRINT_MAX_ATTEMPTS)
+    return _PRINT_QUEUE
+
+def get_render_cache():
+    """Returns the process-wide cache of rendered PDFs"""
+    global _RENDER_CACHE
+    if _RENDER_CACHE is None:
+        with _SINGLETONS_LOCK:
+            if _RENDER_CACHE is None:
+                _RENDER_CACHE = RenderCache(RENDER_CACHE_DIR, RENDER_CACHE_BYTES)
+    return _RENDER_CACHE
+
+def get_archive():
+    """Returns the process-wide invoice archive (sharded PDF folders and their manifest)"""
+    global _ARCHIVE
+    if _ARCHIVE is None:
+        with _SINGLETONS_LOCK:
+            if _ARCHIVE is None:
+                _ARCHIVE = InvoiceArchive(ARCHIVE_DIR, ARCHIVE_LAYOUT)
+    return _ARCHIVE
+
+def get_search_index():
+    """Returns the process-wide full-text search index"""
+    global _SEARCH_INDEX
+    if _SEARCH_INDEX is None:
+        with _SINGLETONS_LOCK:
+            if _SEARCH_INDEX is None:
+                _SEARCH_INDEX = SearchIndex(SEARCH_DB)
+    return _SEARCH_INDEX
+
+def get_catalog():
+    """Returns the process-wide product catalog (see load_catalog for the background load the GUI uses)"""
+    global _CATALOG
+    if _CATALOG is None:
+        with _SINGLETONS_LOCK:
+            if _CATALOG is None:
+                _CATALOG = ProductCatalog(CATALOG_DB)
+    return _CATALOG
+
+def invoice_pdf_path(invoice_no, date_str=None):
+    """Archive path for a new invoice's PDF (its folder is created)"""
+    return get_archive().path_for(invoice_no, date_str)
+
+def find_invoice_pdf(invoice_no, recorded_path=None):
+    """Path of a stored invoice PDF: the archive manifest first, then the path the ledger recorded"""
+    path = get_archive().find(invoice_no)
+    if path is None and recorded_path and os.path.exists(recorded_path):
+        path = recorded_path
+    return path
+
+def get_report_snapshot():
+    """Returns the process-wide report snapshot of the ledger (pandas is imported on first use)"""
+    global _REPORT_SNAPSHOT
+    if _REPORT_SNAPSHOT is None:
+        from reports import LedgerSnapshot
+        with _SINGLETONS_LOCK:
+            if _REPORT_SNAPSHOT is None:
+                get_ledger() # creates the ledger (and imports a legacy CSV) if this is the first run
+                _REPORT_SNAPSHOT = LedgerSnapshot(INVOICE_DB, REPORT_SNAPSHOT)
+    return _REPORT_SNAPSHOT
+
+@contextmanager
+def _locked_file(path):
+    """Opens path read/write (creating it if needed) under an exclusive inter-process lock"""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    f = os.fdopen(fd, "r+", encoding="utf-8", newline="")
     try:
-        if isinstance(x, str):
-            x = x.replace('₹', '').replace(',', '').strip()
-        # Formatting with comma separators
-        return f"₹{float(x):,.2f}"
-    except Exception:
-        return "₹0.00"
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        yield f
+    finally:
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            f.close()
 
-def currency_to_float(x):
-    """Converts a currency string back to a float"""
+def _ledger_high_water_mark():
+    """Highest invoice number recorded anywhere we can see, used to seed the sequence"""
     try:
-        if isinstance(x, str):
-            return float(x.replace('₹', '').replace(',', '').strip())
-        return float(x)
+        return get_ledger().last_invoice_no()
     except Exception:
-        return 0.0
+        # Fallback in case the ledger is unreadable
+        return get_archive().last_invoice_no()
+
+def _read_sequence(f):
+    f.seek(0)
+    text = f.read().strip()
+    return int(text) if text.isdigit() else None
 
 def next_invoice_number():
-    n = 1
-    if os.path.exists(INVOICE_CSV):
-        try:
-            with open(INVOICE_CSV, newline="", encoding="utf-8") as f:
-                rows = list(csv.reader(f))
-                if len(rows) > 1:
-                    # Get the last invoice number from the first column and increment
-                    n = int(rows[-1][0]) + 1
-        except Exception:
-            # Fallback in case CSV is corrupted
-            n = len([f for f in os.listdir(INVOICE_DIR) if f.startswith("Invoice_") and f.endswith(".pdf")]) + 1
+    """Returns the next invoice number without reserving it (for display)"""
+    with tracing.span("numbering.peek"):
+        with _locked_file(INVOICE_SEQ) as f:
+            n = _read_sequence(f)
+        if n is None:
+            n = _ledger_high_water_mark() + 1
     return n
 
-def generate_pdf(invoice_number, date_str, seller_info, buyer_info, items, subtotal, tax_percent, tax_amount, total_amount, notes="", pdf_path=None):
-    if pdf_path is None:
-        pdf_path = os.path.join(INVOICE_DIR, f"Invoice_{invoice_number:04d}.pdf")
-    doc = SimpleDocTemplate(pdf_path, pagesize=A4,
-                            rightMargin=20*mm, leftMargin=20*mm,
-                            topMargin=20*mm, bottomMargin=20*mm)
-    styles = getSampleStyleSheet()
-    story = []
-
-    # Title and Metadata
-    story.append(Paragraph("<b>INVOICE</b>", styles['Title']))
-    story.append(Spacer(1, 6))
-    meta_table_data = [["Invoice No:", f"{invoice_number:04d}", "Date:", date_str]]
-    meta = Table(meta_table_data, colWidths=[60*mm, 60*mm, 30*mm, 30*mm])
-    story.append(meta)
-    story.append(Spacer(1, 12))
-
-    # Seller/Buyer Info
-    seller_par = Paragraph(f"<b>Seller:</b><br/>{seller_info.replace(chr(10), '<br/>')}", styles['Normal'])
-    buyer_par = Paragraph(f"<b>Buyer:</b><br/>{buyer_info.replace(chr(10), '<br/>')}", styles['Normal'])
-    party_table = Table([[seller_par, buyer_par]], colWidths=[90*mm, 90*mm])
-    party_table.setStyle(TableStyle([('VALIGN', (0,0), (-1,-1), 'TOP')]))
-    story.append(party_table)
-    story.append(Spacer(1, 12))
-
-    # Items Table
-    data = [["#", "Description", "Qty", "Unit Price", "Total"]]
-    for idx, it in enumerate(items, start=1):
-        line_total = it['qty']*it['unit_price']
-        # IMPORTANT: Use currency_fmt for financial values in the PDF table
-        data.append([str(idx), it['desc'], str(it['qty']), currency_fmt(it['unit_price']), currency_fmt(line_total)])
-
-    # Totals in Table
-    # ENHANCEMENT: Clearly label Subtotal, Tax, and Total
-    data.append(["", "", "", "Subtotal:", currency_fmt(subtotal)])
-    data.append(["", "", "", f"Tax ({tax_percent:.2f}%):", currency_fmt(tax_amount)]) 
-    data.append(["", "", "", "GRAND TOTAL:", currency_fmt(total_amount)])
-
-    table = Table(data, colWidths=[15*mm, 95*mm, 20*mm, 30*mm, 30*mm])
-    last_row = len(data) - 1
-    table.setStyle(TableStyle([
-        ('GRID', (0,0), (-1,last_row-3), 0.5, colors.grey),
-        ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-        ('ALIGN', (2,1), (4,last_row-3), 'CENTER'),
-        ('ALIGN', (3,1), (4,last_row-3), 'RIGHT'), # Align Price/Total columns right
-
-        # Totals Section Styling
-        ('ALIGN', (3,last_row-2), (3,last_row), 'LEFT'),  # Align labels (Subtotal, Tax, Total) to the LEFT of the 4th column
-        ('ALIGN', (4,last_row-2), (4,last_row), 'RIGHT'), # Align amounts to the RIGHT of the 5th column
-        
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('FONTNAME', (3,last_row-2), (3,last_row-2), 'Helvetica-Bold'),
-        ('FONTNAME', (3,last_row-1), (3,last_row-1), 'Helvetica-Bold'),
-        ('FONTNAME', (3,last_row), (4,last_row), 'Helvetica-Bold'), # Make total amount and label bold
-        ('LINEBELOW', (3,last_row-1), (4,last_row-1), 1, colors.black), # Line above Total
-        ('LINEABOVE', (3,last_row), (4,last_row), 1.5, colors.black), # Double Line under Total
-    ]))
-    story.append(table)
-    story.append(Spacer(1,12))
-
-    # Notes
-    if notes.strip():
-        story.append(Paragraph(f"<b>Notes:</b><br/>{notes.replace(chr(10), '<br/>')}", styles['Normal']))
+def allocate_invoice_numbers(count=1):
+    """Atomically reserves `count` consecutive invoice numbers and returns the first one.
+
+    The counter lives in INVOICE_SEQ and is guarded by a file lock, so several
+    app instances or batch workers never receive the same number. Cost does not
+    depend on the size of the ledger.
+    """
+    with tracing.span("numbering.allocate"), _locked_file(INVOICE_SEQ) as f:
+        n = _read_sequence(f)
+        if n is None:
+            n = _ledger_high_water_mark() + 1
+        f.seek(0)
+        f.write(str(n + count))
+        f.truncate()
+        f.flush()
+        os.fsync(f.fileno())
+    return n
+
+def _rupee_text_class():
+    """Flowable for table cells whose ₹ signs come from another font (defined once ReportLab is loaded)"""
+    global _RupeeText
+    if _RupeeText is None:
+        from reportlab.platypus.flowables import Flowable
+
+        class RupeeText(Flowable):
+            """One line of (run, font) pieces, placed like a plain table cell string"""
+            def __init__(self, parts, size, leading):
+                super().__init__()
+                self.parts, self.size, self.leading = parts, size, leading
+                self.text_width = sum(stringWidth(run, font, size) for run, font in parts)
+
+            def wrap(self, avail_width, avail_height):
+                return self.text_width, self.leading
+
+            def draw(self):
+                t = self.canv.beginText(0, self.leading - self.size) # same baseline as a string cell
+                for run, font in self.parts:
+                    t.setFont(font, self.size)
+                    t.textOut(run)
+                self.canv.drawText(t)
+        _RupeeText = RupeeText
+    return _RupeeText
+
+_RupeeText = None
+
+class InvoiceTemplate:
+    """Precompiled invoice layout used by generate_pdf.
+
+    Styles, column widths, table styles and the static header/footer are built
+    once, so each render only fills in the per-invoice data. A template is not
+    thread-safe; default_template() hands out one per thread.
+
+    The output profile ("standard" or "rupee-glyph", OUTPUT_PROFILE by default)
+    decides where the ₹ sign comes from: Helvetica has no such glyph, so
+    rupee-glyph PDFs draw it from an embedded subset of a TrueType font while
+    all other text stays in Helvetica (never embedded).
+    """
+    VERSION = 4 # bump whenever the rendered output changes
+    FONT = "Helvetica"
+    BOLD = "Helvetica-Bold"
+    FONT_SIZE = 10 # also ReportLab's default for table cells
+    LEADING = 12
+    PAGE_COMPRESSION = None # ReportLab's default (compressed)
+
+    def __init__(self, pagesize=None, margin=None, profile=None):
+        load_reportlab()
+        self.pagesize = pagesize or A4
+        self.margin = margin if margin is not None else 20*mm
+        self.profile = profile or OUTPUT_PROFILE
+        if self.profile not in OUTPUT_PROFILES:
+            raise ValueError(f"Unknown output profile '{self.profile}' (choose from {', '.join(OUTPUT_PROFILES)})")
+        self.rupee_font = None # font the ₹ sign is drawn in, when not the text font
+        if self.profile == "rupee-glyph":
+            self.rupee_font = load_rupee_font()
+            if self.rupee_font:
+                self._rupee_text = _rupee_text_class()
+        self._load_logo()
+        styles = getSampleStyleSheet()
+        self.normal_style = styles['Normal']
+
+        # Static flowables, copied into every story (platypus marks flowables it has
+        # postponed to the next page, and that flag must not leak into the next render)
+        self.title = Paragraph("<b>INVOICE</b>", styles['Title'])
+        self.thanks = Paragraph("Thank you for your business!", self.normal_style)
+
+        self.meta_col_widths = [60*mm, 60*mm, 30*mm, 30*mm]
+        self.party_col_widths = [90*mm, 90*mm]
+        self.party_style = TableStyle([('VALIGN', (0,0), (-1,-1), 'TOP')])
+
+        self.items_header = ["#", "Description", "Qty", "Unit Price", "Total"]
+        self.items_col_widths = [15*mm, 95*mm, 20*mm, 30*mm, 30*mm]
+        # Negative row indices count from the end (-3..-1 are the totals rows), so the
+        # whole style is independent of the number of items and can be built once
+        self.items_style = TableStyle([
+            ('GRID', (0,0), (-1,-4), 0.5, colors.grey),
+            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+            ('ALIGN', (2,1), (4,-4), 'CENTER'),
+            ('ALIGN', (3,1), (4,-4), 'RIGHT'), # Align Price/Total columns right
+
+            # Totals Section Styling
+            ('ALIGN', (3,-3), (3,-1), 'LEFT'),  # Align labels (Subtotal, Tax, Total) to the LEFT of the 4th column
+            ('ALIGN', (4,-3), (4,-1), 'RIGHT'), # Align amounts to the RIGHT of the 5th column
+
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('FONTNAME', (3,-3), (3,-3), 'Helvetica-Bold'),
+            ('FONTNAME', (3,-2), (3,-2), 'Helvetica-Bold'),
+            ('FONTNAME', (3,-1), (4,-1), 'Helvetica-Bold'), # Make total amount and label bold
+            ('LINEBELOW', (3,-2), (4,-2), 1, colors.black), # Line above Total
+            ('LINEABOVE', (3,-1), (4,-1), 1.5, colors.black), # Double Line under Total
+        ])
+
+    def _load_logo(self):
+        """Decodes INVOICE_LOGO once per template; every invoice it renders draws the same image"""
+        self.logo = self.logo_digest = None
+        if not INVOICE_LOGO or not os.path.exists(INVOICE_LOGO):
+            return
+        from reportlab.lib.utils import ImageReader
+        try:
+            with open(INVOICE_LOGO, "rb") as f:
+                data = f.read()
+            self.logo = ImageReader(BytesIO(data))
+            self.logo_digest = hashlib.sha256(data).hexdigest()
+        except Exception as e:
+            log.warning("Cannot use logo %s: %s", INVOICE_LOGO, e)
+            self.logo = self.logo_digest = None
+
+    def _draw_logo(self, c):
+        """Draws the logo in the top margin, left-aligned with the page content"""
+        if self.logo is None:
+            return
+        max_w, max_h = LOGO_MAX_SIZE[0]*mm, LOGO_MAX_SIZE[1]*mm
+        c.drawImage(self.logo, self.margin, self.pagesize[1] - self.margin + 2*mm, max_w, max_h,
+                    preserveAspectRatio=True, anchor="sw", mask="auto")
+
+    def _rupee_parts(self, text, font):
+        """Splits text into (run, font) pieces with every ₹ sign in the rupee font (bold text included)"""
+        parts = []
+        for i, run in enumerate(text.split("₹")):
+            if i:
+                parts.append(("₹", self.rupee_font))
+            if run:
+                parts.append((run, font))
+        return parts
+
+    def _cell(self, text, font=None):
+        """Table cell for text: the text itself, or a flowable drawing its ₹ signs in the rupee font"""
+        if self.rupee_font is None or "₹" not in text:
+            return text
+        return self._rupee_text(self._rupee_parts(text, font or self.FONT), self.FONT_SIZE, self.LEADING)
+
+    def _markup(self, text):
+        """Paragraph markup for text, with its ₹ signs in the rupee font"""
+        if self.rupee_font is None:
+            return text
+        return text.replace("₹", f'<font name="{self.rupee_font}">₹</font>')
+
+    def build_story(self, invoice_number, date_str, seller_info, buyer_info, items, subtotal, tax_percent, tax_amount, total_amount, notes=""):
+        story = []
+
+        # Title and Metadata
+        story.append(copy.copy(self.title))
+        story.append(Spacer(1, 6))
+        story.append(Table([["Invoice No:", f"{invoice_number:04d}", "Date:", date_str]], colWidths=self.meta_col_widths))
+        story.append(Spacer(1, 12))
+
+        # Seller/Buyer Info
+        seller_par = Paragraph(f"<b>Seller:</b><br/>{self._markup(seller_info).replace(chr(10), '<br/>')}", self.normal_style)
+        buyer_par = Paragraph(f"<b>Buyer:</b><br/>{self._markup(buyer_info).replace(chr(10), '<br/>')}", self.normal_style)
+        party_table = Table([[seller_par, buyer_par]], colWidths=self.party_col_widths)
+        party_table.setStyle(self.party_style)
+        story.append(party_table)
+        story.append(Spacer(1, 12))
+
+        # Items Table
+        data = [self.items_header]
+        cell = self._cell
+        prices, amounts = item_money_columns(items)
+        for idx, (it, price, amount) in enumerate(zip(items, prices, amounts), start=1):
+            data.append([str(idx), cell(it['desc']), str(it['qty']), cell(price), cell(amount)])
+
+        # Totals in Table
+        # ENHANCEMENT: Clearly label Subtotal, Tax, and Total
+        data.append(["", "", "", "Subtotal:", cell(MONEY.format(subtotal))])
+        data.append(["", "", "", f"Tax ({tax_percent:.2f}%):", cell(MONEY.format(tax_amount))])
+        data.append(["", "", "", "GRAND TOTAL:", cell(MONEY.format(total_amount), self.BOLD)])
+
+        table = Table(data, colWidths=self.items_col_widths)
+        table.setStyle(self.items_style)
+        story.append(table)
         story.append(Spacer(1,12))
 
-    story.append(Paragraph("Thank you for your business!", styles['Normal']))
-    doc.build(story)
+        # Notes
+        if notes.strip():
+            story.append(Paragraph(f"<b>Notes:</b><br/>{self._markup(notes).replace(chr(10), '<br/>')}", self.normal_style))
+            story.append(Spacer(1,12))
+
+        story.append(copy.copy(self.thanks))
+        return story
+
+    def render(self, pdf_path, invoice_number, date_str, seller_info, buyer_info, items, subtotal, tax_percent, tax_amount, total_amount, notes="", on_page=None):
+        """Renders the invoice. on_page(page_no) is called as each page starts and may raise to abort."""
+        doc = SimpleDocTemplate(pdf_path, pagesize=self.pagesize,
+                                rightMargin=self.margin, leftMargin=self.margin,
+                                topMargin=self.margin, bottomMargin=self.margin,
+                                pageCompression=self.PAGE_COMPRESSION)
+        with tracing.span("render.story"):
+            story = self.build_story(invoice_number, date_str, seller_info, buyer_info, items,
+                                     subtotal, tax_percent, tax_amount, total_amount, notes)
+        with tracing.span("render.build"):
+            def first_page(canv, d):
+                self._draw_logo(canv)
+                if on_page is not None:
+                    on_page(d.page)
+            if on_page is None:
+                doc.build(story, onFirstPage=first_page)
+            else:
+                doc.build(story, onFirstPage=first_page, onLaterPages=lambda canv, d: on_page(d.page))
+
+class CanvasInvoiceTemplate(InvoiceTemplate):
+    """Fast rendering engine: draws the same invoice straight onto a pdfgen canvas.
+
+    Rows are positioned by hand instead of going through platypus layout. Item
+    descriptions are kept to one line (long ones are shortened with an ellipsis),
+    so invoices with long descriptions are better served by InvoiceTemplate.
+    """
+    PAD_X = 6
+    PAD_Y = 3
+    FRAME_PAD = 6 # platypus frames keep 6pt of padding inside the margins
+    CARRY_FORWARD = False # print running subtotals at page breaks in the items table
+
+    def __init__(self, pagesize=None, margin=None, profile=None):
+        super().__init__(pagesize, margin, profile)
+        self.page_width, self.page_height = self.pagesize
+        self.row_height = self.LEADING + 2*self.PAD_Y
+        self.top = self.page_height - self.margin - self.FRAME_PAD
+        self.bottom = self.margin + self.FRAME_PAD
+        self.frame_width = self.page_width - 2*self.margin - 2*self.FRAME_PAD
+        self.meta_x = self._column_edges(self.meta_col_widths)
+        self.party_x = self._column_edges(self.party_col_widths)
+        self.items_x = self._column_edges(self.items_col_widths)
+        self.items_align = ("LEFT", "LEFT", "CENTER", "RIGHT", "RIGHT")
+        self._ellipsis_cache = {}
+        self._width_cache = {}
+
+    def _column_edges(self, widths):
+        # Tables are centred on the page, like platypus does (even when wider than the frame)
+        x = (self.page_width - sum(widths)) / 2
+        edges = [x]
+        for w in widths:
+            x += w
+            edges.append(x)
+        return edges
+
+    def _width(self, text, font):
+        # Amounts and quantities repeat a lot down an invoice, so widths are memoised
+        key = (text, font)
+        w = self._width_cache.get(key)
+        if w is None:
+            if len(self._width_cache) > 4096:
+                self._width_cache.clear()
+            if self.rupee_font is not None and "₹" in text:
+                w = sum(stringWidth(run, f, self.FONT_SIZE) for run, f in self._rupee_parts(text, font))
+            else:
+                w = stringWidth(text, font, self.FONT_SIZE)
+            self._width_cache[key] = w
+        return w
+
+    def _fit(self, text, width):
+        """Shortens text with an ellipsis so it fits on one line of the given width"""
+        if stringWidth(text, self.FONT, self.FONT_SIZE) <= width:
+            return text
+        key = (text, width)
+        fitted = self._ellipsis_cache.get(key)
+        if fitted is None:
+            lo, hi = 0, len(text)
+            while lo < hi:
+                mid = (lo + hi + 1) // 2
+                if stringWidth(text[:mid] + "…", self.FONT, self.FONT_SIZE) <= width:
+                    lo = mid
+                else:
+                    hi = mid - 1
+            if len(self._ellipsis_cache) > 4096:
+                self._ellipsis_cache.clear()
+            fitted = self._ellipsis_cache[key] = text[:lo].rstrip() + "…"
+        return fitted
+
+    def _row(self, c, row_top, cells):
+        """Draws one table row of (text, x0, x1, align, font) cells using a single text object"""
+        t = c.beginText()
+        baseline = row_top - self.row_height + self.PAD_Y + (self.LEADING - self.FONT_SIZE)
+        current_font = None
+        for text, x0, x1, align, font in cells:
+            if font != current_font:
+                t.setFont(font, self.FONT_SIZE)
+                current_font = font
+            if align == "RIGHT":
+                x = x1 - self.PAD_X - self._width(text, font)
+            elif align == "CENTER":
+                x = (x0 + x1 - self._width(text, font)) / 2
+            else:
+                x = x0 + self.PAD_X
+            t.setTextOrigin(x, baseline)
+            if self.rupee_font is not None and "₹" in text:
+                for run, run_font in self._rupee_parts(text, font):
+                    t.setFont(run_font, self.FONT_SIZE)
+                    t.textOut(run)
+                t.setFont(font, self.FONT_SIZE)
+            else:
+                t.textOut(text)
+        c.drawText(t)
+
+    def _grid(self, c, top, bottom):
+        """Grey grid over the item rows drawn between top and bottom on the current page"""
+        if top - bottom < 1:
+            return
+        c.setStrokeColor(colors.grey)
+        c.setLineWidth(0.5)
+        x0, x1 = self.items_x[0], self.items_x[-1]
+        y = top
+        while y >= bottom - 0.01:
+            c.line(x0, y, x1, y)
+            y -= self.row_height
+        for x in self.items_x:
+            c.line(x, top, x, bottom)
+
+    def _items_header(self, c, y):
+        c.setFillColor(colors.lightgrey)
+        c.rect(self.items_x[0], y - self.row_height, self.items_x[-1] - self.items_x[0], self.row_height, stroke=0, fill=1)
+        c.setFillColor(colors.black)
+        self._row(c, y, [(text, self.items_x[col], self.items_x[col+1], "LEFT", self.BOLD)
+                         for col, text in enumerate(self.items_header)])
+        return y - self.row_height
+
+    def _carry_row(self, c, y, label, amount):
+        x4, x5 = self.items_x[4], self.items_x[5]
+        self._row(c, y, [(label, self.items_x[1], x4, "RIGHT", self.BOLD),
+                         (MONEY.format(amount), x4, x5, "RIGHT", self.BOLD)])
+        return y - self.row_height
+
+    def _text_block(self, c, y, lines, x, page_break):
+        """Draws (text, font) lines top-down from y, breaking pages as needed; returns the new y"""
+        for text, font in lines:
+            if y - self.LEADING < self.bottom:
+                y = page_break()
+            if self.rupee_font is not None and "₹" in text:
+                t = c.beginText(x, y - self.FONT_SIZE)
+                for run, run_font in self._rupee_parts(text, font):
+                    t.setFont(run_font, self.FONT_SIZE)
+                    t.textOut(run)
+                c.drawText(t)
+            else:
+                c.setFont(font, self.FONT_SIZE)
+                c.drawString(x, y - self.FONT_SIZE, text)
+            y -= self.LEADING
+        return y
+
+    def _wrap(self, label, text, width):
+        lines = [(label, self.BOLD)]
+        for para in text.split("\n"):
+            lines.extend((line, self.FONT) for line in (simpleSplit(para, self.FONT, self.FONT_SIZE, width) or [""]))
+        return lines
+
+    def render(self, pdf_path, invoice_number, date_str, seller_info, buyer_info, items, subtotal, tax_percent, tax_amount, total_amount, notes="", on_page=None):
+        """Draws the invoice; items may be any iterable and is consumed once.
+
+        If subtotal is None the totals are worked out from the items as they are
+        drawn. Returns (subtotal, tax_amount, total_amount) as printed.
+        """
+        c = pdfcanvas.Canvas(pdf_path, pagesize=self.pagesize, pageCompression=self.PAGE_COMPRESSION)
+        with tracing.span("render.draw"):
+            totals = self._draw(c, invoice_number, date_str, seller_info, buyer_info, items,
+                                subtotal, tax_percent, tax_amount, total_amount, notes, on_page)
+        with tracing.span("render.save"):
+            c.save()
+        return totals
+
+    def _draw(self, c, invoice_number, date_str, seller_info, buyer_info, items, subtotal, tax_percent, tax_amount, total_amount, notes, on_page):
+        rh = self.row_height
+        if on_page is not None:
+            on_page(1)
+        self._draw_logo(c)
+
+        def page_break():
+            c.showPage()
+            if on_page is not None:
+                on_page(c.getPageNumber())
+            return self.top
+
+        # Title and Metadata
+        y = self.top
+        c.setFont(self.BOLD, 18)
+        c.drawCentredString(self.page_width / 2, y - 18, "INVOICE")
+        y -= 22 + 6 + 6 # title leading, spaceAfter, spacer
+        self._row(c, y, [(text, self.meta_x[col], self.meta_x[col+1], "LEFT", self.FONT)
+                         for col, text in enumerate(["Invoice No:", f"{invoice_number:04d}", "Date:", date_str])])
+        y -= rh + 12
+
+        # Seller/Buyer Info
+        party_height = 0
+        for col, (label, text) in enumerate((("Seller:", seller_info), ("Buyer:", buyer_info))):
+            x0, x1 = self.party_x[col], self.party_x[col+1]
+            lines = self._wrap(label, text, x1 - x0 - 2*self.PAD_X)
+            self._text_block(c, y - self.PAD_Y, lines, x0 + self.PAD_X, page_break)
+            party_height = max(party_height, len(lines) * self.LEADING + 2*self.PAD_Y)
+        y -= party_height + 12
+
+        # Items Table (header repeated on every page)
+        if y - 2*rh < self.bottom:
+            y = page_break()
+        seg_top = y
+        y = self._items_header(c, y)
+        desc_width = self.items_x[2] - self.items_x[1] - 2*self.PAD_X
+        reserve = rh if self.CARRY_FORWARD else 0 # room for the "Carried forward" row
+        running = Decimal("0.00")
+        for idx, it in enumerate(items, start=1):
+            if y - rh - reserve < self.bottom:
+                if self.CARRY_FORWARD:
+                    y = self._carry_row(c, y, "Carried forward:", running)
+                self._grid(c, seg_top, y)
+                seg_top = page_break()
+                y = self._items_header(c, seg_top)
+                if self.CARRY_FORWARD:
+                    y = self._carry_row(c, y, "Brought forward:", running)
+            amount = line_total(it)
+            running += amount
+            row = (str(idx), self._fit(it['desc'], desc_width), str(it['qty']),
+                   MONEY.format(it['unit_price']), MONEY.format(amount))
+            self._row(c, y, [(text, self.items_x[col], self.items_x[col+1], self.items_align[col], self.FONT)
+                             for col, text in enumerate(row)])
+            y -= rh
+        self._grid(c, seg_top, y)
+        if subtotal is None:
+            subtotal, tax_amount, total_amount = totals_from_subtotal(running, tax_percent)
+
+        # Totals
+        if y - 3*rh < self.bottom:
+            y = page_break()
+        x3, x4, x5 = self.items_x[3], self.items_x[4], self.items_x[5]
+        totals = (("Subtotal:", MONEY.format(subtotal), self.FONT),
+                  (f"Tax ({tax_percent:.2f}%):", MONEY.format(tax_amount), self.FONT),
+                  ("GRAND TOTAL:", MONEY.format(total_amount), self.BOLD))
+        for label, amount, amount_font in totals:
+            self._row(c, y, [(label, x3, x4, "LEFT", self.BOLD), (amount, x4, x5, "RIGHT", amount_font)])
+            y -= rh
+        total_top = y + rh # top edge of the GRAND TOTAL row
+        c.setStrokeColor(colors.black)
+        c.setLineWidth(1.5)
+        c.line(x3, total_top, x5, total_top) # Line above Total
+        y -= 12
+
+        # Notes
+        x = self.page_width/2 - self.frame_width/2
+        if notes.strip():
+            y = self._text_block(c, y, self._wrap("Notes:", notes, self.frame_width), x, page_break) - 12
+
+        self._text_block(c, y, [("Thank you for your business!", self.FONT)], x, page_break)
+        return subtotal, tax_amount, total_amount
+
+class LargeInvoiceTemplate(CanvasInvoiceTemplate):
+    """Canvas engine for invoices with thousands of line items.
+
+    Items are streamed one page at a time (a generator works) and every page of
+    the items table carries the running subtotal forward, so time and memory
+    grow with the size of the PDF rather than with ReportLab's table layout.
+    """
+    CARRY_FORWARD = True
+    PAGE_COMPRESSION = 1
+
+TEMPLATE_ENGINES = {"platypus": InvoiceTemplate, "canvas": CanvasInvoiceTemplate, "large": LargeInvoiceTemplate}
+
+_TEMPLATES = threading.local()
+
+def default_template(engine=None, profile=None):
+    """Returns this thread's shared template for the given engine and output profile, building it on first use"""
+    engine = engine or DEFAULT_ENGINE
+    profile = profile or OUTPUT_PROFILE
+    templates = getattr(_TEMPLATES, "templates", None)
+    if templates is None:
+        templates = _TEMPLATES.templates = {}
+    template = templates.get((engine, profile))
+    if template is None:
+        if engine not in TEMPLATE_ENGINES:
+            raise ValueError(f"Unknown rendering engine '{engine}' (choose from {', '.join(TEMPLATE_ENGINES)})")
+        template = templates[(engine, profile)] = TEMPLATE_ENGINES[engine](profile=profile)
+    return template
+
+def render_cache_key(template, invoice_number, date_str, seller_info, buyer_info, items, subtotal, tax_percent, tax_amount, total_amount, notes=""):
+    """Render cache key: a hash of the invoice exactly as it is printed plus the template, its version and profile.
+
+    Returns None for items given as an iterator, which cannot be hashed without consuming them.
+    """
+    if not hasattr(items, "__len__"):
+        return None
+    money = lambda x: None if x is None else MONEY.format(x)
+    prices = (MONEY.format_paise_many(items.prices) if isinstance(items, LineItems)
+              else MONEY.format_many([it['unit_price'] for it in items]))
+    return cache_key(type(template).__name__, template.VERSION, list(template.pagesize), template.margin,
+                     template.profile, template.rupee_font, template.logo_digest,
+                     f"{invoice_number:04d}", date_str, seller_info, buyer_info,
+                     [(it['desc'], str(it['qty']), price) for it, price in zip(items, prices)],
+                     money(subtotal), f"{tax_percent:.2f}", money(tax_amount), money(total_amount), notes)
+
+def generate_pdf(invoice_number, date_str, seller_info, buyer_info, items, subtotal, tax_percent, tax_amount, total_amount, notes="", pdf_path=None, template=None, engine=None, on_page=None, cache=None, profile=None):
+    """Renders the invoice to pdf_path, which may also be a writable file-like object.
+
+    engine selects the renderer ("platypus" by default, "canvas" for the fast
+    fixed-layout engine, "large" for invoices with thousands of items) and
+    profile the output profile (OUTPUT_PROFILE by default); an explicit template
+    overrides both. Only the large engine draws items straight from an
+    iterator; for the others it is read into a list first. on_page(page_no)
+    reports progress and may raise (e.g. TaskCancelled) to abort the render.
+
+    An invoice rendered before with the same content and template is copied
+    from the render cache (get_render_cache() unless given; False disables it)
+    instead of being rendered again.
+    """
+    if pdf_path is None:
+        pdf_path = invoice_pdf_path(invoice_number, date_str)
+    if template is None:
+        template = default_template(engine, profile)
+    if not hasattr(items, "__len__") and not isinstance(template, LargeInvoiceTemplate):
+        items = list(items)
+    if cache is None:
+        cache = get_render_cache()
+    with tracing.span("generate_pdf", invoice=invoice_number, engine=type(template).__name__):
+        if cache:
+            with tracing.span("render.cache_lookup"):
+                key = render_cache_key(template, invoice_number, date_str, seller_info, buyer_info, items,
+                                       subtotal, tax_percent, tax_amount, total_amount, notes)
+                if key is not None and cache.copy_to(key, pdf_path):
+                    return pdf_path
+        else:
+            key = None
+        if key is None:
+            template.render(pdf_path, invoice_number, date_str, seller_info, buyer_info, items,
+                            subtotal, tax_percent, tax_amount, total_amount, notes, on_page=on_page)
+            return pdf_path
+
+        buf = BytesIO()
+        template.render(buf, invoice_number, date_str, seller_info, buyer_info, items,
+                        subtotal, tax_percent, tax_amount, total_amount, notes, on_page=on_page)
+        pdf_bytes = buf.getvalue()
+        with tracing.span("render.write"):
+            if hasattr(pdf_path, "write"):
+                pdf_path.write(pdf_bytes)
+            else:
+                with open(pdf_path, "wb") as f:
+                    f.write(pdf_bytes)
+        with tracing.span("render.cache_store"):
+            try:
+                cache.put(key, pdf_bytes)
+            except OSError as e:
+                log.warning("Could not store invoice %04d in the render cache: %s", invoice_number, e)
     return pdf_path
 
+def generate_large_pdf(invoice_number, date_str, seller_info, buyer_info, items, tax_percent, notes="", pdf_path=None, on_page=None, profile=None):
+    """Renders an invoice from a stream of items (e.g. a generator over a CSV) without holding them all.
+
+    Totals are summed while the items are drawn; returns (pdf_path, subtotal, tax_amount, total_amount).
+    """
+    if pdf_path is None:
+        pdf_path = invoice_pdf_path(invoice_number, date_str)
+    totals = default_template("large", profile).render(pdf_path, invoice_number, date_str, seller_info, buyer_info, items,
+                                              None, tax_percent, None, None, notes, on_page=on_page)
+    return (pdf_path,) + totals
+
+def render_pdf_bytes(invoice_number, date_str, seller_info, buyer_info, items, subtotal, tax_percent, tax_amount, total_amount, notes="", engine=None, on_page=None, cache=None, profile=None):
+    """Renders the invoice in memory and returns the PDF bytes (only the render cache is touched)"""
+    buf = BytesIO()
+    generate_pdf(invoice_number, date_str, seller_info, buyer_info, items, subtotal, tax_percent, tax_amount, total_amount, notes, buf,
+                 engine=engine, on_page=on_page, cache=cache, profile=profile)
+    return buf.getvalue()
+
+def reprint_invoice(invoice_no, pdf_path=None):
+    """Renders a past invoice again from its ledger record and returns the PDF path.
+
+    Without a pdf_path the invoice is written back into the archive and its manifest entry updated.
+    """
+    inv = get_ledger().get_invoice(invoice_no)
+    if inv is None:
+        raise KeyError(f"Invoice {invoice_no} is not in the ledger")
+    if not inv["items"]:
+        raise ValueError(f"Invoice {invoice_no} was imported from the old CSV ledger and has no line items")
+    buyer = f"{inv['buyer']}\n{inv['buyer_address']}" if inv['buyer_address'] else inv['buyer']
+    archived = pdf_path is None
+    if archived:
+        pdf_path = find_invoice_pdf(invoice_no, inv["pdf_path"]) or invoice_pdf_path(invoice_no, inv["date"])
+    generate_pdf(invoice_no, inv["date"], inv["seller"], buyer, inv["items"],
+                 inv["subtotal"], inv["tax_percent"], inv["tax"], inv["total"], inv["notes"], pdf_path)
+    if archived:
+        get_archive().add(invoice_no, pdf_path)
+    return pdf_path
+
+# ---------- Bundles ----------
+def _open_invoice_pdf(inv, render_missing):
+    """Opens the rendered PDF of a ledger row, or None if it is not available"""
+    import fitz
+    path = find_invoice_pdf(inv["invoice_no"], inv.get("pdf_path"))
+    if path:
+        return fitz.open(path)
+    if render_missing:
+        buf = BytesIO()
+        reprint_invoice(inv["invoice_no"], buf)
+        return fitz.open(stream=buf.getvalue(), filetype="pdf")
+    return None
+
+def bundle_invoices(output_path, invoices, toc=True, render_missing=False, flush_every=BUNDLE_FLUSH_EVERY):
+    """Concatenates the already-rendered PDFs of the given ledger rows into one PDF.
+
+    Pages are copied with insert_pdf, not rendered again. Every flush_every
+    invoices the bundle is saved incrementally and reopened, so memory stays
+    flat for long ranges. With toc, each invoice gets a bookmark. Invoices
+    without a PDF on disk are skipped (or re-rendered with render_missing).
+    Returns a dict with the invoices and pages written and the numbers skipped.
+    """
+    import fitz
+    part_path = output_path + ".part"
+    if os.path.exists(part_path):
+        os.remove(part_path)
+    out = fitz.open()
+    saved = False # part_path exists and out was opened from it
+    bookmarks = []
+    stats = {"invoices": 0, "pages": 0, "skipped": []}
+    pending = 0
+    done = False
+    try:
+        for inv in invoices:
+            try:
+                src = _open_invoice_pdf(inv, render_missing)
+            except Exception as e:
+                log.warning("Invoice %04d could not be opened: %s", inv["invoice_no"], e)
+                src = None
+            if src is None:
+                stats["skipped"].append(inv["invoice_no"])
+                continue
+            with src:
+                bookmarks.append([1, f"Invoice {inv['invoice_no']:04d} - {inv['buyer']} ({inv['date']})", out.page_count + 1])
+                out.insert_pdf(src)
+            stats["invoices"] += 1
+            pending += 1
+            if pending >= flush_every:
+                if saved:
+                    out.saveIncr()
+                else:
+                    out.save(part_path, deflate=True)
+                out.close()
+                out = fitz.open(part_path)
+                saved, pending = True, 0
+
+        if not stats["invoices"]:
+            raise ValueError("None of the selected invoices has a rendered PDF")
+        stats["pages"] = out.page_count
+        if toc:
+            out.set_toc(bookmarks)
+        if saved:
+            out.saveIncr()
+        else:
+            out.save(part_path, deflate=True)
+        done = True
+    finally:
+        out.close()
+        if not done and os.path.exists(part_path):
+            os.remove(part_path)
+    os.replace(part_path, output_path)
+    return stats
+
+# ---------- Compaction ----------
+def compact_pdf(path, garbage=COMPACT_GARBAGE, subset_fonts=False, dry_run=False):
+    """Rewrites one PDF with PyMuPDF's garbage collection and stream compression.
+
+    The file is replaced atomically, and only when the rewrite is smaller.
+    With subset_fonts, embedded fonts are cut down to the glyphs used.
+    Returns (bytes_before, bytes_after).
+    """
+    import fitz
+    before = os.path.getsize(path)
+    tmp = path + ".compact"
+    try:
+        with fitz.open(path) as doc:
+            if subset_fonts:
+                doc.subset_fonts()
+            doc.save(tmp, garbage=garbage, deflate=True, deflate_images=True, deflate_fonts=True, use_objstms=1)
+        after = os.path.getsize(tmp)
+        if after < before and not dry_run:
+            os.replace(tmp, path)
+            get_archive().refresh(path) # keep the manifest's size and checksum current
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return before, min(before, after)
+
+def iter_pdf_files(paths, exclude=(RENDER_CACHE_DIR,)):
+    """PDF files under the given files and folders, skipping the excluded folders"""
+    excluded = {os.path.abspath(p) for p in exclude}
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) not in excluded)
+            for name in sorted(files):
+                if name.lower().endswith(".pdf"):
+                    yield os.path.join(root, name)
+
+def compact_archive(paths, garbage=COMPACT_GARBAGE, subset_fonts=False, dry_run=False):
+    """Compacts every PDF under paths (the render cache is left alone); returns totals and failures"""
+    stats = {"files": 0, "compacted": 0, "bytes_before": 0, "bytes_after": 0, "failed": [], "seconds": 0.0}
+    start = time.perf_counter()
+    for path in iter_pdf_files(paths):
+        try:
+            before, after = compact_pdf(path, garbage, subset_fonts, dry_run)
+        except Exception as e:
+            log.warning("Cannot compact %s: %s", path, e)
+            stats["failed"].append((path, str(e)))
+            continue
+        stats["files"] += 1
+        stats["compacted"] += after < before
+        stats["bytes_before"] += before
+        stats["bytes_after"] += after
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+def compare_profiles(items=50, runs=5, engine=None):
+    """Renders a sample invoice with every output profile; returns {profile: {"ms": median render time, "bytes": size}}"""
+    sample = LineItems()
+    for i in range(items):
+        sample.append(f"Sample item {i + 1}", i % 5 + 1, Decimal("249.50") + i)
+    subtotal, tax, total = sample.totals(DEFAULT_TAX_PERCENT)
+    results = {}
+    for profile in OUTPUT_PROFILES:
+        template = default_template(engine, profile)
+        times = []
+        for _ in range(runs + 1): # the first run warms up fonts and caches
+            buf = BytesIO()
+            start = time.perf_counter()
+            generate_pdf(1, datetime.date.today().isoformat(), DEFAULT_SELLER, "Sample Buyer\nSample Address", sample,
+                         subtotal, DEFAULT_TAX_PERCENT, tax, total, pdf_path=buf, template=template, cache=False)
+            times.append(time.perf_counter() - start)
+        times = sorted(times[1:])
+        results[profile] = {"ms": times[len(times) // 2] * 1000, "bytes": len(buf.getvalue())}
+    return results
+
+# ---------- Search ----------
+def _chunks(iterable, size):
+    chunk = []
+    for x in iterable:
+        chunk.append(x)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _unindexed_pdfs(index):
+    """(invoice_no, path) of stored PDFs, in the archive or the old flat folder, that are not indexed yet"""
+    archived = ((e["invoice_no"], e["path"]) for e in get_archive().iter_entries())
+    with os.scandir(INVOICE_DIR) as it:
+        flat = [(invoice_number_from_name(e.name), e.path) for e in it if e.is_file()]
+    for source in (archived, ((no, path) for no, path in flat if no is not None)):
+        for chunk in _chunks(source, 1000):
+            known = index.known(no for no, _ in chunk)
+            yield from ((no, path) for no, path in chunk if no not in known)
+
+def backfill_search_index(workers=None, pdfs=True):
+    """Indexes invoices recorded before the search index existed; returns counts by source.
+
+    Ledger invoices are indexed from their stored line items. Invoices the
+    ledger has no items for (imported from the old CSV) or does not know are
+    indexed from the text of their PDFs, extracted on a process pool. Already
+    indexed invoices are skipped, so an interrupted backfill can be rerun.
+    """
+    index, ledger = get_search_index(), get_ledger()
+    stats = {"ledger": 0, "pdf": 0, "unreadable": 0, "seconds": 0.0}
+    start = time.perf_counter()
+    for page in _chunks(ledger.iter_find(), 1000):
+        known = index.known(inv["invoice_no"] for inv in page)
+        page = [inv for inv in page if inv["invoice_no"] not in known]
+        items = ledger.item_descriptions(inv["invoice_no"] for inv in page)
+        rows = [(inv["invoice_no"], inv["date"], inv["buyer"], inv["buyer_address"], inv["notes"],
+                 "\n".join(items[inv["invoice_no"]]), "ledger") for inv in page if inv["invoice_no"] in items]
+        index.add_many(rows)
+        stats["ledger"] += len(rows)
+    log.info("Indexed %d invoices from the ledger", stats["ledger"])
+
+    if pdfs:
+        pending = {}
+        def paths():
+            for no, path in _unindexed_pdfs(index):
+                pending[path] = no
+                yield path
+        with multiprocessing.Pool(workers) as pool:
+            rows = []
+            for path, text in pool.imap(extract_pdf_text, paths(), chunksize=8):
+                no = pending.pop(path)
+                if text is None:
+                    log.warning("Cannot read %s", path)
+                    stats["unreadable"] += 1
+                    continue
+                doc = parse_invoice_text(text)
+                inv = ledger.get_invoice(no)
+                if inv is not None: # the ledger's buyer and date are authoritative
+                    doc.update(buyer=inv["buyer"], date=inv["date"])
+                rows.append((no, doc["date"], doc["buyer"], doc["buyer_address"], doc["notes"], doc["items"], "pdf"))
+                if len(rows) >= 500:
+                    index.add_many(rows)
+                    stats["pdf"] += len(rows)
+                    log.info("Indexed %d invoices from their PDFs", stats["pdf"])
+                    rows = []
+            index.add_many(rows)
+            stats["pdf"] += len(rows)
+    if stats["ledger"] or stats["pdf"]:
+        index.optimize()
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+# ---------- Product Catalog ----------
+_CATALOG_LOADER = None
+
+def load_catalog():
+    """Opens the catalog, re-imports CATALOG_CSV if it changed and reads the lookup indexes into memory"""
+    catalog = get_catalog()
+    with tracing.span("catalog.load"):
+        try:
+            stats = catalog.sync_csv(CATALOG_CSV)
+        except (OSError, ValueError, csv.Error) as e:
+            log.warning("Cannot import %s: %s", CATALOG_CSV, e)
+        else:
+            if stats:
+                log.info("Imported %d products from %s (%d rows skipped)", stats["imported"], CATALOG_CSV, stats["skipped"])
+        catalog.warm()
+    return catalog
+
+def start_catalog_loading():
+    """Loads the catalog on a background thread, once; catalog_if_loaded() returns it when it is done"""
+    global _CATALOG_LOADER
+    if _CATALOG_LOADER is None:
+        _CATALOG_LOADER = threading.Thread(target=load_catalog, name="catalog", daemon=True)
+        _CATALOG_LOADER.start()
+
+def catalog_if_loaded():
+    """The product catalog if the background load has finished, else None (never waits)"""
+    if _CATALOG_LOADER is None or _CATALOG_LOADER.is_alive():
+        return None
+    return _CATALOG
+
 # ... (print_pdf and preview_pdf functions remain the same as the user's working versions) ...
 
+def send_to_printer(file_path, printer_name=None):
+    """Prints one PDF right away, bypassing the print queue, and returns a status message (raises on errors)"""
+    if platform.system() == "Windows" and not load_win32() and not os.environ.get("INVOICE_SPOOLER"):
+        raise RuntimeError("pywin32 not installed.\nCannot print directly on Windows.")
+    with tracing.span("print.spool"):
+        default_spooler()(file_path, printer_name)
+    return f"Invoice sent to {printer_name or 'the default printer'}."
+
 def print_pdf(file_path, printer_name=None):
+    """Prints on the calling thread and reports the outcome in a message box"""
     try:
-        system = platform.system()
-        if system == "Windows":
-            if WIN32_AVAILABLE:
-                if printer_name is None:
-                    printer_name = win32print.GetDefaultPrinter()
-
-                win32api.ShellExecute(
-                    0,
-                    "printto",
-                    file_path,
-                    f'"{printer_name}"',
-                    ".",
-                    0
-                )
-                messagebox.showinfo("Printing Success", f"Invoice sent to **{printer_name}** via Standard Print method.")
-            else:
-                messagebox.showwarning("Missing pywin32", "pywin32 not installed.\nCannot print directly on Windows.")
-        
-        elif system in ["Linux", "Darwin"]:
-            subprocess.call(["lp", file_path])
-            messagebox.showinfo("Printing", "Invoice sent to default system printer ('lp' command used).")
-        else:
-            messagebox.showinfo("Print Error", f"Unsupported OS.\nPDF saved at {file_path}")
+        messagebox.showinfo("Printing", send_to_printer(file_path, printer_name))
     except Exception as e:
         messagebox.showerror("Print Error", f"Could not print automatically.\nPDF saved at {file_path}\nError: {e}")
 
-def preview_pdf(file_path):
+class PageImageCache:
+    """LRU cache of rendered preview pages keyed by (doc_hash, page_no, zoom), bounded in bytes.
+
+    The background worker fills it while the UI thread reads it, so access is locked.
+    """
+
+    def __init__(self, max_bytes=PREVIEW_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            img = self._images.get(key)
+            if img is not None:
+                self._images.move_to_end(key)
+            return img
+
+    def put(self, key, img):
+        with self._lock:
+            if key in self._images:
+                self.size -= self._nbytes(self._images.pop(key))
+            self._images[key] = img
+            self.size += self._nbytes(img)
+            while self.size > self.max_bytes and len(self._images) > 1:
+                _, old = self._images.popitem(last=False)
+                self.size -= self._nbytes(old)
+
+    @staticmethod
+    def _nbytes(img):
+        return img.width * img.height * 3
+
+_PAGE_CACHE = PageImageCache()
+
+def rasterize_page(doc, page_no, zoom):
+    """Renders one page of an open fitz document to an RGB PIL image at the given zoom"""
+    import fitz
+    from PIL import Image
+    scale = zoom * PREVIEW_SCREEN_SCALE
+    with tracing.span("preview.rasterize", page=page_no, zoom=zoom):
+        pix = doc.load_page(page_no).get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+        return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+def pdf_digest(pdf_bytes):
+    return hashlib.sha1(pdf_bytes).hexdigest()
+
+def warm_preview_cache(pdf_bytes, pages=2, zoom=1.0, cache=_PAGE_CACHE, check_cancelled=None):
+    """Rasterises the first pages of a PDF into the preview cache (safe off the UI thread)"""
+    import fitz
+    doc_hash = pdf_digest(pdf_bytes)
+    with tracing.span("preview.open"):
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
     try:
-        doc = fitz.open(file_path)
-        page = doc.load_page(0)
-        # Use a higher resolution for a better preview
-        pix = page.get_pixmap(matrix=fitz.Matrix(2.0, 2.0)) 
-        
-        img_data = pix.samples
-        img = Image.frombytes("RGB", [pix.width, pix.height], img_data)
-
-        top = Toplevel()
-        top.title("Invoice Preview")
+        for page_no in range(min(pages, doc.page_count)):
+            if check_cancelled is not None:
+                check_cancelled()
+            key = (doc_hash, page_no, zoom)
+            if cache.get(key) is None:
+                cache.put(key, rasterize_page(doc, page_no, zoom))
+    finally:
+        doc.close()
+
+class PreviewWindow:
+    """Scrollable multi-page preview that only renders the pages currently in view"""
+    PAGE_GAP = 12
+
+    def __init__(self, pdf_bytes, title="Invoice Preview", zoom=1.0, cache=_PAGE_CACHE):
+        import fitz
+        with tracing.span("preview.open"):
+            self.doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        self.doc_hash = pdf_digest(pdf_bytes)
+        self.page_sizes = [(p.rect.width, p.rect.height) for p in self.doc]
+        self.cache = cache
+        self.zoom = zoom
+        self._page_tops = []
+        self._shown = {} # page_no -> (canvas item, PhotoImage) for pages currently on the canvas
+        self._render_pending = False
+
+        self.top = top = Toplevel()
+        top.title(title)
         top.configure(bg='#333333') # Dark background for the preview window
-        
-        tk_img = ImageTk.PhotoImage(img)
-        
+        top.protocol("WM_DELETE_WINDOW", self.close)
+
+        toolbar = ttk.Frame(top, padding=4)
+        toolbar.pack(side=TOP, fill=X)
+        ttk.Button(toolbar, text="−", width=3, command=lambda: self.step_zoom(-1)).pack(side=LEFT, padx=2)
+        self.zoom_var = StringVar(value=f"{int(zoom*100)}%")
+        zoom_box = ttk.Combobox(toolbar, textvariable=self.zoom_var, width=6, state='readonly',
+                                values=[f"{int(z*100)}%" for z in PREVIEW_ZOOM_LEVELS])
+        zoom_box.pack(side=LEFT, padx=2)
+        zoom_box.bind("<<ComboboxSelected>>", lambda e: self.set_zoom(int(self.zoom_var.get().rstrip('%'))/100))
+        ttk.Button(toolbar, text="+", width=3, command=lambda: self.step_zoom(1)).pack(side=LEFT, padx=2)
+        self.page_var = StringVar()
+        ttk.Label(toolbar, textvariable=self.page_var).pack(side=RIGHT, padx=8)
+
         # Use a fixed canvas size for better control over the preview
-        canvas = Canvas(top, width=700, height=800, bg='#444444')
-        v_scroll = ttk.Scrollbar(top, orient="vertical", command=canvas.yview)
+        self.canvas = canvas = Canvas(top, width=700, height=800, bg='#444444', highlightthickness=0)
+        v_scroll = ttk.Scrollbar(top, orient="vertical", command=self._yview)
         h_scroll = ttk.Scrollbar(top, orient="horizontal", command=canvas.xview)
-        
         v_scroll.pack(side=RIGHT, fill=Y)
         h_scroll.pack(side=BOTTOM, fill=X)
         canvas.pack(side=LEFT, fill=BOTH, expand=True, padx=5, pady=5)
-
         canvas.configure(yscrollcommand=v_scroll.set, xscrollcommand=h_scroll.set)
-        
-        img_frame = Frame(canvas, bg='white', relief='raised', bd=1) 
-        # Center the image frame within the canvas
-        canvas.create_window((10, 10), window=img_frame, anchor="nw", tags="image_frame")
-        
-        preview_label = Label(img_frame, image=tk_img, bg='white')
-        preview_label.pack(padx=15, pady=15)
 
-        img_frame.update_idletasks()
-        # Set scrollregion based on image frame size
-        canvas.config(scrollregion=canvas.bbox("all")) 
+        canvas.bind("<Configure>", lambda e: self.schedule_render())
+        top.bind("<MouseWheel>", lambda e: self._yview("scroll", -1 if e.delta > 0 else 1, "units"))
+        top.bind("<Button-4>", lambda e: self._yview("scroll", -1, "units"))
+        top.bind("<Button-5>", lambda e: self._yview("scroll", 1, "units"))
+        top.bind("<Control-plus>", lambda e: self.step_zoom(1))
+        top.bind("<Control-minus>", lambda e: self.step_zoom(-1))
+
+        self._layout()
 
-        top.image = tk_img
-        
         top.update_idletasks()
         w = top.winfo_screenwidth()
         h = top.winfo_screenheight()
@@ -220,8 +1364,640 @@ def preview_pdf(file_path):
         y = h/2 - size[1]/2
         top.geometry("+%d+%d" % (x, y))
 
+    def close(self):
+        self._clear_shown()
+        self.doc.close()
+        self.top.destroy()
+
+    # --- Layout ---
+
+    def _layout(self):
+        """Places a blank frame for every page at the current zoom; images are added lazily"""
+        self._clear_shown()
+        self.canvas.delete("all")
+        scale = self.zoom * PREVIEW_SCREEN_SCALE
+        y = self.PAGE_GAP
+        self._page_tops = []
+        max_w = 0
+        for i, (pw, ph) in enumerate(self.page_sizes):
+            w, h = int(pw * scale), int(ph * scale)
+            self._page_tops.append(y)
+            self.canvas.create_rectangle(self.PAGE_GAP, y, self.PAGE_GAP + w, y + h, fill='white', outline='#222222')
+            y += h + self.PAGE_GAP
+            max_w = max(max_w, w)
+        self._page_bottoms = [t + int(self.page_sizes[i][1] * scale) for i, t in enumerate(self._page_tops)]
+        self.canvas.config(scrollregion=(0, 0, max_w + 2*self.PAGE_GAP, y))
+        self.schedule_render()
+
+    def _clear_shown(self):
+        for item, _ in self._shown.values():
+            self.canvas.delete(item)
+        self._shown.clear()
+
+    # --- Zoom / scrolling ---
+
+    def set_zoom(self, zoom):
+        if zoom == self.zoom:
+            return
+        first = self.canvas.yview()[0]
+        self.zoom = zoom
+        self.zoom_var.set(f"{int(zoom*100)}%")
+        self._layout()
+        self.canvas.yview_moveto(first)
+
+    def step_zoom(self, direction):
+        levels = PREVIEW_ZOOM_LEVELS
+        idx = min(range(len(levels)), key=lambda i: abs(levels[i] - self.zoom))
+        self.set_zoom(levels[max(0, min(len(levels) - 1, idx + direction))])
+
+    def _yview(self, *args):
+        self.canvas.yview(*args)
+        self.schedule_render()
+
+    def schedule_render(self):
+        # Coalesce bursts of scroll/resize events into one render pass
+        if not self._render_pending:
+            self._render_pending = True
+            self.top.after_idle(self._render_visible)
+
+    # --- Rendering ---
+
+    def _visible_pages(self):
+        top = self.canvas.canvasy(0)
+        bottom = self.canvas.canvasy(self.canvas.winfo_height())
+        return [i for i in range(len(self._page_tops))
+                if self._page_bottoms[i] >= top and self._page_tops[i] <= bottom]
+
+    def _render_visible(self):
+        from PIL.ImageTk import PhotoImage
+        self._render_pending = False
+        if not self.canvas.winfo_exists():
+            return
+        visible = self._visible_pages()
+        if not visible:
+            return
+        # Keep one page either side ready so scrolling does not flash blank frames
+        wanted = set(range(max(0, visible[0] - 1), min(len(self._page_tops), visible[-1] + 2)))
+
+        for page_no in list(self._shown):
+            if page_no not in wanted:
+                self.canvas.delete(self._shown.pop(page_no)[0])
+
+        for page_no in sorted(wanted):
+            if page_no in self._shown:
+                continue
+            key = (self.doc_hash, page_no, self.zoom)
+            img = self.cache.get(key)
+            if img is None:
+                img = rasterize_page(self.doc, page_no, self.zoom)
+                self.cache.put(key, img)
+            tk_img = PhotoImage(img)
+            item = self.canvas.create_image(self.PAGE_GAP, self._page_tops[page_no], image=tk_img, anchor="nw")
+            self._shown[page_no] = (item, tk_img)
+
+        self.page_var.set(f"Page {visible[0] + 1} of {len(self._page_tops)}")
+
+class ItemTable:
+    """Keeps the items Treeview in step with the item list, one row at a time.
+
+    Up to VIRTUAL_THRESHOLD items every item has its own Treeview row. Above that
+    the Treeview only holds a fixed set of row slots for the visible window, which
+    are refilled as the user scrolls, so very long itemised bills stay responsive.
+    """
+    VIRTUAL_THRESHOLD = 2000
+
+    def __init__(self, tree, scrollbar, get_items, row_height=28):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.get_items = get_items
+        self.row_height = row_height
+        self.virtual = False
+        self.offset = 0       # virtual mode: index of the item in the first slot
+        self.selected = None  # virtual mode: index of the selected item
+        self._iids = []       # normal mode: Treeview row of each item
+        self._slots = []      # virtual mode: Treeview rows of the visible window
+        self._use_tree_scrolling()
+
+        tree.bind("<<TreeviewSelect>>", self._on_select, add="+")
+        tree.bind("<Configure>", lambda e: self._refill() if self.virtual else None, add="+")
+        for seq in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            tree.bind(seq, self._on_wheel, add="+")
+        tree.bind("<Up>", lambda e: self._on_arrow(-1), add="+")
+        tree.bind("<Down>", lambda e: self._on_arrow(1), add="+")
+
+    @staticmethod
+    def row_values(it):
+        return (it['desc'], it['qty'], MONEY.format(it['unit_price']), MONEY.format(line_total(it)))
+
+    # --- Change notifications (call after modifying the item list) ---
+
+    def reset(self):
+        """Rebuilds the view from scratch, e.g. after the item list was replaced"""
+        items = self.get_items()
+        self.tree.delete(*self.tree.get_children())
+        self._iids, self._slots = [], []
+        self.offset, self.selected = 0, None
+        self.virtual = len(items) > self.VIRTUAL_THRESHOLD
+        if self.virtual:
+            self._use_virtual_scrolling()
+            self._refill()
+        else:
+            self._use_tree_scrolling()
+            prices, amounts = item_money_columns(items)
+            self._iids = [self.tree.insert("", END, values=(it['desc'], it['qty'], price, amount))
+                          for it, price, amount in zip(items, prices, amounts)]
+
+    def row_inserted(self, index):
+        items = self.get_items()
+        if not self.virtual and len(items) > self.VIRTUAL_THRESHOLD:
+            self.reset()
+        elif self.virtual:
+            if self.selected is not None and self.selected >= index:
+                self.selected += 1
+            if index == len(items) - 1:
+                self.offset = len(items) # show the newly appended row; _refill clamps it
+            self._refill()
+        else:
+            iid = self.tree.insert("", index, values=self.row_values(items[index]))
+            self._iids.insert(index, iid)
+            self.tree.see(iid)
+
+    def row_updated(self, index):
+        values = self.row_values(self.get_items()[index])
+        if self.virtual:
+            slot = index - self.offset
+            if 0 <= slot < len(self._slots):
+                self.tree.item(self._slots[slot], values=values)
+        else:
+            self.tree.item(self._iids[index], values=values)
+
+    def row_deleted(self, index):
+        if self.virtual:
+            if len(self.get_items()) < self.VIRTUAL_THRESHOLD // 2:
+                self.reset()
+                return
+            if self.selected == index:
+                self.selected = None
+            elif self.selected is not None and self.selected > index:
+                self.selected -= 1
+            self._refill()
+        else:
+            self.tree.delete(self._iids.pop(index))
+
+    def selected_index(self):
+        """Index in the item list of the selected row, or None"""
+        if self.virtual:
+            return self.selected
+        sel = self.tree.selection()
+        return self.tree.index(sel[0]) if sel else None
+
+    # --- Virtual window ---
+
+    def _use_tree_scrolling(self):
+        self.scrollbar.configure(command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.scrollbar.set)
+
+    def _use_virtual_scrolling(self):
+        self.tree.configure(yscrollcommand="")
+        self.scrollbar.configure(command=self._scroll)
+
+    def _visible_rows(self):
+        # One row's worth of height goes to the column headings
+        return max(1, self.tree.winfo_height() // self.row_height - 1)
+
+    def _refill(self):
+        items = self.get_items()
+        n = self._visible_rows()
+        while len(self._slots) < n:
+            self._slots.append(self.tree.insert("", END, values=()))
+        while len(self._slots) > n:
+            self.tree.delete(self._slots.pop())
+
+        self.offset = max(0, min(self.offset, len(items) - n))
+        for k, iid in enumerate(self._slots):
+            i = self.offset + k
+            self.tree.item(iid, values=self.row_values(items[i]) if i < len(items) else ())
+
+        slot = None if self.selected is None else self.selected - self.offset
+        if slot is not None and 0 <= slot < n:
+            self.tree.selection_set(self._slots[slot])
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+
+        total = max(1, len(items))
+        self.scrollbar.set(self.offset / total, min(1.0, (self.offset + n) / total))
+
+    def _scroll(self, *args):
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * len(self.get_items()))
+        elif args[0] == "scroll":
+            self.offset += int(args[1]) * (len(self._slots) if args[2] == "pages" else 1)
+        self._refill()
+
+    def _on_wheel(self, event):
+        if not self.virtual:
+            return None
+        up = event.num == 4 or getattr(event, "delta", 0) > 0
+        self._scroll("scroll", -3 if up else 3, "units")
+        return "break"
+
+    def _on_arrow(self, step):
+        if not self.virtual:
+            return None
+        items = self.get_items()
+        if items:
+            cur = self.selected if self.selected is not None else self.offset
+            self.selected = max(0, min(len(items) - 1, cur + step))
+            if self.selected < self.offset:
+                self.offset = self.selected
+            elif self.selected >= self.offset + len(self._slots):
+                self.offset = self.selected - len(self._slots) + 1
+            self._refill()
+        return "break"
+
+    def _on_select(self, event):
+        if self.virtual:
+            sel = self.tree.selection()
+            if sel and sel[0] in self._slots:
+                self.selected = self.offset + self._slots.index(sel[0])
+
+def preview_pdf(file_path=None, pdf_bytes=None, title="Invoice Preview"):
+    """Opens a preview window for a PDF, read either from file_path or from in-memory pdf_bytes"""
+    try:
+        if pdf_bytes is None:
+            with open(file_path, "rb") as f:
+                pdf_bytes = f.read()
+        return PreviewWindow(pdf_bytes, title=title)
     except Exception as e:
         messagebox.showerror("Preview Error", f"Cannot preview PDF:\n{e}\n\nEnsure 'Pillow' (pip install Pillow) and 'PyMuPDF' (pip install PyMuPDF) are installed.")
+        return None
+
+# ---------- Catalog Autocomplete ----------
+class CatalogAutocomplete:
+    """Drop-down of catalog products under a description entry, updated on every keystroke.
+
+    Picking a product (click, or Down then Return) fills in its name and unit
+    price. Nothing is shown until the catalog has finished loading.
+    """
+
+    def __init__(self, entry, desc_var, price_var):
+        self.entry, self.desc_var, self.price_var = entry, desc_var, price_var
+        self.matches = []
+        self._filling = False
+        # A child of the dialog itself, so the list may hang over the fields below the entry
+        self.listbox = Listbox(entry.winfo_toplevel(), font=('Helvetica', 10), activestyle="none", exportselection=False)
+        desc_var.trace_add("write", lambda *args: self._update())
+        entry.bind("<Down>", self._enter_list)
+        entry.bind("<Escape>", lambda e: self.hide())
+        entry.bind("<FocusOut>", lambda e: entry.after_idle(self._hide_unless_focused))
+        self.listbox.bind("<ButtonRelease-1>", self._pick)
+        self.listbox.bind("<Return>", self._pick)
+        self.listbox.bind("<Escape>", lambda e: (self.hide(), entry.focus_set()))
+        self.listbox.bind("<Up>", self._leave_list)
+        start_catalog_loading()
+
+    def _update(self):
+        if self._filling:
+            return
+        catalog = catalog_if_loaded()
+        text = self.desc_var.get()
+        if catalog is None or not text.strip():
+            self.hide()
+            return
+        with tracing.span("catalog.suggest"):
+            try:
+                self.matches = catalog.suggest(text, CATALOG_SUGGESTIONS)
+            except Exception as e:
+                log.warning("Catalog lookup failed: %s", e)
+                self.matches = []
+        if not self.matches:
+            self.hide()
+            return
+        self.listbox.delete(0, END)
+        self.listbox.insert(END, *(f"{m['name']}  ({MONEY.format(m['unit_price'])})" for m in self.matches))
+        self.listbox.configure(height=len(self.matches))
+        self.listbox.place(in_=self.entry, x=0, rely=1.0, relwidth=1.0)
+        self.listbox.lift()
+
+    def hide(self):
+        self.listbox.place_forget()
+
+    def _hide_unless_focused(self):
+        if self.entry.focus_get() is not self.listbox:
+            self.hide()
+
+    def _enter_list(self, event):
+        if not self.listbox.winfo_ismapped():
+            return None
+        self.listbox.focus_set()
+        self.listbox.selection_clear(0, END)
+        self.listbox.selection_set(0)
+        self.listbox.activate(0)
+        return "break"
+
+    def _leave_list(self, event):
+        if self.listbox.curselection() == (0,):
+            self.entry.focus_set()
+            return "break"
+        return None
+
+    def _pick(self, event):
+        sel = self.listbox.curselection()
+        if not sel:
+            return None
+        product = self.matches[sel[0]]
+        self._filling = True
+        try:
+            self.desc_var.set(product["name"])
+            self.price_var.set(str(product["unit_price"]))
+        finally:
+            self._filling = False
+        self.hide()
+        self.entry.focus_set()
+        self.entry.icursor(END)
+        return "break"
+
+# ---------- Reports Window ----------
+class ReportsWindow:
+    """Revenue, top buyer, tax and ageing tables over the ledger, computed on the background worker"""
+    AMOUNT_COLUMNS = ("subtotal", "tax", "total", "taxable")
+
+    def __init__(self, root, tasks):
+        self.tasks = tasks
+        self.trees = {}
+        self.top = top = Toplevel(root)
+        top.title("Reports")
+        top.geometry("900x600")
+
+        today = datetime.date.today()
+        self.date_from = StringVar(value=today.replace(month=1, day=1).isoformat())
+        self.date_to = StringVar(value=today.isoformat())
+        self.buyer = StringVar()
+        bar = ttk.Frame(top, padding=6)
+        bar.pack(side=TOP, fill=X)
+        for label, var, width in (("From:", self.date_from, 12), ("To:", self.date_to, 12), ("Buyer:", self.buyer, 24)):
+            ttk.Label(bar, text=label).pack(side=LEFT, padx=(8, 2))
+            ttk.Entry(bar, textvariable=var, width=width).pack(side=LEFT)
+        ttk.Button(bar, text="🔄 Refresh", command=self.refresh).pack(side=LEFT, padx=10)
+
+        self.summary_var = StringVar()
+        ttk.Label(top, textvariable=self.summary_var, padding=(10, 2)).pack(side=TOP, fill=X)
+        self.notebook = ttk.Notebook(top)
+        self.notebook.pack(side=TOP, fill=BOTH, expand=True, padx=6, pady=6)
+        self.refresh()
+
+    def refresh(self):
+        date_from, date_to, buyer = self.date_from.get().strip(), self.date_to.get().strip(), self.buyer.get().strip()
+        try:
+            for d in (date_from, date_to):
+                if d:
+                    datetime.date.fromisoformat(d)
+        except ValueError:
+            messagebox.showerror("Reports", "Dates must be in YYYY-MM-DD format.", parent=self.top)
+            return
+        self.summary_var.set("Updating…")
+
+        def work(task):
+            import reports
+            snapshot = get_report_snapshot()
+            task.progress("Reports: reading new ledger rows…")
+            snapshot.refresh()
+            task.progress("Reports: aggregating…")
+            df = snapshot.select(date_from or None, date_to or None, buyer or None)
+            return reports.summary(df), reports.build_report(df)
+
+        def failed(e):
+            if not isinstance(e, TaskCancelled) and self.top.winfo_exists():
+                self.summary_var.set("")
+                messagebox.showerror("Reports", f"Could not build the reports:\n{e}", parent=self.top)
+
+        self.tasks.submit("Reports", work, self._show, failed)
+
+    def _cell(self, column, value):
+        if column == "share":
+            return f"{value:.1%}"
+        if column == "tax_percent":
+            return f"{value:.2f}%"
+        return str(value)
+
+    def _tree(self, title, columns):
+        tree = self.trees.get(title)
+        if tree is None:
+            frame = ttk.Frame(self.notebook)
+            self.notebook.add(frame, text=title)
+            tree = self.trees[title] = ttk.Treeview(frame, columns=list(columns), show='headings')
+            for col in columns:
+                tree.heading(col, text=col.replace("_", " ").title())
+                tree.column(col, anchor=E if col != columns[0] else W, width=120)
+            scroll = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+            tree.configure(yscrollcommand=scroll.set)
+            scroll.pack(side=RIGHT, fill=Y)
+            tree.pack(side=LEFT, fill=BOTH, expand=True)
+        return tree
+
+    def _show(self, result):
+        if not self.top.winfo_exists():
+            return # closed while the report was being built
+        summary, tables = result
+        period = f"{summary['first_date']} to {summary['last_date']}" if summary["first_date"] else "no dated invoices"
+        self.summary_var.set(f"{summary['invoices']} invoices from {summary['buyers']} buyers ({period})   ·   "
+                             f"Subtotal {MONEY.format(summary['subtotal'])}   ·   Tax {MONEY.format(summary['tax'])}   ·   "
+                             f"Total {MONEY.format(summary['total'])}")
+        for title, df in tables.items():
+            tree = self._tree(title, tuple(df.columns))
+            tree.delete(*tree.get_children())
+            # Amount columns are formatted a column at a time, everything else per cell
+            columns = [MONEY.format_many(df[col].tolist()) if col in self.AMOUNT_COLUMNS
+                       else [self._cell(col, v) for v in df[col].tolist()] for col in df.columns]
+            for values in zip(*columns):
+                tree.insert("", END, values=values)
+
+# ---------- Search Window ----------
+class SearchWindow:
+    """Search-as-you-type over the full-text index; double-click an invoice to preview its stored PDF"""
+
+    def __init__(self, root):
+        self._job = None
+        self.top = top = Toplevel(root)
+        top.title("Search Invoices")
+        top.geometry("900x550")
+
+        self.query, self.buyer, self.date_from, self.date_to = StringVar(), StringVar(), StringVar(), StringVar()
+        bar = ttk.Frame(top, padding=6)
+        bar.pack(side=TOP, fill=X)
+        for label, var, width in (("Search:", self.query, 30), ("Buyer:", self.buyer, 20),
+                                  ("From:", self.date_from, 12), ("To:", self.date_to, 12)):
+            ttk.Label(bar, text=label).pack(side=LEFT, padx=(8, 2))
+            entry = ttk.Entry(bar, textvariable=var, width=width)
+            entry.pack(side=LEFT)
+            var.trace_add("write", lambda *args: self._schedule())
+            if var is self.query:
+                entry.focus_set()
+
+        self.status_var = StringVar(value="Words match item descriptions, buyers, addresses and notes; "
+                                          "item:cable or buyer:acme limits a word to one field.")
+        ttk.Label(top, textvariable=self.status_var, padding=(10, 2)).pack(side=TOP, fill=X)
+        frame = ttk.Frame(top)
+        frame.pack(side=TOP, fill=BOTH, expand=True, padx=6, pady=6)
+        self.tree = ttk.Treeview(frame, columns=("no", "date", "buyer", "match"), show='headings')
+        for col, text, width, anchor in (("no", "Invoice", 80, E), ("date", "Date", 100, W),
+                                         ("buyer", "Buyer", 200, W), ("match", "Match", 480, W)):
+            self.tree.heading(col, text=text)
+            self.tree.column(col, width=width, anchor=anchor, stretch=(col == "match"))
+        scroll = ttk.Scrollbar(frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scroll.set)
+        scroll.pack(side=RIGHT, fill=Y)
+        self.tree.pack(side=LEFT, fill=BOTH, expand=True)
+        self.tree.bind("<Double-1>", self._open)
+
+    def _schedule(self):
+        if self._job is not None:
+            self.top.after_cancel(self._job)
+        self._job = self.top.after(SEARCH_DELAY_MS, self._search)
+
+    def _search(self):
+        self._job = None
+        dates = [d.get().strip() for d in (self.date_from, self.date_to)]
+        try:
+            for d in dates:
+                if d:
+                    datetime.date.fromisoformat(d)
+        except ValueError:
+            self.status_var.set("Dates must be in YYYY-MM-DD format.")
+            return
+        start = time.perf_counter()
+        try:
+            results = get_search_index().search(self.query.get(), buyer=self.buyer.get(), date_from=dates[0] or None,
+                                                date_to=dates[1] or None, limit=SEARCH_RESULTS)
+        except Exception as e:
+            self.status_var.set(f"Search failed: {e}")
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+        self.tree.delete(*self.tree.get_children())
+        for r in results:
+            self.tree.insert("", END, iid=str(r["invoice_no"]),
+                             values=(f"{r['invoice_no']:04d}", r["date"], r["buyer"], r["snippet"]))
+        more = "+" if len(results) >= SEARCH_RESULTS else ""
+        self.status_var.set(f"{len(results)}{more} invoices in {elapsed:.1f} ms")
+
+    def _open(self, event=None):
+        sel = self.tree.selection()
+        if not sel:
+            return
+        inv_no = int(sel[0])
+        inv = get_ledger().get_invoice(inv_no)
+        path = find_invoice_pdf(inv_no, inv["pdf_path"] if inv else None)
+        if path is None:
+            messagebox.showinfo("Search", f"Invoice {inv_no:04d} has no stored PDF.", parent=self.top)
+            return
+        preview_pdf(file_path=path, title=f"Invoice {inv_no:04d}")
+
+# ---------- Background Tasks ----------
+class TaskCancelled(Exception):
+    """Raised inside a background task once the user has cancelled it"""
+
+class BackgroundTask:
+    """Handle for one queued job. Its work function receives the task and may report progress."""
+
+    def __init__(self, label, work, on_done, on_error):
+        self.label = label
+        self.status = label
+        self.work = work
+        self.on_done = on_done
+        self.on_error = on_error
+        self._cancel = threading.Event()
+        self._updates = None
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise TaskCancelled(f"{self.label} cancelled")
+
+    def progress(self, status):
+        """Called from the worker: publishes a status line and aborts if cancelled"""
+        self.check_cancelled()
+        self._updates.put(("progress", self, status))
+
+class BackgroundTasks:
+    """Runs slow jobs (rendering, rasterising, printing) one at a time on a worker thread.
+
+    The worker never touches Tk. Progress and results go through a queue that the
+    UI thread drains with after(), so on_done/on_error/on_status always run on the
+    UI thread and the window stays responsive while jobs run.
+    """
+
+    def __init__(self, root, on_status=None):
+        self.root = root
+        self.on_status = on_status
+        self.pending = [] # queued and running tasks, oldest first
+        self._jobs = queue.Queue()
+        self._updates = queue.Queue()
+        self._poll_job = None
+        self._worker = threading.Thread(target=self._run, name="invoice-worker", daemon=True)
+        self._worker.start()
+
+    def submit(self, label, work, on_done=None, on_error=None):
+        """Queues work(task); on_done(result) or on_error(exc) is later called on the UI thread"""
+        task = BackgroundTask(label, work, on_done, on_error)
+        task._updates = self._updates
+        self.pending.append(task)
+        self._jobs.put(task)
+        self._notify()
+        if self._poll_job is None:
+            self._poll_job = self.root.after(TASK_POLL_MS, self._poll)
+        return task
+
+    @property
+    def current(self):
+        return self.pending[0] if self.pending else None
+
+    def cancel_current(self):
+        if self.pending:
+            self.pending[0].cancel()
+
+    def _run(self):
+        while True:
+            task = self._jobs.get()
+            try:
+                task.check_cancelled()
+                result = ("done", task, task.work(task))
+            except BaseException as e:
+                result = ("error", task, e)
+            self._updates.put(result)
+
+    def _poll(self):
+        self._poll_job = None
+        while True:
+            try:
+                kind, task, value = self._updates.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                task.status = value
+            else:
+                self.pending.remove(task)
+                callback = task.on_done if kind == "done" else task.on_error
+                try:
+                    if callback is not None:
+                        callback(value)
+                    elif kind == "error" and not isinstance(value, TaskCancelled):
+                        messagebox.showerror("Error", f"{task.label} failed:\n{value}")
+                except Exception:
+                    log.exception("Callback for '%s' failed", task.label)
+            self._notify()
+        # A callback may have run a nested event loop (dialogs) that already rescheduled us
+        if self.pending and self._poll_job is None:
+            self._poll_job = self.root.after(TASK_POLL_MS, self._poll)
+
+    def _notify(self):
+        if self.on_status is not None:
+            self.on_status(self.current, len(self.pending))
 
 
 # ---------- Main App ----------
@@ -232,16 +2008,18 @@ class InvoiceApp:
         root.geometry("1100x800")
         
         # --- UI Variables ---
-        self.seller_text = StringVar(value="Your Business Name\n123 Business St\nCity, State, ZIP\nPhone: (555) 123-4567\nEmail: info@yourbusiness.com")
+        self.seller_text = StringVar(value=DEFAULT_SELLER)
         self.buyer_name = StringVar()
         self.buyer_address = StringVar()
         self.invoice_number = IntVar(value=next_invoice_number())
         self.invoice_date = StringVar(value=datetime.date.today().isoformat())
-        self.tax_percent = DoubleVar(value=18.0)
-        self.subtotal = StringVar(value=currency_fmt(0.0))
-        self.tax_amount = StringVar(value=currency_fmt(0.0))
-        self.total_amount = StringVar(value=currency_fmt(0.0))
-        self.items = []
+        self.tax_percent = DoubleVar(value=DEFAULT_TAX_PERCENT)
+        self.subtotal = StringVar(value=MONEY.format(0))
+        self.tax_amount = StringVar(value=MONEY.format(0))
+        self.total_amount = StringVar(value=MONEY.format(0))
+        self.items = LineItems() # keeps a running subtotal, adjusted on every item change
+        self._recalc_job = None
+        self._idle_status = "" # shown in the status line once the background queue is empty
         self.last_pdf_path = None 
 
         # --- Color Palette (DEFINED AS INSTANCE VARIABLES FOR GLOBAL ACCESS) ---
@@ -257,14 +2035,47 @@ class InvoiceApp:
         self.setup_styles()
         self.build_ui()
         self.update_totals()
+        self.tasks = BackgroundTasks(root, on_status=self._show_task_status)
+        self.print_queue = get_print_queue().start()
+        self._print_poll_job = None
+        self._print_failures_seen = self.print_queue.counts()["failed"]
+        self._poll_print_queue()
         
-        self.root.bind("<KeyRelease>", self._recalculate_on_key_release)
+        self.tax_entry.bind("<KeyRelease>", self._recalculate_on_key_release)
         self.tree.bind("<Double-1>", self._on_item_double_click)
+        root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def _show_task_status(self, task, pending):
+        if task is None:
+            self.progress_bar.stop()
+            self.status_var.set(self._idle_status)
+            self._idle_status = ""
+            self.cancel_btn.state(['disabled'])
+            return
+        queued = f" (+{pending - 1} queued)" if pending > 1 else ""
+        self.status_var.set(("Cancelling: " if task.cancelled else "") + task.status + queued)
+        self.progress_bar.start(15)
+        self.cancel_btn.state(['!disabled'])
+
+    def on_close(self):
+        if self.tasks.pending and not messagebox.askyesno(
+                "Quit", "Invoices are still being rendered.\nQuit anyway and abandon them?"):
+            return
+        # Queued prints are kept on disk and resume the next time the app starts
+        self.print_queue.stop()
+        if _RENDER_CACHE is not None:
+            log.info("Render cache: %s", _RENDER_CACHE.stats())
+        self.root.destroy()
 
     def _recalculate_on_key_release(self, event):
-        # Only recalculate if key is released in the tax entry or a text widget
-        if event.widget == self.tax_entry or isinstance(event.widget, Entry):
-            self.update_totals()
+        # Only the tax rate affects the totals; coalesce a burst of keystrokes into one update
+        if self._recalc_job is not None:
+            self.root.after_cancel(self._recalc_job)
+        self._recalc_job = self.root.after(TAX_RECALC_DELAY_MS, self._run_debounced_recalc)
+
+    def _run_debounced_recalc(self):
+        self._recalc_job = None
+        self.update_totals()
 
     def _on_item_double_click(self, event):
         # Open edit dialog on double click
@@ -385,7 +2196,7 @@ class InvoiceApp:
         
         vsb = ttk.Scrollbar(items_frame, orient="vertical", command=self.tree.yview)
         vsb.grid(row=0, column=1, sticky='ns')
-        self.tree.configure(yscrollcommand=vsb.set)
+        self.item_table = ItemTable(self.tree, vsb, lambda: self.items)
 
         # Row 3: Item Action Buttons
         btn_frame = ttk.Frame(main_frame, style='TFrame')
@@ -449,6 +2260,23 @@ class InvoiceApp:
         
         reset_btn = ttk.Button(action_frame, text="🔄 Reset All", command=self.reset_all, width=12, style='TButton')
         reset_btn.pack(side=LEFT)
+
+        reports_btn = ttk.Button(action_frame, text="📊 Reports", command=lambda: ReportsWindow(self.root, self.tasks), width=12, style='TButton')
+        reports_btn.pack(side=LEFT, padx=(8, 0))
+
+        search_btn = ttk.Button(action_frame, text="🔍 Search", command=lambda: SearchWindow(self.root), width=12, style='TButton')
+        search_btn.pack(side=LEFT, padx=(8, 0))
+
+        # Background work status (rendering/printing runs off the UI thread)
+        self.progress_bar = ttk.Progressbar(action_frame, mode='indeterminate', length=120)
+        self.progress_bar.pack(side=LEFT, padx=(15, 5))
+        self.cancel_btn = ttk.Button(action_frame, text="✖ Cancel", command=self._cancel_task, width=10, style='TButton')
+        self.cancel_btn.pack(side=LEFT, padx=5)
+        self.cancel_btn.state(['disabled'])
+        self.status_var = StringVar()
+        ttk.Label(action_frame, textvariable=self.status_var, background=self.BG_MAIN).pack(side=LEFT, padx=5)
+        self.print_status_var = StringVar()
+        ttk.Label(action_frame, textvariable=self.print_status_var, background=self.BG_MAIN).pack(side=LEFT, padx=5)
     # ------------------------------------------------------------------
     # ---------- End of build_ui ----------
     # ------------------------------------------------------------------
@@ -459,12 +2287,11 @@ class InvoiceApp:
         self._open_item_dialog(is_edit=False)
 
     def open_edit_item_dialog(self):
-        sel = self.tree.selection()
-        if not sel:
+        item_index = self.item_table.selected_index()
+        if item_index is None:
             messagebox.showinfo("Edit Item", "Please select an item row to edit.")
             return
         
-        item_index = self.tree.index(sel[0])
         initial_data = self.items[item_index]
         
         self._open_item_dialog(is_edit=True, index=item_index, initial_data=initial_data)
@@ -491,7 +2318,7 @@ class InvoiceApp:
         # Variables for the fields
         desc = StringVar(value=initial_data['desc'] if is_edit else "")
         qty = IntVar(value=initial_data['qty'] if is_edit else 1)
-        unit_price = DoubleVar(value=initial_data['unit_price'] if is_edit else 0.0)
+        unit_price = StringVar(value=str(initial_data['unit_price']) if is_edit else "0.00")
 
         # Widgets setup
         ttk.Label(frame, text="Description", font=('Helvetica', 10), background=self.BG_CARD).grid(row=0, column=0, sticky=W, pady=5, padx=5)
@@ -503,12 +2330,15 @@ class InvoiceApp:
         
         ttk.Label(frame, text="Unit Price (₹)", font=('Helvetica', 10), background=self.BG_CARD).grid(row=2, column=0, sticky=W, pady=5, padx=5)
         ttk.Entry(frame, textvariable=unit_price, width=15, font=('Helvetica', 10), style='TEntry').grid(row=2, column=1, sticky=W, padx=6, pady=4)
+        CatalogAutocomplete(desc_entry, desc, unit_price) # products from the catalog as you type
 
         def save_item():
             d = desc.get().strip()
             try:
                 q = int(qty.get())
-                p = float(unit_price.get())
+                p = Decimal(unit_price.get().replace(',', '').strip())
+                if not p.is_finite():
+                    raise InvalidOperation
             except Exception:
                 messagebox.showerror("Invalid input", "Quantity must be an integer and unit price must be numeric.")
                 return
@@ -520,14 +2350,20 @@ class InvoiceApp:
                 messagebox.showerror("Invalid input", "Quantity must be positive and Unit Price cannot be negative.")
                 return
 
-            new_item = {"desc": d, "qty": q, "unit_price": p}
-            
+            try:
+                if is_edit:
+                    self.items.update(index, d, q, p)
+                else:
+                    self.items.append(d, q, p)
+            except OverflowError:
+                messagebox.showerror("Invalid input", "Quantity or Unit Price is too large.")
+                return
             if is_edit:
-                self.items[index] = new_item
+                self.item_table.row_updated(index)
             else:
-                self.items.append(new_item)
+                self.item_table.row_inserted(len(self.items) - 1)
                 
-            self.refresh_items()
+            self.update_totals()
             dialog.destroy()
 
         button_text = "Save Changes" if is_edit else "Add Item"
@@ -538,32 +2374,23 @@ class InvoiceApp:
 
 
     def refresh_items(self):
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-            
-        for it in self.items:
-            line_total = it['qty'] * it['unit_price']
-            self.tree.insert("", END, values=(
-                it['desc'], 
-                it['qty'], 
-                currency_fmt(it['unit_price']), 
-                currency_fmt(line_total)
-            ))
+        # Full resync; item edits go through the ItemTable row_* methods instead
+        self.item_table.reset()
         self.update_totals()
 
     def remove_selected(self):
-        sel = self.tree.selection()
-        if not sel:
+        idx = self.item_table.selected_index()
+        if idx is None:
             messagebox.showinfo("Remove", "Please select a row to remove.")
             return
         
-        idx = self.tree.index(sel[0])
         del self.items[idx]
-        self.refresh_items()
+        self.item_table.row_deleted(idx)
+        self.update_totals()
 
     def clear_items(self):
         if messagebox.askyesno("Clear Items", "Remove all items?"):
-            self.items = []
+            self.items.clear()
             self.refresh_items()
     
     # --- Other methods ---
@@ -571,21 +2398,18 @@ class InvoiceApp:
     def update_totals(self):
         try:
             tax_p = float(self.tax_percent.get())
-        except ValueError:
+        except (ValueError, TclError):
             tax_p = 0.0
             
-        s = sum(it['qty']*it['unit_price'] for it in self.items)
+        s, tax_amt, total = self.items.totals(tax_p)
         
         # Use StringVars for formatted currency display in the UI
-        self.subtotal.set(currency_fmt(s))
-        
-        tax_amt = s * tax_p/100.0
-        self.tax_amount.set(currency_fmt(tax_amt))
-        
-        total = s + tax_amt
-        self.total_amount.set(currency_fmt(total))
+        self.subtotal.set(MONEY.format(s))
+        self.tax_amount.set(MONEY.format(tax_amt))
+        self.total_amount.set(MONEY.format(total))
 
-    def on_generate_pdf(self, skip_message=False):
+    def _collect_invoice_data(self):
+        """Validates the form and returns its contents as generate_pdf keyword arguments, or None"""
         self.seller_text.set(self.seller_entry.get("1.0", END).strip())
         
         seller = self.seller_text.get().strip()
@@ -594,85 +2418,167 @@ class InvoiceApp:
         
         if not seller or not buyer_name or not buyer_address:
             messagebox.showwarning("Missing info", "Seller Info, Buyer Name, and Address cannot be empty.")
-            return
+            return None
 
-        inv_no = self.invoice_number.get()
-        date_str = self.invoice_date.get()
-        buyer = f"{buyer_name}\n{buyer_address}"
-        
         try:
-            subtotal_val = sum(it['qty']*it['unit_price'] for it in self.items) 
             tax_p_val = float(self.tax_percent.get())
-            tax_amount_val = subtotal_val * tax_p_val/100.0
-            total_val = subtotal_val + tax_amount_val
-        except ValueError:
+            subtotal_val, tax_amount_val, total_val = self.items.totals(tax_p_val)
+        except (ValueError, TclError):
             messagebox.showerror("Calculation Error", "Invalid numeric value in tax percentage. Please correct it.")
-            return
-
-        notes = self.notes_text_widget.get("1.0", END).strip()
-        pdf_path = os.path.join(INVOICE_DIR, f"Invoice_{inv_no:04d}.pdf")
-        
-        try:
-            generate_pdf(inv_no, date_str, seller, buyer, self.items, subtotal_val, tax_p_val, tax_amount_val, total_val, notes, pdf_path)
-        except Exception as e:
-            messagebox.showerror("PDF Error", f"Failed to generate PDF:\n{e}")
-            return
-        
-        self.save_invoice_data(inv_no, date_str, buyer_name, subtotal_val, tax_amount_val, total_val)
-        
-        if not skip_message:
-            messagebox.showinfo("PDF Generated", f"Invoice saved to:\n{pdf_path}")
-        
-        # Increment to the next number only upon successful generation
+            return None
+
+        return {
+            "date_str": self.invoice_date.get(),
+            "seller_info": seller,
+            "buyer_info": f"{buyer_name}\n{buyer_address}",
+            "items": self.items,
+            "subtotal": subtotal_val,
+            "tax_percent": tax_p_val,
+            "tax_amount": tax_amount_val,
+            "total_amount": total_val,
+            "notes": self.notes_text_widget.get("1.0", END).strip(),
+        }
+
+    def _cancel_task(self):
+        self.tasks.cancel_current()
+        self._show_task_status(self.tasks.current, len(self.tasks.pending))
+
+    def on_generate_pdf(self, skip_message=False, on_saved=None):
+        """Reserves a number and renders the invoice in the background.
+
+        The form can be edited (or the next invoice started) right away; the
+        ledger row is written and on_saved(pdf_path) called once the PDF exists.
+        """
+        data = self._collect_invoice_data()
+        if data is None:
+            return None
+
+        # Reserve the number only now; another instance may have taken the one on display
+        inv_no = allocate_invoice_numbers()
+        pdf_path = invoice_pdf_path(inv_no, data["date_str"])
+        data["items"] = data["items"].copy() # snapshot, the form may change while this renders
+        buyer_name, buyer_address = self.buyer_name.get().strip(), self.buyer_address.get().strip()
         self.invoice_number.set(next_invoice_number())
+
+        def work(task):
+            task.progress(f"Rendering invoice {inv_no:04d}…")
+            try:
+                generate_pdf(inv_no, pdf_path=pdf_path, **data,
+                             on_page=lambda n: task.progress(f"Rendering invoice {inv_no:04d}, page {n}…"))
+            except BaseException:
+                if os.path.exists(pdf_path):
+                    os.remove(pdf_path) # never leave a half-written invoice behind
+                raise
+            return pdf_path
+
+        def done(path):
+            self.save_invoice_data(inv_no, data["date_str"], buyer_name, data["subtotal"],
+                                   data["tax_amount"], data["total_amount"], items=data["items"],
+                                   buyer_address=buyer_address, seller=data["seller_info"],
+                                   tax_percent=data["tax_percent"], notes=data["notes"], pdf_path=path)
+            if on_saved is not None:
+                on_saved(path)
+            elif not skip_message:
+                messagebox.showinfo("PDF Generated", f"Invoice saved to:\n{path}")
+
+        def failed(e):
+            if isinstance(e, TaskCancelled):
+                self._idle_status = f"Invoice {inv_no:04d} cancelled; its number is left unused."
+            else:
+                messagebox.showerror("PDF Error", f"Failed to generate invoice {inv_no:04d}:\n{e}")
+
+        return self.tasks.submit(f"Invoice {inv_no:04d}", work, done, failed)
         
     def on_print_invoice_wrapper(self):
         if not self.items:
             messagebox.showinfo("Print", "No items to print.")
             return
         
-        current_inv_no = self.invoice_number.get()
-        self.on_generate_pdf(skip_message=True)
-        
-        last_pdf = os.path.join(INVOICE_DIR, f"Invoice_{current_inv_no:04d}.pdf")
-        
-        if os.path.exists(last_pdf):
-            self.last_pdf_path = last_pdf
+        self.on_generate_pdf(skip_message=True, on_saved=self._print_generated)
+
+    def _print_generated(self, pdf_path):
+        if pdf_path and os.path.exists(pdf_path):
+            self.last_pdf_path = pdf_path
             self.open_printer_selection_dialog()
         else:
             messagebox.showerror("Print Error", "Could not find the generated PDF to print.")
             self.last_pdf_path = None
 
+    def start_print(self, file_path, printer_name=None):
+        """Adds the PDF to the background print queue; progress shows in the status bar"""
+        try:
+            self.print_queue.add(file_path, printer_name)
+        except Exception as e:
+            messagebox.showerror("Print Error", f"Could not queue the invoice for printing.\nPDF saved at {file_path}\nError: {e}")
+            return
+        self._poll_print_queue()
+
+    def _poll_print_queue(self):
+        if self._print_poll_job is not None:
+            self.root.after_cancel(self._print_poll_job)
+            self._print_poll_job = None
+        try:
+            counts = self.print_queue.counts()
+        except Exception:
+            return
+        waiting = counts["pending"] + counts["printing"]
+        parts = [f"{waiting} waiting"] if waiting else []
+        if counts["failed"]:
+            parts.append(f"{counts['failed']} failed")
+        self.print_status_var.set(("🖨️ Print queue: " + ", ".join(parts)) if parts else "")
+        if counts["failed"] > self._print_failures_seen:
+            last = self.print_queue.jobs("failed", limit=1)
+            error = last[0]["last_error"] if last else "unknown error"
+            messagebox.showwarning("Print Error", f"{counts['failed'] - self._print_failures_seen} print job(s) failed after retries.\n"
+                                                  f"Last error: {error}\n\nRetry them with: python invoice_app.py print-queue retry")
+        self._print_failures_seen = counts["failed"]
+        if waiting:
+            self._print_poll_job = self.root.after(PRINT_QUEUE_POLL_MS, self._poll_print_queue)
+
     def on_preview_invoice(self):
         if not self.items:
             messagebox.showinfo("Preview", "No items to preview.")
             return
             
-        current_inv_no = self.invoice_number.get()
-        self.on_generate_pdf(skip_message=True) 
-        
-        last_pdf = os.path.join(INVOICE_DIR, f"Invoice_{current_inv_no:04d}.pdf")
+        data = self._collect_invoice_data()
+        if data is None:
+            return
         
-        if os.path.exists(last_pdf):
-            preview_pdf(last_pdf)
-        else:
-            messagebox.showerror("Preview Error", "Could not find the generated PDF to preview.")
+        # Render in memory with the number on display: no file, no ledger row, no number consumed
+        inv_no = self.invoice_number.get()
+        data["items"] = data["items"].copy()
+
+        def work(task):
+            pdf_bytes = render_pdf_bytes(inv_no, **data, on_page=lambda n: task.progress(f"Rendering preview, page {n}…"))
+            task.progress("Preparing preview…")
+            warm_preview_cache(pdf_bytes, check_cancelled=task.check_cancelled)
+            return pdf_bytes
+
+        def failed(e):
+            if not isinstance(e, TaskCancelled):
+                messagebox.showerror("Preview Error", f"Failed to render the preview:\n{e}")
+
+        self.tasks.submit(f"Preview {inv_no:04d}", work,
+                          lambda pdf_bytes: preview_pdf(pdf_bytes=pdf_bytes, title=f"Invoice Preview - {inv_no:04d} (not saved)"),
+                          failed)
 
     def open_printer_selection_dialog(self):
         
-        if platform.system() != "Windows" or not WIN32_AVAILABLE:
-            print_pdf(self.last_pdf_path)
+        win32 = load_win32()
+        if win32 is None:
+            self.start_print(self.last_pdf_path)
             return
 
         try:
+            win32print = win32[1]
             printers = [p[2] for p in win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL)]
             default_printer = win32print.GetDefaultPrinter()
         except Exception:
-            print_pdf(self.last_pdf_path)
+            self.start_print(self.last_pdf_path)
             return
 
         if not printers:
-            print_pdf(self.last_pdf_path)
+            self.start_print(self.last_pdf_path)
             return
 
         dialog = Toplevel(self.root)
@@ -694,7 +2600,7 @@ class InvoiceApp:
         def confirm_print():
             printer_name = selected_printer.get()
             dialog.destroy()
-            print_pdf(self.last_pdf_path, printer_name)
+            self.start_print(self.last_pdf_path, printer_name)
 
         def cancel_dialog():
             dialog.destroy()
@@ -715,38 +2621,538 @@ class InvoiceApp:
 
         self.root.wait_window(dialog)
 
-    def save_invoice_data(self, inv_no, date_str, buyer, subtotal, tax, total):
-        fieldnames = ["invoice_no", "date", "buyer", "subtotal", "tax", "total"]
-        write_header = not os.path.exists(INVOICE_CSV)
+    def save_invoice_data(self, inv_no, date_str, buyer, subtotal, tax, total, **details):
         try:
-            with open(INVOICE_CSV,"a",newline="",encoding="utf-8") as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                if write_header:
-                    writer.writeheader()
-                writer.writerow({"invoice_no": inv_no,"date":date_str,"buyer":buyer,"subtotal":subtotal,"tax":tax,"total":total})
+            save_invoice_record(inv_no, date_str, buyer, subtotal, tax, total, **details)
         except Exception as e:
-            messagebox.showwarning("CSV Error", f"Cannot save invoice record:\n{e}")
+            messagebox.showwarning("Ledger Error", f"Cannot save invoice record:\n{e}")
 
     def reset_all(self):
         if messagebox.askyesno("Reset", "Reset all fields and items?"):
-            self.items = []
+            self.items.clear()
             self.refresh_items()
             self.buyer_name.set("")
             self.buyer_address.set("")
             self.invoice_number.set(next_invoice_number())
             self.invoice_date.set(datetime.date.today().isoformat())
             self.notes_text_widget.delete("1.0", END)
-            self.tax_percent.set(18.0) 
+            self.tax_percent.set(DEFAULT_TAX_PERCENT)
             self.update_totals()
 
-# ---------- Run App ----------
-if __name__ == "__main__":
+# ---------- Headless Batch Mode ----------
+ORDER_CSV_FIELDS = ["order_id", "date", "buyer_name", "buyer_address", "tax_percent", "notes", "desc", "qty", "unit_price"]
+
+def iter_orders(path):
+    """Yields (ref, raw_order, error) for every order in a CSV or JSONL file.
+
+    JSONL: one order object per line with an "items" list.
+    CSV: one line item per row (see ORDER_CSV_FIELDS); consecutive rows
+    sharing an order_id make up one order.
+    """
+    if path.lower().endswith((".jsonl", ".json", ".ndjson")):
+        with open(path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    raw = json.loads(line)
+                    if not isinstance(raw, dict):
+                        raise ValueError("expected a JSON object")
+                except ValueError as e:
+                    yield f"line {line_no}", None, e
+                    continue
+                yield str(raw.get("order_id") or f"line {line_no}"), raw, None
+        return
+
+    with open(path, newline="", encoding="utf-8") as f:
+        current_id, current = None, None
+        for row in csv.DictReader(f):
+            order_id = (row.get("order_id") or "").strip()
+            if current is None or order_id != current_id:
+                if current is not None:
+                    yield current_id, current, None
+                current_id = order_id
+                current = {k: row.get(k) for k in ("date", "buyer_name", "buyer_address", "tax_percent", "notes")}
+                current["items"] = []
+            current["items"].append({"desc": row.get("desc"), "qty": row.get("qty"), "unit_price": row.get("unit_price")})
+        if current is not None:
+            yield current_id, current, None
+
+def _normalize_order(raw, seller):
+    """Validates a raw order and returns it in the shape generate_pdf expects"""
+    buyer_name = str(raw.get("buyer_name") or "").strip()
+    buyer_address = str(raw.get("buyer_address") or "").strip()
+    if not buyer_name or not buyer_address:
+        raise ValueError("buyer_name and buyer_address are required")
+
+    items = LineItems()
+    for it in raw.get("items") or []:
+        desc = str(it.get("desc") or "").strip()
+        qty = int(it.get("qty"))
+        unit_price = Decimal(str(it.get("unit_price")).replace(',', '').strip())
+        if not desc:
+            raise ValueError("item description is empty")
+        if not unit_price.is_finite() or qty <= 0 or unit_price < 0:
+            raise ValueError(f"invalid quantity/price for item '{desc}'")
+        try:
+            items.append(desc, qty, unit_price)
+        except OverflowError:
+            raise ValueError(f"quantity/price too large for item '{desc}'") from None
+    if not items:
+        raise ValueError("order has no items")
+
+    tax = raw.get("tax_percent")
+    tax_percent = Decimal(str(DEFAULT_TAX_PERCENT if tax in (None, "") else tax))
+    if not tax_percent.is_finite() or tax_percent < 0:
+        raise ValueError(f"invalid tax_percent '{tax}'")
+    subtotal, tax_amount, total = compute_totals(items, tax_percent)
+    return {
+        "date": str(raw.get("date") or datetime.date.today().isoformat()),
+        "seller": str(raw.get("seller") or seller),
+        "buyer_name": buyer_name,
+        "buyer_address": buyer_address,
+        "items": items,
+        "subtotal": subtotal,
+        "tax_percent": tax_percent,
+        "tax": tax_amount,
+        "total": total,
+        "notes": str(raw.get("notes") or ""),
+    }
+
+def _render_batch_job(job):
+    """Pool worker: renders one invoice and returns its ledger summary"""
+    result = {k: job[k] for k in ("ref", "invoice_no", "date", "seller", "buyer_name", "buyer_address", "items",
+                                  "subtotal", "tax_percent", "tax", "total", "notes", "pdf_path")}
     try:
-        from PIL import Image, ImageTk
-    except ImportError:
+        # Every batch invoice is new, so caching them would only push out the GUI's previews
+        generate_pdf(job["invoice_no"], job["date"], job["seller"], f"{job['buyer_name']}\n{job['buyer_address']}",
+                     job["items"], job["subtotal"], job["tax_percent"], job["tax"], job["total"], job["notes"], job["pdf_path"],
+                     engine=job["engine"], cache=False, profile=job.get("profile"))
+        result["error"] = None
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["trace"] = tracing.take() if tracing.enabled() else None
+    return result
+
+def run_batch(orders_path, workers=None, seller=DEFAULT_SELLER, output_dir=None, chunksize=4, engine=None, print_queue=None, profile=None):
+    """Renders every order in orders_path on a process pool.
+
+    Invoice numbers are assigned in file order and one ledger row is written
+    per rendered invoice. Bad records are logged and skipped. PDFs go into the
+    archive, or all into output_dir if one is given. With a print_queue, every
+    rendered invoice is also queued for printing.
+    """
+    if engine is not None and engine not in TEMPLATE_ENGINES:
+        raise ValueError(f"Unknown rendering engine '{engine}' (choose from {', '.join(TEMPLATE_ENGINES)})")
+    if profile is not None and profile not in OUTPUT_PROFILES:
+        raise ValueError(f"Unknown output profile '{profile}' (choose from {', '.join(OUTPUT_PROFILES)})")
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+    stats = {"ok": 0, "skipped": 0, "failed": 0}
+
+    def jobs():
+        # Runs on the pool's task feeder thread, so numbers are handed out in order
+        for ref, raw, error in iter_orders(orders_path):
+            order = None
+            if error is None:
+                try:
+                    order = _normalize_order(raw, seller)
+                except Exception as e:
+                    error = e
+            if error is not None:
+                log.error("Skipping order %s: %s", ref, error)
+                stats["skipped"] += 1
+                continue
+
+            inv_no = allocate_invoice_numbers()
+            pdf_path = invoice_pdf_path(inv_no, order["date"]) if output_dir is None else os.path.join(output_dir, invoice_filename(inv_no))
+            order.update(ref=ref, invoice_no=inv_no, engine=engine, profile=profile, pdf_path=pdf_path)
+            yield order
+
+    load_reportlab() # forked workers inherit it instead of each importing it again
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers, initializer=tracing.init_worker,
+                              initargs=(tracing.enabled(), tracing.events_enabled())) as pool:
+        for res in pool.imap(_render_batch_job, jobs(), chunksize):
+            tracing.merge(res.pop("trace"))
+            if res["error"]:
+                log.error("Invoice %04d (order %s) failed, number left unused: %s", res["invoice_no"], res["ref"], res["error"])
+                stats["failed"] += 1
+                continue
+            try:
+                save_invoice_record(res["invoice_no"], res["date"], res["buyer_name"], res["subtotal"], res["tax"], res["total"],
+                                    items=res["items"], buyer_address=res["buyer_address"], seller=res["seller"],
+                                    tax_percent=res["tax_percent"], notes=res["notes"], pdf_path=res["pdf_path"])
+            except Exception as e:
+                log.error("Invoice %04d (order %s) rendered but ledger write failed: %s", res["invoice_no"], res["ref"], e)
+                stats["failed"] += 1
+                continue
+            if print_queue is not None:
+                print_queue.add(res["pdf_path"])
+            stats["ok"] += 1
+    elapsed = time.perf_counter() - start
+
+    stats["elapsed"] = elapsed
+    stats["per_sec"] = stats["ok"] / elapsed if elapsed > 0 else 0.0
+    log.info("Rendered %d invoices in %.2fs (%.1f invoices/sec); %d skipped, %d failed",
+             stats["ok"], elapsed, stats["per_sec"], stats["skipped"], stats["failed"])
+    return stats
+
+# ---------- Run App ----------
+def export_traces(json_path=None, chrome_path=None):
+    """Writes the collected timings (--trace-json / --chrome-trace)"""
+    if json_path:
+        tracing.export_json(json_path)
+        print(f"Phase timings written to {json_path}", file=sys.stderr)
+    if chrome_path:
+        tracing.export_chrome_trace(chrome_path)
+        print(f"Chrome trace written to {chrome_path}", file=sys.stderr)
+
+HEAVY_MODULES = ("reportlab.platypus", "fitz", "PIL.ImageTk")
+
+def _preload_heavy_modules():
+    # Runs on a background thread once the window is up, so the first click does not wait for imports
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+def report_startup(timings, target="-"):
+    """Prints startup timings (ms since this module began importing tkinter and
+    friends) to stderr, or appends them as a JSON line to target"""
+    loaded = [name for name in HEAVY_MODULES + ("win32api",) if name in sys.modules]
+    if target and target != "-":
+        with open(target, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"timestamp": time.time(), "timings_ms": timings, "heavy_modules_loaded": loaded}) + "\n")
+        return
+    for name, ms in timings.items():
+        print(f"{name:>20}: {ms:8.1f} ms", file=sys.stderr)
+    print(f"{'heavy modules loaded':>20}: {', '.join(loaded) or 'none'}", file=sys.stderr)
+
+def run_gui(profile_startup=None):
+    if importlib.util.find_spec("PIL") is None:
         print("Pillow library not found. PDF Preview will not work.")
         print("Install it with: pip install Pillow")
 
+    since_start = lambda: (time.perf_counter() - _STARTUP_T0) * 1000
+    timings = {"imports": (_STARTUP_IMPORTED - _STARTUP_T0) * 1000}
     root = Tk()
-    app = InvoiceApp(root)
-    root.mainloop()
\ No newline at end of file
+    timings["tk_root"] = since_start()
+    InvoiceApp(root)
+    timings["app_built"] = since_start()
+
+    def on_first_map(event):
+        if event.widget is not root:
+            return
+        root.unbind("<Map>")
+        # after_idle runs once the pending redraws of the freshly mapped window are done
+        root.after_idle(first_paint)
+
+    def first_paint():
+        if profile_startup:
+            timings["first_paint"] = since_start()
+            report_startup(timings, profile_startup)
+        threading.Thread(target=_preload_heavy_modules, name="preload", daemon=True).start()
+        start_catalog_loading()
+
+    root.bind("<Map>", on_first_map)
+    root.mainloop()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Invoice Generator Pro. Starts the GUI when no command is given.")
+    parser.add_argument("--profile-startup", action="store_true", help="report import and first-paint timings on stderr")
+    parser.add_argument("--profile-log", metavar="FILE", help="with --profile-startup, append the timings to FILE as JSON lines instead")
+    parser.add_argument("--trace-json", metavar="FILE", help="time rendering, preview, printing, ledger and numbering phases; write the histograms to FILE on exit")
+    parser.add_argument("--chrome-trace", metavar="FILE", help="also write every timed phase to FILE in Chrome trace format (chrome://tracing, Perfetto)")
+    sub = parser.add_subparsers(dest="command")
+
+    batch = sub.add_parser("batch", help="Render invoices from a CSV or JSONL file of orders without the GUI")
+    batch.add_argument("orders", help="CSV (one item per row, grouped by order_id) or JSONL (one order per line)")
+    batch.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    batch.add_argument("--seller-file", help="text file with the seller details (default: built-in placeholder)")
+    batch.add_argument("--output-dir", default=None, help=f"write all PDFs into this folder (default: the archive, {ARCHIVE_DIR})")
+    batch.add_argument("--error-log", help="also write per-record failures to this file")
+    batch.add_argument("--engine", choices=sorted(TEMPLATE_ENGINES), default=None,
+                       help=f"renderer: platypus (flowing layout), canvas (fast, one-line descriptions) or large (streamed, "
+                            f"running subtotals per page) (default: {DEFAULT_ENGINE})")
+    batch.add_argument("--output-profile", choices=OUTPUT_PROFILES, default=None,
+                       help=f"standard, or rupee-glyph (₹ from an embedded font subset) (default: {OUTPUT_PROFILE})")
+    batch.add_argument("--print", dest="print_", action="store_true", help="queue every rendered invoice for printing and wait for the queue to drain")
+    batch.add_argument("--spooler", help='print command with a {file} placeholder (default: $INVOICE_SPOOLER, else lp / ShellExecute)')
+
+    bundle = sub.add_parser("bundle", help="Merge already-rendered invoices from the ledger into one PDF")
+    bundle.add_argument("-o", "--output", required=True, help="bundle PDF to write")
+    bundle.add_argument("--from", dest="invoice_from", type=int, help="first invoice number")
+    bundle.add_argument("--to", dest="invoice_to", type=int, help="last invoice number")
+    bundle.add_argument("--date", help="only invoices dated YYYY-MM-DD (shortcut for --date-from/--date-to)")
+    bundle.add_argument("--date-from", help="only invoices dated on or after YYYY-MM-DD")
+    bundle.add_argument("--date-to", help="only invoices dated on or before YYYY-MM-DD")
+    bundle.add_argument("--buyer", help="only buyers whose name starts with this")
+    bundle.add_argument("--no-toc", action="store_true", help="do not add a bookmark per invoice")
+    bundle.add_argument("--render-missing", action="store_true", help="re-render invoices whose PDF is missing instead of skipping them")
+    bundle.add_argument("--print", dest="print_", action="store_true", help="send the bundle to the print queue and wait for it")
+
+    pq = sub.add_parser("print-queue", help="Inspect or drain the persistent print queue")
+    pq.add_argument("action", choices=["status", "add", "drain", "retry", "clear-done"])
+    pq.add_argument("files", nargs="*", help="PDFs to queue (for add)")
+    pq.add_argument("-p", "--printer", help="printer name for add (default: system default)")
+    pq.add_argument("--spooler", help='print command with a {file} placeholder (default: $INVOICE_SPOOLER, else lp / ShellExecute)')
+
+    comp = sub.add_parser("compact", help="Rewrite stored invoice PDFs smaller (PyMuPDF garbage collection and deflate)")
+    comp.add_argument("paths", nargs="*", default=[INVOICE_DIR], help="PDFs or folders (default: %(default)s, without the render cache)")
+    comp.add_argument("--garbage", type=int, choices=range(5), default=COMPACT_GARBAGE, help="garbage collection level 0-4 (default: %(default)s)")
+    comp.add_argument("--subset-fonts", action="store_true", help="also cut embedded fonts down to the glyphs used")
+    comp.add_argument("--dry-run", action="store_true", help="only report what would be saved")
+
+    arc = sub.add_parser("archive", help="Inspect the invoice archive, or move a flat folder of invoices into it")
+    arc.add_argument("action", choices=["status", "migrate", "verify", "rebuild"])
+    arc.add_argument("--source", default=INVOICE_DIR, help="flat folder of Invoice_NNNN.pdf files to migrate (default: %(default)s)")
+    arc.add_argument("--copy", action="store_true", help="copy the files when migrating instead of moving them")
+    arc.add_argument("--dry-run", action="store_true", help="only report what migrate would move")
+    arc.add_argument("--checksums", action="store_true", help="verify also compares SHA-256 checksums (reads every file)")
+
+    srch = sub.add_parser("search", help="Find invoices by item description, buyer, address or notes")
+    srch.add_argument("words", nargs="*", help='words to match, as prefixes; "item:cable buyer:acme" limits a word to one field')
+    srch.add_argument("--buyer", help="words that must match the buyer name")
+    srch.add_argument("--item", help="words that must match an item description")
+    srch.add_argument("--from", dest="date_from", help="first invoice date, YYYY-MM-DD")
+    srch.add_argument("--to", dest="date_to", help="last invoice date, YYYY-MM-DD")
+    srch.add_argument("--limit", type=int, default=50, help="maximum results (default: %(default)s)")
+
+    six = sub.add_parser("search-index", help="Show, backfill or rebuild the full-text search index")
+    six.add_argument("action", choices=["status", "backfill", "rebuild"])
+    six.add_argument("-w", "--workers", type=int, default=None, help="processes extracting PDF text (default: CPU count)")
+    six.add_argument("--no-pdf", action="store_true", help="only index invoices from the ledger, do not read PDFs")
+
+    cat = sub.add_parser("catalog", help="Import, show or look up the product catalog used for item autocomplete")
+    cat.add_argument("action", choices=["status", "import", "lookup", "clear"])
+    cat.add_argument("value", nargs="?", help="import: CSV file (sku, name, unit_price columns); lookup: text to complete")
+    cat.add_argument("--replace", action="store_true", help="import: remove products that are not in the CSV")
+    cat.add_argument("--limit", type=int, default=CATALOG_SUGGESTIONS, help="lookup: maximum results (default: %(default)s)")
+
+    rc = sub.add_parser("render-cache", help="Show or empty the cache of rendered PDFs")
+    rc.add_argument("action", choices=["status", "clear"])
+
+    rep = sub.add_parser("report", help="Revenue, top buyers, tax collected and ageing from the ledger")
+    rep.add_argument("--from", dest="date_from", help="first invoice date, YYYY-MM-DD")
+    rep.add_argument("--to", dest="date_to", help="last invoice date, YYYY-MM-DD")
+    rep.add_argument("--year", type=int, help="calendar year (shortcut for --from/--to)")
+    rep.add_argument("--buyer", help="only buyers whose name starts with this")
+    rep.add_argument("--top", type=int, default=10, help="number of top buyers (default: %(default)s)")
+    rep.add_argument("--as-of", help="date the ageing is measured at (default: today)")
+    rep.add_argument("--csv-dir", help="also write every table as a CSV file in this folder")
+
+    imp = sub.add_parser("ledger-import", help="Import a legacy invoices.csv into the SQLite ledger")
+    imp.add_argument("csv", nargs="?", default=INVOICE_CSV, help="CSV to import (default: %(default)s)")
+
+    reprint = sub.add_parser("reprint", help="Render a past invoice again from the ledger")
+    reprint.add_argument("invoice_no", type=int)
+    reprint.add_argument("-o", "--output", help="output PDF path (default: the usual invoices/ path)")
+
+    args = parser.parse_args(argv)
+    profile_target = (args.profile_log or "-") if args.profile_startup else None
+    if args.trace_json or args.chrome_trace:
+        tracing.enable(events=bool(args.chrome_trace))
+        atexit.register(export_traces, args.trace_json, args.chrome_trace)
+    if profile_target and args.command:
+        # Headless commands have no window; the import cost is what they pay before doing any work
+        report_startup({"imports": (_STARTUP_IMPORTED - _STARTUP_T0) * 1000}, profile_target)
+
+    if args.command == "ledger-import":
+        added = Ledger(INVOICE_DB).import_csv(args.csv, force=True)
+        print(f"Imported {added} invoices from {args.csv} into {INVOICE_DB}")
+        return 0
+
+    if args.command == "report":
+        import reports
+        date_from, date_to = (f"{args.year}-01-01", f"{args.year}-12-31") if args.year else (args.date_from, args.date_to)
+        start = time.perf_counter()
+        snapshot = get_report_snapshot()
+        added = snapshot.refresh()
+        df = snapshot.select(date_from, date_to, args.buyer)
+        summary = reports.summary(df)
+        tables = reports.build_report(df, top_n=args.top, as_of=args.as_of)
+        print(f"{summary['invoices']} invoices from {summary['buyers']} buyers, {summary['first_date']} to {summary['last_date']}: "
+              f"subtotal {summary['subtotal']:,.2f}, tax {summary['tax']:,.2f}, total {summary['total']:,.2f}")
+        for title, table in tables.items():
+            print(f"\n{title}\n{table.to_string(index=False, float_format=lambda x: f'{x:,.2f}', formatters={'share': '{:.1%}'.format})}")
+            if args.csv_dir:
+                os.makedirs(args.csv_dir, exist_ok=True)
+                table.to_csv(os.path.join(args.csv_dir, title.lower().replace(" ", "_") + ".csv"), index=False, float_format="%.2f")
+        print(f"\nReport built in {time.perf_counter() - start:.2f}s ({added} new ledger rows read)", file=sys.stderr)
+        return 0
+
+    if args.command == "compact":
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+        stats = compact_archive(args.paths, args.garbage, args.subset_fonts, args.dry_run)
+        saved = stats["bytes_before"] - stats["bytes_after"]
+        mb = lambda n: f"{n / 1024 / 1024:,.1f} MB"
+        print(f"{'Would compact' if args.dry_run else 'Compacted'} {stats['compacted']} of {stats['files']} PDFs in {stats['seconds']:.1f}s: "
+              f"{mb(stats['bytes_before'])} -> {mb(stats['bytes_after'])}, "
+              f"{mb(saved)} saved ({saved / stats['bytes_before']:.1%})" if stats["bytes_before"] else "No PDFs found")
+        if stats["failed"]:
+            print(f"{len(stats['failed'])} could not be read, e.g. {stats['failed'][0][0]}: {stats['failed'][0][1]}", file=sys.stderr)
+        return 1 if stats["failed"] else 0
+
+    if args.command == "archive":
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+        archive = get_archive()
+        start = time.perf_counter()
+        status = 0
+        if args.action == "migrate":
+            ledger = get_ledger()
+            stats = archive.migrate(args.source, dates=ledger.dates, copy=args.copy, dry_run=args.dry_run,
+                                    on_batch=None if args.copy else ledger.set_pdf_paths)
+            print(f"{'Would move' if args.dry_run else 'Copied' if args.copy else 'Moved'} {stats['moved']} invoices "
+                  f"({stats['bytes'] / 1024 / 1024:,.1f} MB) from {args.source} in {time.perf_counter() - start:.1f}s")
+            if stats["conflicts"]:
+                print(f"{len(stats['conflicts'])} left in place because the archive already has that file, "
+                      f"e.g. {stats['conflicts'][0][1]}", file=sys.stderr)
+                status = 1
+        elif args.action == "rebuild":
+            print(f"Indexed {archive.rebuild()} files in {time.perf_counter() - start:.1f}s")
+        elif args.action == "verify":
+            problems = archive.verify(checksums=args.checksums)
+            for no, problem in problems[:20]:
+                print(f"  {no:04d}: {problem}", file=sys.stderr)
+            print(f"{len(problems)} problems found in {time.perf_counter() - start:.1f}s")
+            status = 1 if problems else 0
+        stats = archive.stats()
+        print(f"{stats['entries']} invoices, {stats['bytes'] / 1024 / 1024:,.1f} MB in {stats['root']} ({stats['layout']} layout)")
+        return status
+
+    if args.command == "search":
+        start = time.perf_counter()
+        results = get_search_index().search(" ".join(args.words), buyer=args.buyer, items=args.item,
+                                            date_from=args.date_from, date_to=args.date_to, limit=args.limit)
+        elapsed = (time.perf_counter() - start) * 1000
+        for r in results:
+            print(f"{r['invoice_no']:>6}  {r['date']:<10}  {r['buyer'][:30]:<30}  {r['snippet']}")
+        print(f"{len(results)} invoices in {elapsed:.1f} ms", file=sys.stderr)
+        return 0 if results else 1
+
+    if args.command == "search-index":
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+        index = get_search_index()
+        if args.action == "rebuild":
+            index.clear()
+        if args.action in ("backfill", "rebuild"):
+            stats = backfill_search_index(args.workers, pdfs=not args.no_pdf)
+            print(f"Indexed {stats['ledger']} invoices from the ledger and {stats['pdf']} from PDFs in {stats['seconds']:.1f}s"
+                  + (f"; {stats['unreadable']} PDFs could not be read" if stats["unreadable"] else ""))
+        stats = index.stats()
+        print(f"{stats['entries']} invoices indexed ({stats['from_ledger']} from the ledger, {stats['from_pdf']} from PDFs) in {SEARCH_DB}")
+        return 0
+
+    if args.command == "catalog":
+        catalog = get_catalog()
+        if args.action in ("import", "lookup") and not args.value:
+            print(f"catalog {args.action} needs a {'CSV file' if args.action == 'import' else 'text to look up'}", file=sys.stderr)
+            return 2
+        if args.action == "import":
+            start = time.perf_counter()
+            try:
+                stats = catalog.import_csv(args.value, replace=args.replace)
+            except (OSError, ValueError, csv.Error) as e:
+                print(e, file=sys.stderr)
+                return 1
+            print(f"Imported {stats['imported']} products in {time.perf_counter() - start:.1f}s"
+                  + (f"; skipped {stats['skipped']} rows without a name or with an invalid price" if stats["skipped"] else ""))
+        elif args.action == "lookup":
+            start = time.perf_counter()
+            products = catalog.suggest(args.value, args.limit)
+            elapsed = (time.perf_counter() - start) * 1000
+            for p in products:
+                print(f"{p['sku']:<16} {MONEY.format(p['unit_price']):>14}  {p['name']}")
+            print(f"{len(products)} products in {elapsed:.1f} ms", file=sys.stderr)
+            return 0 if products else 1
+        elif args.action == "clear":
+            catalog.clear()
+        print(f"{catalog.stats()['products']} products in {CATALOG_DB}")
+        return 0
+
+    if args.command == "render-cache":
+        cache = get_render_cache()
+        if args.action == "clear":
+            cache.clear()
+        stats = cache.stats()
+        print(f"{stats['entries']} PDFs, {stats['bytes'] / 1024 / 1024:.1f} of {stats['max_bytes'] / 1024 / 1024:.0f} MB in {RENDER_CACHE_DIR}")
+        return 0
+
+    if args.command == "reprint":
+        try:
+            print(reprint_invoice(args.invoice_no, args.output))
+        except (KeyError, ValueError) as e:
+            print(e.args[0], file=sys.stderr)
+            return 1
+        return 0
+
+    if args.command == "bundle":
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+        date_from, date_to = (args.date, args.date) if args.date else (args.date_from, args.date_to)
+        invoices = get_ledger().iter_find(args.buyer, date_from, date_to, args.invoice_from, args.invoice_to)
+        try:
+            stats = bundle_invoices(args.output, invoices, toc=not args.no_toc, render_missing=args.render_missing)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(f"Wrote {stats['invoices']} invoices ({stats['pages']} pages) to {args.output}")
+        if stats["skipped"]:
+            shown = ", ".join(f"{n:04d}" for n in stats["skipped"][:20])
+            more = f" and {len(stats['skipped']) - 20} more" if len(stats["skipped"]) > 20 else ""
+            print(f"Skipped {len(stats['skipped'])} without a rendered PDF: {shown}{more}", file=sys.stderr)
+        if args.print_:
+            pq = get_print_queue()
+            pq.add(args.output)
+            counts = pq.drain()
+            print(", ".join(f"{n} {status}" for status, n in counts.items()))
+        return 0
+
+    if args.command == "print-queue":
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+        pq = get_print_queue(default_spooler(args.spooler))
+        if args.action == "add":
+            ids = pq.add_many(args.files, args.printer)
+            print(f"Queued {len(ids)} job(s)")
+        elif args.action == "retry":
+            print(f"Re-queued {pq.retry_failed()} failed job(s)")
+        elif args.action == "clear-done":
+            print(f"Removed {pq.clear_done()} finished job(s)")
+        if args.action in ("add", "retry", "drain"):
+            pq.drain()
+        counts = pq.counts()
+        print(", ".join(f"{n} {status}" for status, n in counts.items()))
+        for job in pq.jobs("failed", limit=10):
+            print(f"  failed #{job['id']} {job['pdf_path']}: {job['last_error']}")
+        return 1 if counts["failed"] else 0
+
+    if args.command == "batch":
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+        if args.error_log:
+            handler = logging.FileHandler(args.error_log, encoding="utf-8")
+            handler.setLevel(logging.ERROR)
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            log.addHandler(handler)
+        seller = DEFAULT_SELLER
+        if args.seller_file:
+            with open(args.seller_file, encoding="utf-8") as f:
+                seller = f.read().strip()
+        pq = get_print_queue(default_spooler(args.spooler)) if args.print_ else None
+        before = pq.counts() if pq is not None else None
+        tracing.enable(events=bool(args.chrome_trace)) # the per-phase summary below is always shown
+        stats = run_batch(args.orders, workers=args.workers, seller=seller, output_dir=args.output_dir, engine=args.engine,
+                          print_queue=pq, profile=args.output_profile)
+        failed = 0
+        if pq is not None:
+            counts = pq.drain()
+            printed, failed = counts["done"] - before["done"], counts["failed"] - before["failed"]
+            log.info("Print queue drained: %d printed, %d failed", printed, failed)
+        log.info("%s", tracing.summary())
+        return 1 if stats["skipped"] or stats["failed"] or failed else 0
+
+    run_gui(profile_target)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Invoice Ledger
+SQLite-backed record of every generated invoice, including its line items.
+Amounts are stored as integer paise so totals add up exactly.
+"""
+
+import os
+import csv
+import sqlite3
+import threading
+from decimal import Decimal, ROUND_HALF_UP
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS invoices (
+    invoice_no      INTEGER PRIMARY KEY,
+    date            TEXT NOT NULL,
+    buyer           TEXT NOT NULL COLLATE NOCASE,
+    buyer_address   TEXT NOT NULL DEFAULT '',
+    seller          TEXT NOT NULL DEFAULT '',
+    tax_percent     REAL NOT NULL DEFAULT 0,
+    subtotal_paise  INTEGER NOT NULL,
+    tax_paise       INTEGER NOT NULL,
+    total_paise     INTEGER NOT NULL,
+    notes           TEXT NOT NULL DEFAULT '',
+    pdf_path        TEXT,
+    created_at      TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices(date);
+CREATE INDEX IF NOT EXISTS idx_invoices_buyer ON invoices(buyer);
+
+CREATE TABLE IF NOT EXISTS invoice_items (
+    invoice_no        INTEGER NOT NULL REFERENCES invoices(invoice_no) ON DELETE CASCADE,
+    line_no           INTEGER NOT NULL,
+    description       TEXT NOT NULL,
+    qty               INTEGER NOT NULL,
+    unit_price_paise  INTEGER NOT NULL,
+    PRIMARY KEY (invoice_no, line_no)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS meta (
+    key    TEXT PRIMARY KEY,
+    value  TEXT
+);
+"""
+
+INVOICE_COLUMNS = ("invoice_no", "date", "buyer", "buyer_address", "seller", "tax_percent",
+                   "subtotal_paise", "tax_paise", "total_paise", "notes", "pdf_path", "created_at")
+
+# ---------- Money Helpers ----------
+def to_paise(x):
+    """Converts a rupee amount (float/str/Decimal) to integer paise, rounding half up"""
+    if isinstance(x, str):
+        x = x.replace('₹', '').replace(',', '').strip() or "0"
+    return int((Decimal(str(x)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def from_paise(p):
+    """Converts integer paise back to a Decimal rupee amount"""
+    return Decimal(int(p or 0)).scaleb(-2)
+
+def _invoice_from_row(row):
+    inv = dict(zip(INVOICE_COLUMNS, row))
+    for key in ("subtotal", "tax", "total"):
+        inv[key] = from_paise(inv.pop(key + "_paise"))
+    return inv
+
+# ---------- Ledger ----------
+class Ledger:
+    """Indexed invoice ledger. One instance may be shared between threads."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- Writes ---
+
+    def record_invoice(self, invoice_no, date, buyer, subtotal, tax, total, items=(),
+                       buyer_address="", seller="", tax_percent=0.0, notes="", pdf_path=None):
+        """Stores one invoice and its line items in a single transaction"""
+        item_rows = [(invoice_no, line_no, it['desc'], int(it['qty']), to_paise(it['unit_price']))
+                     for line_no, it in enumerate(items, start=1)]
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO invoices (invoice_no, date, buyer, buyer_address, seller, tax_percent,"
+                " subtotal_paise, tax_paise, total_paise, notes, pdf_path) VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+                (invoice_no, date, buyer, buyer_address, seller, float(tax_percent),
+                 to_paise(subtotal), to_paise(tax), to_paise(total), notes, pdf_path))
+            self.conn.executemany(
+                "INSERT INTO invoice_items (invoice_no, line_no, description, qty, unit_price_paise) VALUES (?,?,?,?,?)",
+                item_rows)
+
+    def set_pdf_paths(self, pairs):
+        """Points invoices at their PDFs after the files moved; pairs are (invoice_no, pdf_path)"""
+        with self._lock, self.conn:
+            self.conn.executemany("UPDATE invoices SET pdf_path = ? WHERE invoice_no = ?",
+                                  [(path, no) for no, path in pairs])
+
+    def import_csv(self, csv_path, force=False):
+        """One-time import of a legacy invoices.csv. Returns the number of invoices added.
+
+        The CSV only has totals, so imported invoices have no line items.
+        Invoice numbers already in the ledger are left untouched.
+        """
+        key = "imported:" + os.path.abspath(csv_path)
+        if not force and self._get_meta(key):
+            return 0
+        added = 0
+        with self._lock, self.conn:
+            with open(csv_path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    try:
+                        values = (int(row["invoice_no"]), row.get("date") or "", row.get("buyer") or "",
+                                  to_paise(row.get("subtotal") or 0), to_paise(row.get("tax") or 0),
+                                  to_paise(row.get("total") or 0))
+                    except (KeyError, ValueError, ArithmeticError):
+                        continue
+                    cur = self.conn.execute(
+                        "INSERT OR IGNORE INTO invoices (invoice_no, date, buyer, subtotal_paise, tax_paise, total_paise)"
+                        " VALUES (?,?,?,?,?,?)", values)
+                    added += cur.rowcount
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(added)))
+        return added
+
+    # --- Reads ---
+
+    def _get_meta(self, key):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def last_invoice_no(self):
+        """Highest invoice number recorded (0 if the ledger is empty)"""
+        with self._lock:
+            row = self.conn.execute("SELECT MAX(invoice_no) FROM invoices").fetchone()
+        return row[0] or 0
+
+    def dates(self, invoice_nos):
+        """Returns {invoice_no: date} for the given invoice numbers that are in the ledger"""
+        invoice_nos = list(invoice_nos)
+        found = {}
+        with self._lock:
+            for lo in range(0, len(invoice_nos), 500):
+                chunk = invoice_nos[lo:lo + 500]
+                found.update(self.conn.execute(
+                    f"SELECT invoice_no, date FROM invoices WHERE invoice_no IN ({', '.join('?' * len(chunk))})", chunk))
+        return found
+
+    def item_descriptions(self, invoice_nos):
+        """Returns {invoice_no: [description, ...]} for the given invoices that have line items"""
+        invoice_nos = list(invoice_nos)
+        found = {}
+        with self._lock:
+            for lo in range(0, len(invoice_nos), 500):
+                chunk = invoice_nos[lo:lo + 500]
+                for no, desc in self.conn.execute(
+                        f"SELECT invoice_no, description FROM invoice_items WHERE invoice_no IN ({', '.join('?' * len(chunk))})"
+                        " ORDER BY invoice_no, line_no", chunk):
+                    found.setdefault(no, []).append(desc)
+        return found
+
+    def get_invoice(self, invoice_no):
+        """Returns the invoice as a dict with an "items" list, or None"""
+        with self._lock:
+            row = self.conn.execute(f"SELECT {', '.join(INVOICE_COLUMNS)} FROM invoices WHERE invoice_no = ?",
+                                    (invoice_no,)).fetchone()
+            if row is None:
+                return None
+            item_rows = self.conn.execute(
+                "SELECT description, qty, unit_price_paise FROM invoice_items WHERE invoice_no = ? ORDER BY line_no",
+                (invoice_no,)).fetchall()
+        inv = _invoice_from_row(row)
+        inv["items"] = [{"desc": d, "qty": q, "unit_price": from_paise(p)} for d, q, p in item_rows]
+        return inv
+
+    def _where(self, buyer=None, date_from=None, date_to=None, invoice_from=None, invoice_to=None):
+        clauses, params = [], []
+        if buyer:
+            # Prefix match; served by idx_invoices_buyer (NOCASE column + LIKE optimisation)
+            clauses.append("buyer LIKE ? ESCAPE '\\'")
+            params.append(buyer.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        if date_from:
+            clauses.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("date <= ?")
+            params.append(date_to)
+        if invoice_from is not None:
+            clauses.append("invoice_no >= ?")
+            params.append(invoice_from)
+        if invoice_to is not None:
+            clauses.append("invoice_no <= ?")
+            params.append(invoice_to)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def find(self, buyer=None, date_from=None, date_to=None, invoice_from=None, invoice_to=None, limit=None):
+        """Returns matching invoices (without items), ordered by invoice number"""
+        where, params = self._where(buyer, date_from, date_to, invoice_from, invoice_to)
+        sql = f"SELECT {', '.join(INVOICE_COLUMNS)} FROM invoices{where} ORDER BY invoice_no"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [_invoice_from_row(r) for r in rows]
+
+    def iter_find(self, buyer=None, date_from=None, date_to=None, invoice_from=None, invoice_to=None, page_size=1000):
+        """Like find(), but yields invoices a page at a time so huge ranges are never held in memory"""
+        while True:
+            page = self.find(buyer, date_from, date_to, invoice_from, invoice_to, limit=page_size)
+            yield from page
+            if len(page) < page_size:
+                return
+            invoice_from = page[-1]["invoice_no"] + 1
+
+    def totals(self, buyer=None, date_from=None, date_to=None):
+        """Returns count, subtotal, tax and total over the matching invoices"""
+        where, params = self._where(buyer, date_from, date_to)
+        with self._lock:
+            row = self.conn.execute(
+                f"SELECT COUNT(*), SUM(subtotal_paise), SUM(tax_paise), SUM(total_paise) FROM invoices{where}",
+                params).fetchone()
+        return {"count": row[0], "subtotal": from_paise(row[1]), "tax": from_paise(row[2]), "total": from_paise(row[3])}
@@ -0,0 +1,124 @@
+"""
+Line Items
+Columnar store for an invoice's line items. Quantities and unit prices live in
+two int64 arrays (prices in integer paise) next to a list of descriptions, so
+a long itemised bill takes a fraction of the memory of a list of dicts and
+its totals are one pass over the arrays instead of a Decimal per line.
+
+Reading an item (indexing or iterating) returns the usual
+{"desc", "qty", "unit_price"} dict, so templates, the ledger and the render
+cache take a LineItems wherever they take a list of item dicts.
+"""
+
+from array import array
+from decimal import Decimal, ROUND_HALF_UP
+from operator import mul
+
+from ledger import to_paise, from_paise
+
+PAISA = Decimal("0.01")
+
+class LineItems:
+    """Line items as columns: descriptions, quantities and unit prices in paise.
+
+    Unit prices are rounded to the paisa when stored, which is what every line
+    total is computed from anyway. Not thread-safe; hand a copy() to
+    background work.
+    """
+    __slots__ = ("descs", "qtys", "prices", "_subtotal")
+
+    def __init__(self, items=()):
+        self.descs = []
+        self.qtys = array("q")
+        self.prices = array("q") # unit prices in paise
+        self._subtotal = 0       # paise, kept in step with every change
+        self.extend(items)
+
+    @classmethod
+    def from_columns(cls, descs, qtys, prices_paise):
+        self = cls()
+        self.descs = list(descs)
+        self.qtys = array("q", qtys)
+        self.prices = array("q", prices_paise)
+        if not len(self.descs) == len(self.qtys) == len(self.prices):
+            raise ValueError("columns differ in length")
+        self._subtotal = sum(map(mul, self.qtys, self.prices))
+        return self
+
+    def copy(self):
+        other = LineItems()
+        other.descs, other.qtys, other.prices = self.descs[:], self.qtys[:], self.prices[:]
+        other._subtotal = self._subtotal
+        return other
+
+    # --- Changes ---
+
+    @staticmethod
+    def _row(qty, unit_price):
+        qty, price = int(qty), to_paise(unit_price)
+        array("q", (qty, price)) # raises OverflowError before anything is changed
+        return qty, price
+
+    def append(self, desc, qty, unit_price):
+        qty, price = self._row(qty, unit_price)
+        self.descs.append(desc)
+        self.qtys.append(qty)
+        self.prices.append(price)
+        self._subtotal += qty * price
+
+    def extend(self, items):
+        """Appends item dicts"""
+        for it in items:
+            self.append(it['desc'], it['qty'], it['unit_price'])
+
+    def update(self, index, desc, qty, unit_price):
+        qty, price = self._row(qty, unit_price)
+        self._subtotal += qty * price - self.qtys[index] * self.prices[index]
+        self.descs[index] = desc
+        self.qtys[index] = qty
+        self.prices[index] = price
+
+    def __delitem__(self, index):
+        self._subtotal -= self.qtys[index] * self.prices[index]
+        del self.descs[index], self.qtys[index], self.prices[index]
+
+    def clear(self):
+        self.descs.clear()
+        del self.qtys[:], self.prices[:]
+        self._subtotal = 0
+
+    # --- Reading ---
+
+    def __len__(self):
+        return len(self.descs)
+
+    def __bool__(self):
+        return bool(self.descs)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return LineItems.from_columns(self.descs[index], self.qtys[index], self.prices[index])
+        return {"desc": self.descs[index], "qty": self.qtys[index], "unit_price": from_paise(self.prices[index])}
+
+    def __iter__(self):
+        for desc, qty, price in zip(self.descs, self.qtys, self.prices):
+            yield {"desc": desc, "qty": qty, "unit_price": from_paise(price)}
+
+    def line_total_paise(self, index):
+        return self.qtys[index] * self.prices[index]
+
+    def line_totals_paise(self):
+        """Every line total in paise, in one pass"""
+        return list(map(mul, self.qtys, self.prices))
+
+    def subtotal_paise(self):
+        return self._subtotal
+
+    def subtotal(self):
+        return from_paise(self._subtotal)
+
+    def totals(self, tax_percent):
+        """Returns (subtotal, tax_amount, total) as Decimals, the same as compute_totals() on the item dicts"""
+        subtotal = self.subtotal()
+        tax_amount = (subtotal * Decimal(str(tax_percent)) / 100).quantize(PAISA, rounding=ROUND_HALF_UP)
+        return subtotal, tax_amount, subtotal + tax_amount
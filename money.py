@@ -0,0 +1,154 @@
+"""
+Money Formatting
+Formats and parses amounts with the currency symbol and digit grouping set
+once: Indian lakh/crore grouping (₹12,34,567.89) or Western thousands
+(₹1,234,567.89). Amounts are rounded half up to the paisa, like the rest of
+the app, and formatted from integer paise, so a whole column can be
+formatted in one call without a Decimal operation per digit group.
+"""
+
+from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
+
+GROUPINGS = ("indian", "western")
+
+class MoneyFormat:
+    """Formatter and parser for one currency symbol and grouping style. Immutable; share one instance."""
+    __slots__ = ("symbol", "grouping", "_group", "_heads", "_neg")
+
+    def __init__(self, symbol="₹", grouping="indian"):
+        if grouping not in GROUPINGS:
+            raise ValueError(f"Unknown digit grouping '{grouping}' (choose from {', '.join(GROUPINGS)})")
+        self.symbol = symbol
+        self.grouping = grouping
+        self._group = _indian if grouping == "indian" else _western
+        # Grouped digits above the last three, precomputed for amounts below 1 crore (Indian) / 10 million
+        self._heads = {str(n): self._group(str(n) + "000")[:-4] for n in range(1, 10_000)}
+        self._neg = "-" + symbol
+
+    # --- Formatting ---
+    # The common cases (two decimals, under 1 crore) are a str() of the value,
+    # a few slices and one table lookup; anything else is rounded to paise
+    # with Decimal first.
+
+    def format_paise(self, paise):
+        """Formats an integer amount in paise, e.g. 123456789 -> "₹12,34,567.89" """
+        s = str(paise)
+        if s[0] == "-":
+            s = s[1:].rjust(3, "0")
+            return f"{self._neg}{self._group(s[:-2])}.{s[-2:]}"
+        n = len(s)
+        if n <= 5:
+            return f"{self.symbol}{s[:-2] or '0'}.{s[-2:].rjust(2, '0')}"
+        head = self._heads.get(s[:-5])
+        if head is not None:
+            return f"{self.symbol}{head},{s[-5:-2]}.{s[-2:]}"
+        return f"{self.symbol}{self._group(s[:-2])}.{s[-2:]}"
+
+    def format(self, amount):
+        """Formats a Decimal, int, float or amount string (raises ValueError if it is not an amount)"""
+        cls = amount.__class__
+        if cls is Decimal or cls is float:
+            whole, _, cents = (str(amount) if cls is Decimal else repr(amount)).partition(".")
+            n = len(cents)
+            if 0 < n <= 2 and whole.isdigit():
+                if n == 1:
+                    cents += "0"
+                if len(whole) <= 3:
+                    return f"{self.symbol}{whole}.{cents}"
+                head = self._heads.get(whole[:-3])
+                if head is not None:
+                    return f"{self.symbol}{head},{whole[-3:]}.{cents}"
+        if isinstance(amount, float):
+            parts = _plain(repr(amount))
+        elif isinstance(amount, int):
+            return self.format_paise(amount * 100)
+        elif isinstance(amount, Decimal):
+            parts = _plain(str(amount))
+        else:
+            return self.format_paise(self.parse_paise(amount))
+        if parts is None: # more than two decimals, an exponent, or not a number
+            return self.format_paise(self.to_paise(amount))
+        negative, digits, cents = parts
+        return f"{self._neg if negative else self.symbol}{self._group(digits)}.{cents}"
+
+    def format_many(self, amounts):
+        """Formats a whole column of amounts; returns a list of strings"""
+        return list(map(self.format, amounts))
+
+    def format_paise_many(self, paise_values):
+        """Formats a whole column of integer paise (e.g. LineItems.prices); returns a list of strings"""
+        return list(map(self.format_paise, paise_values))
+
+    # --- Parsing ---
+
+    def to_paise(self, amount):
+        """Integer paise for a Decimal, int, float or amount string, rounded half up"""
+        if isinstance(amount, Decimal):
+            return _decimal_paise(amount, amount)
+        if isinstance(amount, int):
+            return amount * 100
+        if isinstance(amount, float):
+            return _decimal_paise(Decimal(repr(amount)), amount)
+        return self.parse_paise(amount)
+
+    def parse_paise(self, text):
+        """Integer paise in an amount string in either grouping, with or without the symbol"""
+        s = str(text).strip()
+        negative = s.startswith("-")
+        s = s.lstrip("-").strip()
+        if self.symbol and s.startswith(self.symbol):
+            s = s[len(self.symbol):]
+        s = s.replace(",", "").strip()
+        if s.startswith("-"):
+            negative, s = not negative, s[1:]
+        try:
+            value = Decimal(s)
+        except InvalidOperation:
+            raise ValueError(f"not an amount: {text!r}") from None
+        paise = _decimal_paise(value, text)
+        return -paise if negative else paise
+
+    def parse(self, text):
+        """Decimal amount (rounded to the paisa) in an amount string"""
+        return Decimal(self.parse_paise(text)).scaleb(-2)
+
+    def parse_many(self, texts):
+        parse = self.parse
+        return [parse(t) for t in texts]
+
+def _decimal_paise(value, original):
+    if not value.is_finite():
+        raise ValueError(f"not an amount: {original!r}")
+    try:
+        return int(value.scaleb(2).to_integral_value(ROUND_HALF_UP))
+    except ArithmeticError:
+        raise ValueError(f"not an amount: {original!r}") from None
+
+def _plain(s):
+    """(negative, integer digits, two-digit cents) of a plain number string with at most two decimals, else None"""
+    negative = s[:1] == "-"
+    if negative:
+        s = s[1:]
+    whole, _, frac = s.partition(".")
+    if len(frac) > 2 or not whole.isdigit() or not whole.isascii() or (frac and not frac.isdigit()):
+        return None
+    cents = (frac + "00")[:2]
+    if negative and cents == "00" and whole.strip("0") == "":
+        negative = False # no "-₹0.00"
+    return negative, whole, cents
+
+def _western(digits):
+    return digits if len(digits) <= 3 else f"{int(digits):,}"
+
+def _indian(digits):
+    """Lakh/crore grouping of a digit string: the last three digits, then pairs (12,34,567)"""
+    n = len(digits)
+    if n <= 3:
+        return digits
+    if n <= 5:
+        return f"{digits[:-3]},{digits[-3:]}"
+    if n <= 7:
+        return f"{digits[:-5]},{digits[-5:-3]},{digits[-3:]}"
+    head = digits[:-3]
+    k = len(head) % 2
+    return ",".join(([head[:k]] if k else []) + [head[i:i + 2] for i in range(k, len(head), 2)] + [digits[-3:]])
@@ -0,0 +1,333 @@
+"""
+Print Queue
+Persistent, background-drained queue of PDFs waiting to be printed.
+Jobs for the same printer are merged into one spooler submission, failed
+submissions are retried with exponential backoff, and job state lives in
+SQLite so pending prints survive a restart.
+"""
+
+import os
+import time
+import shlex
+import logging
+import sqlite3
+import platform
+import threading
+import subprocess
+
+import tracing
+
+log = logging.getLogger("invoice_app.print_queue")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS print_jobs (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    pdf_path      TEXT NOT NULL,
+    printer       TEXT NOT NULL DEFAULT '',  -- '' means the system default printer
+    status        TEXT NOT NULL DEFAULT 'pending', -- pending, printing, done, failed
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    next_attempt  REAL NOT NULL DEFAULT 0,   -- unix time
+    last_error    TEXT,
+    created_at    TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at   TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_print_jobs_due ON print_jobs(status, next_attempt);
+"""
+
+JOB_COLUMNS = ("id", "pdf_path", "printer", "status", "attempts", "next_attempt", "last_error", "created_at", "finished_at")
+STATUSES = ("pending", "printing", "done", "failed")
+
+class PermanentPrintError(Exception):
+    """A job that can never succeed (e.g. its PDF is gone); it is failed without retries"""
+
+# ---------- Spoolers ----------
+# A spooler is any callable spooler(pdf_path, printer) that raises on failure.
+# printer is None for the system default printer.
+
+class CommandSpooler:
+    """Runs a command line per submission, e.g. "lp {file}" or "python fake_lp.py {file}".
+
+    {file} and {printer} are substituted in each argument. printer_command is
+    used instead of command when a printer is named.
+    """
+
+    def __init__(self, command="lp {file}", printer_command="lp -d {printer} {file}", timeout=120):
+        self.command = shlex.split(command) if isinstance(command, str) else list(command)
+        if printer_command is None:
+            self.printer_command = self.command
+        else:
+            self.printer_command = shlex.split(printer_command) if isinstance(printer_command, str) else list(printer_command)
+        self.timeout = timeout
+
+    def __call__(self, pdf_path, printer=None):
+        template = self.printer_command if printer else self.command
+        args = [a.replace("{file}", pdf_path).replace("{printer}", printer or "") for a in template]
+        proc = subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=self.timeout)
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.decode(errors="replace").strip() or f"'{args[0]}' exited with status {proc.returncode}")
+
+    def __repr__(self):
+        return f"CommandSpooler({shlex.join(self.command)!r})"
+
+class ShellExecuteSpooler:
+    """Windows: hands the PDF to the registered PDF viewer's "printto" verb (needs pywin32)"""
+
+    def __call__(self, pdf_path, printer=None):
+        import win32api
+        import win32print
+        if not printer:
+            printer = win32print.GetDefaultPrinter()
+        win32api.ShellExecute(0, "printto", pdf_path, f'"{printer}"', ".", 0)
+
+def default_spooler(command=None):
+    """Spooler from an explicit command line, the INVOICE_SPOOLER variable, or the platform default"""
+    command = command or os.environ.get("INVOICE_SPOOLER")
+    if command:
+        return CommandSpooler(command, printer_command=None)
+    if platform.system() == "Windows":
+        return ShellExecuteSpooler()
+    return CommandSpooler()
+
+def merge_pdfs(paths, out_path, skipped=None):
+    """Concatenates PDFs into out_path without rasterising them.
+
+    With a skipped list, inputs that cannot be read are appended to it and
+    left out instead of failing the merge; returns None if none were readable.
+    """
+    import fitz # PyMuPDF, only needed once a batch is merged
+    out = fitz.open()
+    try:
+        for path in paths:
+            pages = out.page_count
+            try:
+                with fitz.open(path) as src:
+                    out.insert_pdf(src)
+            except Exception:
+                if skipped is None:
+                    raise
+                if out.page_count > pages:
+                    out.delete_pages(from_page=pages)
+                skipped.append(path)
+        if not out.page_count:
+            return None
+        out.save(out_path, garbage=1, deflate=True)
+    finally:
+        out.close()
+    return out_path
+
+# ---------- Queue ----------
+class PrintQueue:
+    """Persistent print queue. start() drains it on a daemon thread; drain() does so in the caller.
+
+    Delivery is at-least-once: a job that was being submitted when the process
+    died is retried on the next start.
+    """
+
+    def __init__(self, path, spooler=None, spool_dir=None, batch_size=50, max_attempts=5,
+                 backoff_base=5.0, backoff_max=300.0, linger=0.5):
+        self.path = path
+        self.spooler = spooler or default_spooler()
+        self.spool_dir = spool_dir or os.path.join(os.path.dirname(os.path.abspath(path)), "spool")
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.linger = linger # wait this long after a wake-up so a burst of adds is merged
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+            # Submissions interrupted by a crash or shutdown go back in line
+            self.conn.execute("UPDATE print_jobs SET status = 'pending' WHERE status = 'printing'")
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- Jobs ---
+
+    def add(self, pdf_path, printer=None):
+        """Queues one PDF and returns its job id"""
+        return self.add_many([pdf_path], printer)[0]
+
+    def add_many(self, pdf_paths, printer=None):
+        """Queues several PDFs in one transaction and returns their job ids"""
+        ids = []
+        with self._lock, self.conn:
+            for p in pdf_paths:
+                cur = self.conn.execute("INSERT INTO print_jobs (pdf_path, printer) VALUES (?, ?)",
+                                        (os.path.abspath(p), printer or ""))
+                ids.append(cur.lastrowid)
+        self._wake.set()
+        return ids
+
+    def counts(self):
+        """Number of jobs in each status"""
+        with self._lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) FROM print_jobs GROUP BY status").fetchall()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(rows)
+        return counts
+
+    def jobs(self, status=None, limit=100):
+        sql = f"SELECT {', '.join(JOB_COLUMNS)} FROM print_jobs"
+        params = []
+        if status:
+            sql += " WHERE status = ?"
+            params.append(status)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(int(limit))
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [dict(zip(JOB_COLUMNS, r)) for r in rows]
+
+    def retry_failed(self):
+        """Puts every failed job back in the queue with a fresh attempt count"""
+        with self._lock, self.conn:
+            n = self.conn.execute("UPDATE print_jobs SET status = 'pending', attempts = 0, next_attempt = 0,"
+                                  " finished_at = NULL WHERE status = 'failed'").rowcount
+        self._wake.set()
+        return n
+
+    def clear_done(self):
+        with self._lock, self.conn:
+            return self.conn.execute("DELETE FROM print_jobs WHERE status = 'done'").rowcount
+
+    # --- Processing ---
+
+    def _claim_batch(self, now):
+        """Marks the next due jobs for one printer as printing and returns them"""
+        with self._lock, self.conn:
+            first = self.conn.execute("SELECT printer FROM print_jobs WHERE status = 'pending' AND next_attempt <= ?"
+                                      " ORDER BY next_attempt, id LIMIT 1", (now,)).fetchone()
+            if first is None:
+                return []
+            rows = self.conn.execute(
+                "SELECT id, pdf_path, attempts FROM print_jobs WHERE status = 'pending' AND next_attempt <= ?"
+                " AND printer = ? ORDER BY id LIMIT ?", (now, first[0], self.batch_size)).fetchall()
+            self.conn.executemany("UPDATE print_jobs SET status = 'printing' WHERE id = ?", [(r[0],) for r in rows])
+        return [{"id": r[0], "pdf_path": r[1], "attempts": r[2], "printer": first[0] or None} for r in rows]
+
+    def _finish(self, jobs, error=None, permanent=False):
+        now = time.time()
+        with self._lock, self.conn:
+            for job in jobs:
+                attempts = job["attempts"] + 1
+                if error is None:
+                    self.conn.execute("UPDATE print_jobs SET status = 'done', attempts = ?, last_error = NULL,"
+                                      " finished_at = CURRENT_TIMESTAMP WHERE id = ?", (attempts, job["id"]))
+                elif permanent or attempts >= self.max_attempts:
+                    self.conn.execute("UPDATE print_jobs SET status = 'failed', attempts = ?, last_error = ?,"
+                                      " finished_at = CURRENT_TIMESTAMP WHERE id = ?", (attempts, str(error), job["id"]))
+                else:
+                    delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+                    self.conn.execute("UPDATE print_jobs SET status = 'pending', attempts = ?, last_error = ?,"
+                                      " next_attempt = ? WHERE id = ?", (attempts, str(error), now + delay, job["id"]))
+
+    def process_due(self):
+        """Submits one batch of due jobs. Returns the number of jobs handled (0 if none were due)."""
+        jobs = self._claim_batch(time.time())
+        if not jobs:
+            return 0
+        claimed = len(jobs)
+
+        missing = [j for j in jobs if not os.path.exists(j["pdf_path"])]
+        if missing:
+            self._finish(missing, PermanentPrintError("PDF not found"), permanent=True)
+            jobs = [j for j in jobs if j not in missing]
+            if not jobs:
+                return claimed
+
+        printer = jobs[0]["printer"]
+        merged = None
+        try:
+            if len(jobs) == 1:
+                target = jobs[0]["pdf_path"]
+            else:
+                os.makedirs(self.spool_dir, exist_ok=True)
+                merged = os.path.join(self.spool_dir, f"batch_{jobs[0]['id']}-{jobs[-1]['id']}.pdf")
+                unreadable = []
+                with tracing.span("print.merge", jobs=len(jobs)):
+                    target = merge_pdfs([j["pdf_path"] for j in jobs], merged, skipped=unreadable)
+                if unreadable:
+                    # One corrupt PDF must not hold back (and eventually fail) the rest of the batch
+                    bad = [j for j in jobs if j["pdf_path"] in unreadable]
+                    log.warning("Leaving %d unreadable PDF(s) out of the print batch", len(bad))
+                    self._finish(bad, PermanentPrintError("PDF cannot be read"), permanent=True)
+                    jobs = [j for j in jobs if j not in bad]
+                    if not jobs:
+                        return claimed
+            with tracing.span("print.spool", jobs=len(jobs)):
+                self.spooler(target, printer)
+        except Exception as e:
+            log.warning("Print submission of %d job(s) to %s failed: %s", len(jobs), printer or "default printer", e)
+            self._finish(jobs, e)
+        else:
+            log.info("Sent %d job(s) to %s in one submission", len(jobs), printer or "default printer")
+            self._finish(jobs)
+        finally:
+            if merged and os.path.exists(merged):
+                try:
+                    os.remove(merged)
+                except OSError:
+                    pass # the spooler may still hold it (Windows); it is overwritten next time
+        return claimed
+
+    def seconds_until_due(self):
+        """Seconds until the next pending job is due (0 if one is due now), or None if nothing is pending"""
+        with self._lock:
+            row = self.conn.execute("SELECT MIN(next_attempt) FROM print_jobs WHERE status = 'pending'").fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def drain(self, on_progress=None):
+        """Processes jobs in the calling thread until none are pending (retries included)"""
+        while True:
+            if self.process_due():
+                if on_progress is not None:
+                    on_progress(self.counts())
+                continue
+            wait = self.seconds_until_due()
+            if wait is None:
+                return self.counts()
+            time.sleep(min(wait, 1.0))
+
+    def start(self):
+        """Starts the background drain thread (idempotent)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="print-queue", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.process_due():
+                    continue
+                wait = self.seconds_until_due()
+            except Exception:
+                log.exception("Print queue worker error")
+                wait = self.backoff_base
+            self._wake.wait(wait if wait is not None else None)
+            if self._wake.is_set():
+                self._wake.clear()
+                self._stop.wait(self.linger)
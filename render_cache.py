@@ -0,0 +1,160 @@
+"""
+Render Cache
+Content-addressed store of rendered invoice PDFs, so previewing, printing or
+reprinting an invoice that has not changed costs a hash lookup instead of a
+full render. Entries are files named after the key, evicted least recently
+used first once the cache grows past its size limit; the directory can be
+shared by several processes.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+log = logging.getLogger("invoice_app.render_cache")
+
+def cache_key(*parts):
+    """Canonical SHA-256 of JSON-serialisable parts (Decimals and other values are hashed via str)"""
+    blob = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+class RenderCache:
+    """LRU cache of PDF bytes on disk, bounded in bytes. Thread-safe."""
+
+    SUFFIX = ".pdf"
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = self.misses = self.stores = self.evictions = 0
+        self._entries = OrderedDict() # key -> size, least recently used first
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        found = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(self.SUFFIX) and entry.is_file():
+                    st = entry.stat()
+                    found.append((st.st_mtime, entry.name[:-len(self.SUFFIX)], st.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self.size += size
+        with self._lock:
+            self._evict()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def _evict(self):
+        while self.size > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self.size -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass # already gone (another process evicted it)
+
+    def _forget(self, key):
+        self.size -= self._entries.pop(key, 0)
+
+    def get_path(self, key):
+        """Path of the cached PDF for key, or None on a miss"""
+        path = self._path(key)
+        with self._lock:
+            if key not in self._entries and os.path.exists(path):
+                self._entries[key] = os.path.getsize(path) # stored by another process
+                self.size += self._entries[key]
+            if key in self._entries:
+                try:
+                    os.utime(path) # keeps the LRU order across restarts
+                except OSError:
+                    self._forget(key)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return path
+            self.misses += 1
+            return None
+
+    def get(self, key):
+        """Cached PDF bytes for key, or None on a miss"""
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            with self._lock:
+                self._forget(key)
+                self.hits -= 1
+                self.misses += 1
+            return None
+
+    def copy_to(self, key, target):
+        """Writes the cached PDF for key to a path or file-like object; returns False on a miss"""
+        if hasattr(target, "write"):
+            data = self.get(key)
+            if data is None:
+                return False
+            target.write(data)
+            return True
+        path = self.get_path(key)
+        if path is None:
+            return False
+        try:
+            shutil.copyfile(path, target)
+        except FileNotFoundError:
+            with self._lock:
+                self._forget(key)
+                self.hits -= 1
+                self.misses += 1
+            return False
+        return True
+
+    def put(self, key, data):
+        """Stores PDF bytes under key (written atomically). PDFs larger than the cache are not kept."""
+        if len(data) > self.max_bytes:
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = len(data)
+            self.size += len(data)
+            self.stores += 1
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "bytes": self.size, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                    "stores": self.stores, "evictions": self.evictions}
@@ -0,0 +1,388 @@
+"""
+Invoice Rendering Service
+Small local HTTP API in front of generate_pdf for POS and e-commerce backends.
+Renders run on a bounded process pool; when every worker is busy and the
+queue is full, requests are turned away with 503 + Retry-After instead of
+piling up.
+
+  POST /invoices          validate, number, render and record an invoice;
+                          returns the ledger entry (JSON), or the PDF with ?format=pdf
+  POST /invoices/render   render only (no number used, nothing saved); returns the PDF
+  GET  /invoices/<no>     ledger entry       GET /invoices/<no>/pdf   stored PDF
+  GET  /health            liveness           GET /metrics             counters and latencies
+
+The request body is one order in the batch JSONL shape:
+  {"buyer_name": "...", "buyer_address": "...", "tax_percent": 18, "notes": "...",
+   "seller": "...", "date": "YYYY-MM-DD", "items": [{"desc": "...", "qty": 1, "unit_price": "99.00"}]}
+
+Usage: python render_service.py [--host 127.0.0.1] [--port 8765] [--workers N] [--queue 32]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import signal
+import logging
+import argparse
+import threading
+from decimal import Decimal
+from collections import deque
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import invoice_app
+import tracing
+
+log = logging.getLogger("invoice_app.service")
+
+MAX_BODY_BYTES = 1024 * 1024
+RENDER_TIMEOUT_S = 60
+LATENCY_WINDOW = 1000 # recent requests kept for the latency percentiles
+
+def _buyer(order):
+    return f"{order['buyer_name']}\n{order['buyer_address']}"
+
+def _render_bytes_job(job):
+    """Pool worker: renders an order in memory and returns the PDF bytes (the caller caches them)"""
+    pdf = invoice_app.render_pdf_bytes(
+        job["invoice_no"], job["date"], job["seller"], _buyer(job),
+        job["items"], job["subtotal"], job["tax_percent"], job["tax"], job["total"], job["notes"], engine=job["engine"], cache=False,
+        profile=job["profile"])
+    return {"pdf": pdf, "trace": tracing.take() if tracing.enabled() else None}
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+class ServiceBusy(Exception):
+    """Every worker is busy and the queue is full"""
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+# ---------- Metrics ----------
+class ServiceMetrics:
+    """Thread-safe request counters and a sliding window of render latencies"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.counters = {"requests": 0, "rendered": 0, "recorded": 0, "rejected_busy": 0,
+                         "client_errors": 0, "server_errors": 0}
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def observe(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self.counters)
+            latencies = sorted(self._latencies)
+        def pct(p):
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2) if latencies else None
+        return {"uptime_s": round(time.time() - self.started, 1), **counters,
+                "render_ms": {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99), "samples": len(latencies)}}
+
+# ---------- Service ----------
+class RenderService:
+    """Owns the process pool and the admission limit shared by all request threads"""
+
+    def __init__(self, workers=None, queue_size=32, engine=None, seller=invoice_app.DEFAULT_SELLER, profile=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.capacity = self.workers + queue_size # renders admitted at once: running + waiting
+        self.engine = engine or invoice_app.DEFAULT_ENGINE
+        self.profile = profile or invoice_app.OUTPUT_PROFILE
+        self.seller = seller
+        self.metrics = ServiceMetrics()
+        self.cache = invoice_app.get_render_cache()
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._templates = {} # (engine, profile) -> template, only used for render cache keys
+        self._templates_lock = threading.Lock()
+        invoice_app.load_reportlab() # forked workers inherit it
+        self.pool = ProcessPoolExecutor(self.workers, initializer=tracing.init_worker,
+                                        initargs=(tracing.enabled(), tracing.events_enabled()))
+        # Start the workers now, while this is the only thread. The pool forks them on its first submit, and a child
+        # forked while a request thread holds a lock (tracing's, logging's) would hang on it in init_worker.
+        self.pool.submit(os.getpid).result()
+        # Open the stores before the first request, so request threads never race to create them
+        invoice_app.get_ledger()
+        invoice_app.get_archive()
+        invoice_app.get_search_index()
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+    def in_flight(self):
+        with self._lock:
+            return self._in_flight
+
+    def run(self, fn, job, on_abandoned=None):
+        """Runs fn(job) on the pool, or raises ServiceBusy if the queue is full.
+
+        The admission slot is held until the job leaves the pool, also when the
+        caller stops waiting after RENDER_TIMEOUT_S (raising TimeoutError). A
+        timed-out job that already started cannot be stopped; on_abandoned(future)
+        is called when it finishes, to clean up after it.
+        """
+        if not self._slots.acquire(blocking=False):
+            self.metrics.incr("rejected_busy")
+            raise ServiceBusy()
+        with self._lock:
+            self._in_flight += 1
+        start = time.perf_counter()
+        try:
+            future = self.pool.submit(fn, job)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        try:
+            result = future.result(timeout=RENDER_TIMEOUT_S)
+        except FutureTimeout:
+            if not future.cancel() and on_abandoned is not None:
+                future.add_done_callback(on_abandoned)
+            raise TimeoutError(f"render took longer than {RENDER_TIMEOUT_S}s") from None
+        finally:
+            self.metrics.observe(time.perf_counter() - start)
+        tracing.merge(result.pop("trace")) # the worker's per-phase timings
+        return result
+
+    def _release(self, future=None):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def normalize(self, raw):
+        if not isinstance(raw, dict):
+            raise HTTPError(400, "request body must be a JSON object")
+        engine = raw.get("engine") or self.engine
+        if engine not in invoice_app.TEMPLATE_ENGINES:
+            raise HTTPError(400, f"unknown engine '{engine}'")
+        profile = raw.get("profile") or self.profile
+        if profile not in invoice_app.OUTPUT_PROFILES:
+            raise HTTPError(400, f"unknown output profile '{profile}'")
+        try:
+            order = invoice_app._normalize_order(raw, self.seller)
+        except Exception as e:
+            raise HTTPError(400, str(e))
+        order["engine"] = engine
+        order["profile"] = profile
+        return order
+
+    def template(self, engine, profile):
+        """Template for render cache keys, built once per (engine, profile).
+
+        default_template() keeps one per thread, and the HTTP server starts a
+        thread per request, so it would build one for every preview.
+        """
+        with self._templates_lock:
+            template = self._templates.get((engine, profile))
+            if template is None:
+                template = self._templates[(engine, profile)] = invoice_app.TEMPLATE_ENGINES[engine](profile=profile)
+        return template
+
+    def render_preview(self, raw):
+        """Renders a draft; a draft seen before is served from the render cache without using a worker"""
+        order = self.normalize(raw)
+        order["invoice_no"] = invoice_app.next_invoice_number()
+        key = invoice_app.render_cache_key(
+            self.template(order["engine"], order["profile"]), order["invoice_no"], order["date"], order["seller"], _buyer(order),
+            order["items"], order["subtotal"], order["tax_percent"], order["tax"], order["total"], order["notes"])
+        with tracing.span("service.cache_lookup"):
+            pdf = self.cache.get(key)
+        if pdf is None:
+            pdf = self.run(_render_bytes_job, order)["pdf"]
+            self.cache.put(key, pdf)
+            self.metrics.incr("rendered")
+        return order["invoice_no"], pdf
+
+    def create_invoice(self, raw):
+        """Numbers, renders and records an order; returns its ledger entry"""
+        order = self.normalize(raw)
+        inv_no = invoice_app.allocate_invoice_numbers()
+        pdf_path = invoice_app.invoice_pdf_path(inv_no, order["date"])
+        order.update(ref=f"http:{inv_no}", invoice_no=inv_no, pdf_path=pdf_path)
+
+        def discard_late_pdf(future):
+            # The request already failed and the number stays unused, so a PDF written now would have no ledger row
+            try:
+                os.remove(pdf_path)
+            except FileNotFoundError:
+                return
+            except OSError as e:
+                log.warning("Invoice %04d finished after its request timed out; cannot remove %s: %s", inv_no, pdf_path, e)
+                return
+            log.warning("Invoice %04d finished after its request timed out; removed %s", inv_no, pdf_path)
+
+        try:
+            res = self.run(invoice_app._render_batch_job, order, on_abandoned=discard_late_pdf)
+        except TimeoutError as e:
+            raise RuntimeError(f"invoice {inv_no:04d} failed, number left unused: {e}") from None
+        if res["error"]:
+            raise RuntimeError(f"invoice {inv_no:04d} failed, number left unused: {res['error']}")
+        self.metrics.incr("rendered")
+        invoice_app.save_invoice_record(inv_no, order["date"], order["buyer_name"], order["subtotal"], order["tax"],
+                                        order["total"], items=order["items"], buyer_address=order["buyer_address"],
+                                        seller=order["seller"], tax_percent=order["tax_percent"], notes=order["notes"],
+                                        pdf_path=pdf_path)
+        self.metrics.incr("recorded")
+        return invoice_app.get_ledger().get_invoice(inv_no)
+
+    def health(self):
+        in_flight = self.in_flight()
+        return {"status": "busy" if in_flight >= self.capacity else "ok", "workers": self.workers,
+                "capacity": self.capacity, "in_flight": in_flight, "engine": self.engine,
+                "profile": self.profile}
+
+# ---------- HTTP ----------
+class RequestHandler(BaseHTTPRequestHandler):
+    server_version = "InvoiceRenderService/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, fmt, *args):
+        log.info("%s %s", self.address_string(), fmt % args)
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        if not isinstance(body, bytes):
+            body = json.dumps(body, default=_json_default).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True # the body is left unread
+            raise HTTPError(413, f"request body larger than {MAX_BODY_BYTES} bytes")
+        try:
+            return json.loads(self.rfile.read(length) or b"null")
+        except ValueError as e:
+            raise HTTPError(400, f"invalid JSON: {e}")
+
+    def _handle(self, route):
+        self.service.metrics.incr("requests")
+        try:
+            with tracing.span(f"service.{self.command}", path=self.path):
+                route()
+        except HTTPError as e:
+            self.service.metrics.incr("client_errors")
+            self._send(e.status, {"error": str(e)})
+        except ServiceBusy:
+            self._send(503, {"error": "all render workers are busy, retry shortly"}, headers={"Retry-After": "1"})
+        except Exception as e:
+            self.service.metrics.incr("server_errors")
+            log.exception("Request %s %s failed", self.command, self.path)
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def do_GET(self):
+        self._handle(self._get)
+
+    def do_POST(self):
+        self._handle(self._post)
+
+    def _get(self):
+        path = urlsplit(self.path).path.rstrip("/")
+        if path == "/health":
+            health = self.service.health()
+            return self._send(200 if health["status"] == "ok" else 503, health)
+        if path == "/metrics":
+            return self._send(200, {**self.service.metrics.snapshot(), **self.service.health(),
+                                    "render_cache": self.service.cache.stats(), "phases_ms": tracing.stats(buckets=False)})
+        m = re.fullmatch(r"/invoices/(\d+)(/pdf)?", path)
+        if not m:
+            raise HTTPError(404, "not found")
+        inv = invoice_app.get_ledger().get_invoice(int(m.group(1)))
+        if inv is None:
+            raise HTTPError(404, f"invoice {m.group(1)} is not in the ledger")
+        if not m.group(2):
+            return self._send(200, inv)
+        pdf_path = invoice_app.find_invoice_pdf(inv["invoice_no"], inv["pdf_path"])
+        if pdf_path is None:
+            raise HTTPError(404, f"invoice {m.group(1)} has no stored PDF")
+        with open(pdf_path, "rb") as f:
+            self._send(200, f.read(), "application/pdf")
+
+    def _post(self):
+        url = urlsplit(self.path)
+        path = url.path.rstrip("/")
+        if path == "/invoices/render":
+            inv_no, pdf = self.service.render_preview(self._read_json())
+            return self._send(200, pdf, "application/pdf", {"X-Invoice-No": str(inv_no)})
+        if path == "/invoices":
+            inv = self.service.create_invoice(self._read_json())
+            if parse_qs(url.query).get("format") == ["pdf"]:
+                with open(inv["pdf_path"], "rb") as f:
+                    return self._send(201, f.read(), "application/pdf", {"X-Invoice-No": str(inv["invoice_no"])})
+            return self._send(201, inv, headers={"Location": f"/invoices/{inv['invoice_no']}"})
+        raise HTTPError(404, "not found")
+
+class ServiceHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128 # listen backlog; bursts beyond it would see connection resets instead of 503s
+
+    def __init__(self, address, service):
+        super().__init__(address, RequestHandler)
+        self.service = service
+
+def _stop_on_sigterm(signum, frame):
+    raise KeyboardInterrupt # shut down like Ctrl+C, so the timings summary is still written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1", help="address to bind (default: %(default)s, local only)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("-w", "--workers", type=int, default=None, help="render processes (default: CPU count)")
+    parser.add_argument("--queue", type=int, default=32, help="renders allowed to wait for a worker before 503 (default: %(default)s)")
+    parser.add_argument("--engine", choices=sorted(invoice_app.TEMPLATE_ENGINES), default=invoice_app.DEFAULT_ENGINE)
+    parser.add_argument("--output-profile", choices=invoice_app.OUTPUT_PROFILES, default=invoice_app.OUTPUT_PROFILE,
+                        help="standard, or rupee-glyph (the rupee sign from an embedded font subset)")
+    parser.add_argument("--seller-file", help="text file with the default seller details")
+    parser.add_argument("--trace-json", metavar="FILE", help="write the per-phase timing histograms to FILE on shutdown")
+    parser.add_argument("--chrome-trace", metavar="FILE", help="also record every timed phase and write a Chrome trace to FILE on shutdown")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    seller = invoice_app.DEFAULT_SELLER
+    if args.seller_file:
+        with open(args.seller_file, encoding="utf-8") as f:
+            seller = f.read().strip()
+
+    tracing.enable(events=bool(args.chrome_trace)) # before the pool starts, so workers time their phases too
+    service = RenderService(args.workers, args.queue, args.engine, seller, args.output_profile)
+    server = ServiceHTTPServer((args.host, args.port), service)
+    log.info("Serving on http://%s:%d with %d workers (queue %d)", args.host, args.port, service.workers, args.queue)
+    signal.signal(signal.SIGTERM, _stop_on_sigterm)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        log.info("%s", tracing.summary())
+        invoice_app.export_traces(args.trace_json, args.chrome_trace)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
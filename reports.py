@@ -0,0 +1,218 @@
+"""
+Ledger Reports
+Revenue, top buyer, tax and ageing reports over the invoice ledger, computed
+with pandas on a columnar snapshot of the invoices table. The snapshot is
+pickled next to the ledger and each refresh only reads the rows recorded
+since the last one, so a report over millions of invoices takes seconds.
+"""
+
+import os
+import pickle
+import sqlite3
+import logging
+import threading
+import datetime
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+log = logging.getLogger("invoice_app.reports")
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_COLUMNS = ("invoice_no", "date", "buyer", "tax_percent", "subtotal_paise", "tax_paise", "total_paise")
+AMOUNT_COLUMNS = ("subtotal_paise", "tax_paise", "total_paise")
+AGEING_BUCKETS = (30, 60, 90) # upper bounds in days; anything older goes in the last bucket
+FETCH_ROWS = 100_000
+
+# ---------- Snapshot ----------
+def _frame(rows):
+    """Typed DataFrame from (invoice_no, date, buyer, tax_percent, subtotal, tax, total) tuples"""
+    df = pd.DataFrame.from_records(rows, columns=SNAPSHOT_COLUMNS)
+    df["invoice_no"] = df["invoice_no"].astype("int64")
+    # Invoices imported from the old CSV may carry dates in other formats; they stay undated (NaT)
+    df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%d", errors="coerce")
+    df["buyer"] = df["buyer"].astype("category")
+    df["tax_percent"] = df["tax_percent"].astype("float64")
+    for col in AMOUNT_COLUMNS:
+        df[col] = df[col].astype("int64")
+    return df
+
+def _concat(frames):
+    frames = [f for f in frames if f is not None and len(f)]
+    if not frames:
+        return _frame([])
+    if len(frames) == 1:
+        return frames[0]
+    buyer = union_categoricals([f["buyer"] for f in frames])
+    df = pd.concat([f.drop(columns="buyer") for f in frames], ignore_index=True)
+    df.insert(SNAPSHOT_COLUMNS.index("buyer"), "buyer", buyer)
+    return df
+
+class LedgerSnapshot:
+    """Columnar copy of the ledger's invoices table, refreshed incrementally. Thread-safe.
+
+    Amounts stay in integer paise, so sums are exact; the report functions
+    convert them to rupees at the end.
+    """
+
+    def __init__(self, ledger_path, snapshot_path=None):
+        self.ledger_path = os.path.abspath(ledger_path)
+        self.snapshot_path = snapshot_path
+        self.frame = None
+        self.high_water = 0 # highest invoice number in the snapshot
+        self._lock = threading.Lock()
+
+    def _load(self):
+        self.frame, self.high_water = _frame([]), 0
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                saved = pickle.load(f)
+        except Exception as e:
+            log.warning("Ignoring unreadable report snapshot %s: %s", self.snapshot_path, e)
+            return
+        if saved.get("version") == SNAPSHOT_VERSION and saved.get("ledger") == self.ledger_path:
+            self.frame, self.high_water = saved["frame"], saved["high_water"]
+
+    def _save(self):
+        if not self.snapshot_path:
+            return
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({"version": SNAPSHOT_VERSION, "ledger": self.ledger_path,
+                         "high_water": self.high_water, "frame": self.frame}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.snapshot_path)
+
+    @staticmethod
+    def _fetch(conn, where="", params=()):
+        cur = conn.execute(f"SELECT {', '.join(SNAPSHOT_COLUMNS)} FROM invoices{where} ORDER BY invoice_no", params)
+        frames = []
+        while True:
+            rows = cur.fetchmany(FETCH_ROWS)
+            if not rows:
+                break
+            frames.append(_frame(rows))
+        return _concat(frames)
+
+    def refresh(self):
+        """Brings the snapshot up to date with the ledger; returns the number of invoices added"""
+        with self._lock:
+            if self.frame is None:
+                self._load()
+            conn = sqlite3.connect(f"file:{self.ledger_path}?mode=ro", uri=True, timeout=30)
+            try:
+                new = [self._fetch(conn, " WHERE invoice_no > ?", (self.high_water,))]
+                # Numbers are reserved before rendering, so a lower number can be recorded after a higher one
+                known_count = conn.execute("SELECT COUNT(*) FROM invoices WHERE invoice_no <= ?", (self.high_water,)).fetchone()[0]
+                if known_count < len(self.frame):
+                    # Rows disappeared (ledger replaced or restored): start over
+                    self.frame, self.high_water = _frame([]), 0
+                    new = [self._fetch(conn)]
+                elif known_count > len(self.frame):
+                    known = np.fromiter((r[0] for r in conn.execute("SELECT invoice_no FROM invoices WHERE invoice_no <= ?",
+                                                                    (self.high_water,))), dtype="int64")
+                    missing = np.setdiff1d(known, self.frame["invoice_no"].to_numpy(), assume_unique=True)
+                    for lo in range(0, len(missing), 500):
+                        chunk = [int(n) for n in missing[lo:lo + 500]]
+                        new.append(self._fetch(conn, f" WHERE invoice_no IN ({', '.join('?' * len(chunk))})", chunk))
+            finally:
+                conn.close()
+            added = sum(len(f) for f in new)
+            if added or not os.path.exists(self.snapshot_path or ""):
+                self.frame = _concat([self.frame] + new)
+                if len(self.frame):
+                    self.high_water = int(self.frame["invoice_no"].max())
+                self._save()
+            return added
+
+    def select(self, date_from=None, date_to=None, buyer=None):
+        """Matching rows of the snapshot (call refresh() first). Dates are YYYY-MM-DD strings or dates."""
+        with self._lock:
+            df = self.frame if self.frame is not None else _frame([])
+        mask = np.ones(len(df), dtype=bool)
+        if date_from:
+            mask &= (df["date"] >= pd.Timestamp(date_from)).to_numpy()
+        if date_to:
+            mask &= (df["date"] <= pd.Timestamp(date_to)).to_numpy()
+        if buyer:
+            # Prefix match, case-insensitive like the ledger's buyer lookups
+            cats = df["buyer"].cat.categories
+            wanted = cats[cats.str.lower().str.startswith(buyer.lower())]
+            mask &= df["buyer"].isin(wanted).to_numpy()
+        return df[mask]
+
+# ---------- Reports ----------
+def _rupees(df):
+    """Replaces the *_paise columns with rupee amounts"""
+    for col in AMOUNT_COLUMNS:
+        if col in df:
+            pos = df.columns.get_loc(col)
+            df.insert(pos, col[:-len("_paise")], df.pop(col) / 100)
+    return df
+
+def revenue_by_period(df, freq="D"):
+    """Invoices, subtotal, tax and total per day ("D") or month ("M") of the dated invoices"""
+    dated = df[df["date"].notna()]
+    period = dated["date"].dt.to_period(freq).rename("period")
+    out = dated.groupby(period)[list(AMOUNT_COLUMNS)].sum()
+    out.insert(0, "invoices", dated.groupby(period).size())
+    out.index = out.index.astype(str)
+    return _rupees(out.reset_index())
+
+def top_buyers(df, n=10):
+    """The n buyers with the highest invoiced total, with their share of the total"""
+    g = df.groupby("buyer", observed=True)
+    out = pd.DataFrame({"invoices": g.size(), "total_paise": g["total_paise"].sum()}).nlargest(n, "total_paise")
+    grand = df["total_paise"].sum()
+    out["share"] = (out["total_paise"] / grand).round(4) if grand else 0.0
+    out.index = out.index.astype(str)
+    return _rupees(out.reset_index())
+
+def tax_by_period(df, freq="M"):
+    """Taxable value and tax collected per period and tax rate"""
+    dated = df[df["date"].notna()]
+    period = dated["date"].dt.to_period(freq).rename("period")
+    out = dated.groupby([period, dated["tax_percent"]])[["subtotal_paise", "tax_paise"]].sum()
+    out.insert(0, "invoices", dated.groupby([period, dated["tax_percent"]]).size())
+    out = out.reset_index()
+    out["period"] = out["period"].astype(str)
+    return _rupees(out).rename(columns={"subtotal": "taxable"})
+
+def ageing(df, as_of=None, buckets=AGEING_BUCKETS):
+    """Invoices and totals grouped by age in days at as_of (default today).
+
+    The ledger does not track payments, so every selected invoice is aged;
+    narrow the date range to the invoices still open.
+    """
+    as_of = pd.Timestamp(as_of or datetime.date.today())
+    dated = df[df["date"].notna()]
+    age = (as_of - dated["date"]).dt.days
+    edges = [-np.inf, *buckets, np.inf]
+    labels = [f"0-{buckets[0]} days"] + [f"{lo + 1}-{hi} days" for lo, hi in zip(buckets, buckets[1:])] + [f"over {buckets[-1]} days"]
+    bucket = pd.cut(age, edges, labels=labels).rename("age")
+    g = dated.groupby(bucket, observed=False)
+    out = pd.DataFrame({"invoices": g.size(), "total_paise": g["total_paise"].sum(), "oldest_days": age.groupby(bucket, observed=False).max()})
+    out["oldest_days"] = out["oldest_days"].fillna(0).astype("int64")
+    out.index = out.index.astype(str)
+    return _rupees(out.reset_index())
+
+def summary(df):
+    """Headline figures for the selection"""
+    dated = df["date"].dropna()
+    return {"invoices": len(df), "buyers": int(df["buyer"].nunique()),
+            "subtotal": int(df["subtotal_paise"].sum()) / 100, "tax": int(df["tax_paise"].sum()) / 100,
+            "total": int(df["total_paise"].sum()) / 100,
+            "first_date": dated.min().date().isoformat() if len(dated) else None,
+            "last_date": dated.max().date().isoformat() if len(dated) else None}
+
+def build_report(df, top_n=10, as_of=None):
+    """All report tables for a selection, by title"""
+    return {
+        "Revenue by day": revenue_by_period(df, "D"),
+        "Revenue by month": revenue_by_period(df, "M"),
+        "Top buyers": top_buyers(df, top_n),
+        "Tax by month": tax_by_period(df, "M"),
+        "Ageing": ageing(df, as_of),
+    }
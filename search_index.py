@@ -0,0 +1,217 @@
+"""
+Search Index
+Full-text index over invoices (buyer name and address, notes and item
+descriptions) in SQLite FTS5, updated as each invoice is recorded. Invoices
+from before the index existed are added by a backfill, from the ledger's line
+items or, for invoices the ledger only has totals for, from the text of their
+PDFs. Queries walk the inverted index newest invoice first and stop at the
+result limit (ranking every match by relevance took hundreds of milliseconds
+for common words), so they take milliseconds on large archives.
+"""
+
+import re
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    invoice_no     INTEGER PRIMARY KEY,
+    date           TEXT NOT NULL DEFAULT '',
+    buyer          TEXT NOT NULL DEFAULT '',
+    buyer_address  TEXT NOT NULL DEFAULT '',
+    notes          TEXT NOT NULL DEFAULT '',
+    items          TEXT NOT NULL DEFAULT '',  -- item descriptions, one per line
+    source         TEXT NOT NULL DEFAULT 'ledger' -- 'ledger' or 'pdf' (extracted text)
+);
+CREATE INDEX IF NOT EXISTS idx_docs_date ON docs(date);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+    buyer, buyer_address, notes, items,
+    content='docs', content_rowid='invoice_no',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS docs_ai AFTER INSERT ON docs BEGIN
+    INSERT INTO docs_fts (rowid, buyer, buyer_address, notes, items)
+    VALUES (new.invoice_no, new.buyer, new.buyer_address, new.notes, new.items);
+END;
+CREATE TRIGGER IF NOT EXISTS docs_ad AFTER DELETE ON docs BEGIN
+    INSERT INTO docs_fts (docs_fts, rowid, buyer, buyer_address, notes, items)
+    VALUES ('delete', old.invoice_no, old.buyer, old.buyer_address, old.notes, old.items);
+END;
+CREATE TRIGGER IF NOT EXISTS docs_au AFTER UPDATE ON docs BEGIN
+    INSERT INTO docs_fts (docs_fts, rowid, buyer, buyer_address, notes, items)
+    VALUES ('delete', old.invoice_no, old.buyer, old.buyer_address, old.notes, old.items);
+    INSERT INTO docs_fts (rowid, buyer, buyer_address, notes, items)
+    VALUES (new.invoice_no, new.buyer, new.buyer_address, new.notes, new.items);
+END;
+"""
+
+# Query prefixes ("item:cable") and the index column they search
+FIELDS = {"buyer": "buyer", "address": "buyer_address", "notes": "notes", "note": "notes", "item": "items", "items": "items"}
+
+# ---------- Queries ----------
+def _terms(text):
+    """Prefix-match FTS5 terms for the words in text (quoted, so punctuation is never query syntax)"""
+    return [f'"{w}"*' for w in re.findall(r"\w+", text or "")]
+
+def match_expression(query="", **fields):
+    """FTS5 MATCH expression for a free-text query plus per-field text (buyer=, items=, ...).
+
+    Words in query may carry a field prefix, e.g. "item:cable buyer:acme".
+    Every word must match (as a prefix); returns "" when there is nothing to match.
+    """
+    parts = []
+    for word in (query or "").split():
+        field, sep, rest = word.partition(":")
+        if sep and field.lower() in FIELDS:
+            fields.setdefault(FIELDS[field.lower()], "")
+            fields[FIELDS[field.lower()]] += " " + rest
+        else:
+            parts.extend(_terms(word))
+    for column, text in fields.items():
+        terms = _terms(text)
+        if terms:
+            parts.append(f"{column} : ({' '.join(terms)})")
+    return " AND ".join(parts)
+
+# ---------- PDF Text ----------
+_MONEY_OR_NUMBER = re.compile(r"^\S?\s?[\d,]+(\.\d{1,2})?%?$")
+_TABLE_LABELS = {"#", "Description", "Qty", "Unit Price", "Total", "Carried forward", "Brought forward"}
+
+def parse_invoice_text(text):
+    """Best-effort fields from the text of an invoice PDF rendered by this app.
+
+    Returns a dict with date, buyer, buyer_address, notes and items (the
+    description lines; numbers and table labels are dropped). Text it cannot
+    place ends up in items, so it is still searchable.
+    """
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    doc = {"date": "", "buyer": "", "buyer_address": "", "notes": "", "items": ""}
+
+    def after(label, start=0):
+        try:
+            return lines.index(label, start) + 1
+        except ValueError:
+            return None
+
+    i = after("Date:")
+    if i is not None and i < len(lines):
+        doc["date"] = lines[i]
+    buyer_at, table_at = after("Buyer:"), after("Description")
+    if buyer_at is not None and table_at is not None and buyer_at < table_at:
+        block = lines[buyer_at:table_at - 2] # up to the "#" header cell
+        if block:
+            doc["buyer"], doc["buyer_address"] = block[0], "\n".join(block[1:])
+    notes_at = after("Notes:")
+    end = len(lines) - 1 if lines and lines[-1].startswith("Thank you") else len(lines)
+    if notes_at is not None:
+        doc["notes"] = "\n".join(lines[notes_at:end])
+    subtotal_at = len(lines) - 1 - lines[::-1].index("Subtotal:") if "Subtotal:" in lines else None
+    body = lines[table_at:subtotal_at] if table_at is not None else lines
+    # Later pages repeat the page header and table header; keep only the description cells
+    doc["items"] = "\n".join(ln for ln in body if ln not in _TABLE_LABELS and not _MONEY_OR_NUMBER.match(ln)
+                             and not ln.endswith(":") and not re.match(r"(INVOICE|Page \d+|\d{4}-\d{2}-\d{2}$)", ln))
+    return doc
+
+def extract_pdf_text(path):
+    """Pool worker: (path, text of every page) for a PDF, or (path, None) if it cannot be read"""
+    import fitz
+    try:
+        with fitz.open(path) as pdf:
+            return path, "\n".join(page.get_text() for page in pdf)
+    except Exception:
+        return path, None
+
+# ---------- Index ----------
+class SearchIndex:
+    """Full-text invoice index. One instance may be shared between threads."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    # --- Writes ---
+
+    @staticmethod
+    def _row(invoice_no, date="", buyer="", buyer_address="", notes="", items=(), source="ledger"):
+        if not isinstance(items, str):
+            items = "\n".join(it["desc"] if isinstance(it, dict) else str(it) for it in items)
+        return (invoice_no, date or "", buyer or "", buyer_address or "", notes or "", items, source)
+
+    def add(self, invoice_no, date="", buyer="", buyer_address="", notes="", items=(), source="ledger"):
+        """Indexes one invoice (replacing an earlier entry); items are item dicts or description strings"""
+        self.add_many([self._row(invoice_no, date, buyer, buyer_address, notes, items, source)])
+
+    def add_many(self, rows):
+        """Indexes many (invoice_no, date, buyer, buyer_address, notes, items_text, source) rows in one transaction"""
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO docs (invoice_no, date, buyer, buyer_address, notes, items, source) VALUES (?,?,?,?,?,?,?)"
+                " ON CONFLICT(invoice_no) DO UPDATE SET date = excluded.date, buyer = excluded.buyer,"
+                " buyer_address = excluded.buyer_address, notes = excluded.notes, items = excluded.items,"
+                " source = excluded.source", rows)
+
+    def clear(self):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM docs")
+
+    def optimize(self):
+        """Merges the index segments (worth doing after a large backfill)"""
+        with self._lock, self.conn:
+            self.conn.execute("INSERT INTO docs_fts (docs_fts) VALUES ('optimize')")
+
+    # --- Reads ---
+
+    def known(self, invoice_nos):
+        """The subset of invoice_nos that is already indexed"""
+        invoice_nos = list(invoice_nos)
+        found = set()
+        with self._lock:
+            for lo in range(0, len(invoice_nos), 500):
+                chunk = invoice_nos[lo:lo + 500]
+                found.update(r[0] for r in self.conn.execute(
+                    f"SELECT invoice_no FROM docs WHERE invoice_no IN ({', '.join('?' * len(chunk))})", chunk))
+        return found
+
+    def search(self, query="", buyer=None, items=None, date_from=None, date_to=None, limit=100):
+        """Invoices matching every word, newest first, as dicts with invoice_no, date, buyer and snippet.
+
+        Dates are YYYY-MM-DD strings and bound the invoice date. With no
+        words, all invoices in the date range are returned.
+        """
+        expr = match_expression(query, **{k: v for k, v in (("buyer", buyer), ("items", items)) if v})
+        clauses, params = [], []
+        if date_from:
+            clauses.append("d.date >= ?")
+            params.append(str(date_from))
+        if date_to:
+            clauses.append("d.date <= ?")
+            params.append(str(date_to))
+        if expr:
+            sql = ("SELECT d.invoice_no, d.date, d.buyer, snippet(docs_fts, -1, '[', ']', '…', 10) FROM docs_fts"
+                   " JOIN docs d ON d.invoice_no = docs_fts.rowid WHERE docs_fts MATCH ?"
+                   + "".join(" AND " + c for c in clauses) + " ORDER BY docs_fts.rowid DESC LIMIT ?")
+            params = [expr] + params
+        elif clauses:
+            sql = (f"SELECT d.invoice_no, d.date, d.buyer, '' FROM docs d WHERE {' AND '.join(clauses)}"
+                   " ORDER BY d.date DESC, d.invoice_no DESC LIMIT ?")
+        else:
+            return []
+        with self._lock:
+            rows = self.conn.execute(sql, params + [int(limit)]).fetchall()
+        return [{"invoice_no": no, "date": date, "buyer": buyer, "snippet": snippet.replace("\n", " · ")}
+                for no, date, buyer, snippet in rows]
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.conn.execute("SELECT source, COUNT(*) FROM docs GROUP BY source").fetchall())
+        return {"entries": sum(counts.values()), "from_ledger": counts.get("ledger", 0), "from_pdf": counts.get("pdf", 0)}
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+@pytest.fixture(scope="session")
+def invoice_app(tmp_path_factory):
+    """invoice_app, imported inside a scratch directory (it creates invoices/ in the working directory)"""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("app"))
+    try:
+        import invoice_app
+        yield invoice_app
+    finally:
+        os.chdir(cwd)
+
+def make_pdf(path, pages=1, text="Invoice"):
+    """Writes a small PDF with one line of text per page"""
+    import fitz
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"{text} page {i + 1}")
+    doc.save(str(path))
+    doc.close()
+    return str(path)
@@ -0,0 +1,150 @@
+import os
+import datetime
+
+import pytest
+
+from archive import InvoiceArchive, file_digest, invoice_filename, invoice_number_from_name
+
+def write(path, data=b"%PDF-1.4 fake"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+def set_mtime(path, day):
+    t = datetime.datetime.combine(day, datetime.time(12)).timestamp()
+    os.utime(path, (t, t))
+
+@pytest.fixture
+def flat(tmp_path):
+    """An old flat invoices folder with three PDFs and a file that is not an invoice"""
+    folder = tmp_path / "flat"
+    for no in (1, 2, 3):
+        write(folder / f"Invoice_{no:04d}.pdf", f"invoice {no}".encode())
+    write(folder / "notes.txt", b"not an invoice")
+    return folder
+
+@pytest.fixture
+def archive(tmp_path):
+    a = InvoiceArchive(str(tmp_path / "archive"), "month")
+    yield a
+    a.close()
+
+def test_file_names():
+    assert invoice_filename(42) == "Invoice_000042.pdf"
+    assert invoice_number_from_name("Invoice_0042.pdf") == 42
+    assert invoice_number_from_name("invoice_1234567.PDF") == 1234567
+    assert invoice_number_from_name("Invoice_42.pdf.tmp") is None
+
+def test_layouts(tmp_path):
+    month = InvoiceArchive(str(tmp_path / "m"), "month")
+    assert month.shard(7, "2026-03-09") == "2026/03"
+    assert month.shard(7, None) == "undated"
+    assert month.path_for(7, "2026-03-09") == os.path.join(str(tmp_path / "m"), "2026", "03", "Invoice_000007.pdf")
+    hashed = InvoiceArchive(str(tmp_path / "h"), "hash")
+    assert len(hashed.shard(7).split("/")) == 2 and hashed.shard(7) == hashed.shard(7, "2026-03-09")
+    with pytest.raises(ValueError):
+        InvoiceArchive(str(tmp_path / "x"), "daily")
+
+def test_add_find_and_refresh(archive):
+    path = write(archive.path_for(5, "2026-01-31"))
+    archive.add(5, path)
+    entry = archive.get(5)
+    assert entry["path"] == path and (entry["size"], entry["sha256"]) == file_digest(path)
+    assert archive.find(5) == path and archive.find(6) is None
+    write(path, b"rewritten and longer")
+    archive.refresh(path)
+    assert archive.get(5)["size"] == len(b"rewritten and longer")
+    assert archive.last_invoice_no() == 5
+    os.remove(path)
+    assert archive.find(5) is None
+
+def test_migrate_moves_files_by_ledger_date(archive, flat):
+    asked = []
+    def dates(nos):
+        asked.extend(nos)
+        return {1: "2025-12-01", 2: "2026-01-15", 3: "2026-01-31"}
+    batches = []
+    stats = archive.migrate(str(flat), dates=dates, on_batch=batches.append)
+    assert stats["moved"] == 3 and stats["conflicts"] == []
+    assert stats["bytes"] == sum(len(f"invoice {n}") for n in (1, 2, 3))
+    assert sorted(asked) == [1, 2, 3]
+    assert os.listdir(flat) == ["notes.txt"] # moved, and the stranger left alone
+    assert archive.find(1).endswith(os.path.join("2025", "12", "Invoice_000001.pdf"))
+    assert archive.find(3).endswith(os.path.join("2026", "01", "Invoice_000003.pdf"))
+    assert sorted(no for batch in batches for no, _ in batch) == [1, 2, 3]
+    assert archive.verify(checksums=True) == []
+
+def test_migrate_copy_leaves_the_originals(archive, flat):
+    stats = archive.migrate(str(flat), dates=lambda nos: {n: "2026-02-01" for n in nos}, copy=True)
+    assert stats["moved"] == 3
+    assert sorted(os.listdir(flat)) == ["Invoice_0001.pdf", "Invoice_0002.pdf", "Invoice_0003.pdf", "notes.txt"]
+    for no in (1, 2, 3):
+        with open(archive.find(no), "rb") as a, open(flat / f"Invoice_{no:04d}.pdf", "rb") as b:
+            assert a.read() == b.read()
+
+def test_migrate_dry_run_changes_nothing(archive, flat):
+    stats = archive.migrate(str(flat), dates=lambda nos: {n: "2026-02-01" for n in nos}, dry_run=True)
+    assert stats["moved"] == 3 and stats["bytes"] > 0
+    assert len(os.listdir(flat)) == 4
+    assert archive.stats()["entries"] == 0
+    assert "2026" not in os.listdir(archive.root) # no shard directories either
+
+def test_undated_invoices_are_filed_by_modification_date(archive, flat):
+    set_mtime(flat / "Invoice_0002.pdf", datetime.date(2024, 7, 4))
+    stats = archive.migrate(str(flat), dates=lambda nos: {1: "2026-01-15"}) # the ledger only knows invoice 1
+    assert stats["moved"] == 3
+    assert archive.find(1).endswith(os.path.join("2026", "01", "Invoice_000001.pdf"))
+    assert archive.find(2).endswith(os.path.join("2024", "07", "Invoice_000002.pdf"))
+
+def test_conflicting_target_is_left_in_place(archive, flat):
+    existing = write(archive.path_for(2, "2026-01-15"), b"already archived")
+    archive.add(2, existing)
+    stats = archive.migrate(str(flat), dates=lambda nos: {n: "2026-01-15" for n in nos})
+    assert stats["moved"] == 2
+    assert stats["conflicts"] == [(2, str(flat / "Invoice_0002.pdf"))]
+    assert sorted(os.listdir(flat)) == ["Invoice_0002.pdf", "notes.txt"]
+    with open(existing, "rb") as f:
+        assert f.read() == b"already archived" # never overwritten
+    assert archive.get(2)["size"] == len(b"already archived")
+
+def test_migrate_again_after_an_interruption(archive, flat):
+    # Simulate a migration that moved invoice 1 but died before recording it
+    os.replace(flat / "Invoice_0001.pdf", write(archive.path_for(1, "2026-01-15")))
+    dates = lambda nos: {n: "2026-01-15" for n in nos}
+    stats = archive.migrate(str(flat), dates=dates)
+    assert stats["moved"] == 2 and stats["conflicts"] == []
+    assert archive.get(1) is None
+    assert archive.rebuild() == 1
+    assert archive.find(1) is not None and archive.verify() == []
+
+def test_rebuild_indexes_new_and_changed_files_only(archive):
+    a = write(archive.path_for(10, "2026-01-01"))
+    b = write(archive.path_for(11, "2026-02-01"))
+    write(os.path.join(archive.root, "2026", "02", "readme.txt"))
+    assert archive.rebuild() == 2
+    assert archive.rebuild() == 0 # nothing changed
+    write(b, b"changed size")
+    moved = os.path.join(archive.root, "undated", "Invoice_000010.pdf")
+    os.makedirs(os.path.dirname(moved))
+    os.replace(a, moved)
+    assert archive.rebuild() == 2
+    assert archive.find(10) == moved
+    assert archive.get(11)["size"] == len(b"changed size")
+
+def test_verify_reports_missing_resized_and_corrupted_files(archive):
+    paths = {no: write(archive.path_for(no, "2026-03-01"), b"original") for no in (1, 2, 3, 4)}
+    for no, path in paths.items():
+        archive.add(no, path)
+    os.remove(paths[1])
+    write(paths[2], b"truncated") # different size
+    write(paths[3], b"ORIGINAL")  # same size, different bytes
+    assert archive.verify() == [(1, "missing"), (2, "size 9, expected 8")]
+    assert archive.verify(checksums=True) == [(1, "missing"), (2, "size 9, expected 8"), (3, "checksum mismatch")]
+    assert archive.verify(invoice_from=3) == []
+
+def test_iter_entries_pages(archive):
+    for no in range(1, 8):
+        archive.add(no, write(archive.path_for(no, "2026-01-01")))
+    assert [e["invoice_no"] for e in archive.iter_entries(page_size=3)] == list(range(1, 8))
+    assert [e["invoice_no"] for e in archive.iter_entries(2, 4, page_size=2)] == [2, 3, 4]
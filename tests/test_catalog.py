@@ -0,0 +1,106 @@
+import csv
+import os
+from decimal import Decimal
+
+import pytest
+
+import catalog
+from catalog import ProductCatalog
+
+GOOD = """SKU,Name,Price
+C-1,Copper Cable 2.5mm,120.50
+C-2,Copper cable 4mm,180
+D-1,Cable Drum,1500
+S-1,  Steel   Spool ,45.5
+X-1,,10
+X-2,Broken price,abc
+X-3,Refund,-5
+"""
+
+def write_csv(path, text):
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+@pytest.fixture
+def products(tmp_path):
+    cat = ProductCatalog(str(tmp_path / "catalog.db"))
+    yield cat
+    cat.close()
+
+def names(rows):
+    return [r["name"] for r in rows]
+
+def triggers(cat):
+    return sorted(r[0] for r in cat.conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'"))
+
+def test_import_and_suggest(products, tmp_path):
+    assert products.import_csv(write_csv(tmp_path / "p.csv", GOOD)) == {"imported": 4, "skipped": 3}
+    assert products.get("S-1") == {"sku": "S-1", "name": "Steel Spool", "unit_price": Decimal("45.50")}
+    assert names(products.suggest("copper")) == ["Copper Cable 2.5mm", "Copper cable 4mm"] # prefix, any case
+    assert names(products.suggest("cable")) == ["Cable Drum", "Copper Cable 2.5mm", "Copper cable 4mm"] # then substring
+    assert names(products.suggest("cable", limit=2)) == ["Cable Drum", "Copper Cable 2.5mm"]
+    assert names(products.suggest("steel  spool")) == ["Steel Spool"]
+    assert names(products.suggest("d-1")) == ["Cable Drum"] # SKU substring
+    assert products.suggest("pp") == [] # too short for a substring match
+    assert products.suggest("  ") == []
+    assert triggers(products) == sorted(catalog.FTS_TRIGGERS)
+
+def test_reimport_updates_by_sku_and_replace_removes_the_rest(products, tmp_path):
+    products.import_csv(write_csv(tmp_path / "p.csv", GOOD))
+    update = write_csv(tmp_path / "u.csv", "code,description,rate\nC-1,Aluminium Cable,99\n")
+    assert products.import_csv(update) == {"imported": 1, "skipped": 0}
+    assert names(products.suggest("alu")) == ["Aluminium Cable"]
+    assert names(products.suggest("2.5mm")) == [] # the trigram index saw the rename
+    assert products.stats()["products"] == 4
+    products.import_csv(update, replace=True)
+    assert products.stats()["products"] == 1
+    assert names(products.suggest("cable")) == ["Aluminium Cable"]
+
+def test_csv_without_a_name_column_is_refused(products, tmp_path):
+    with pytest.raises(ValueError):
+        products.import_csv(write_csv(tmp_path / "p.csv", "sku,price\nA,1\n"))
+
+@pytest.fixture
+def small_field_limit():
+    old = csv.field_size_limit(40)
+    yield
+    csv.field_size_limit(old)
+
+@pytest.mark.parametrize("replace", [False, True])
+def test_failed_import_leaves_catalog_and_triggers_intact(products, tmp_path, monkeypatch, small_field_limit, replace):
+    products.import_csv(write_csv(tmp_path / "p.csv", GOOD))
+    before = products.conn.execute("SELECT * FROM products ORDER BY id").fetchall()
+    # Rows before the oversized field are already written (batches of 2) when the reader fails
+    monkeypatch.setattr(catalog, "IMPORT_BATCH", 2)
+    bad = write_csv(tmp_path / "bad.csv", "SKU,Name,Price\nN-1,New Cable,1\nN-2,New Spool,2\nN-3,New Drum,3\n"
+                                          f"N-4,{'x' * 100},4\n")
+    with pytest.raises(csv.Error):
+        products.import_csv(bad, replace=replace)
+
+    assert triggers(products) == sorted(catalog.FTS_TRIGGERS)
+    assert products.conn.execute("SELECT * FROM products ORDER BY id").fetchall() == before
+    assert not products.conn.in_transaction
+    assert names(products.suggest("copper")) == ["Copper Cable 2.5mm", "Copper cable 4mm"]
+    assert names(products.suggest("drum")) == ["Cable Drum"]
+    assert products.suggest("new") == []
+    meta = products.conn.execute("SELECT key FROM meta").fetchall()
+    assert [os.path.basename(k) for (k,) in meta] == ["p.csv"]
+
+    # The restored triggers keep the substring index in step with later writes
+    with products.conn:
+        products._upsert([("N-9", "Brass Fitting", "brass fitting", 700)])
+        products.conn.execute("DELETE FROM products WHERE sku = 'D-1'")
+    assert names(products.suggest("fitting")) == ["Brass Fitting"]
+    assert products.suggest("drum") == []
+
+def test_sync_csv_only_reimports_changed_files(products, tmp_path):
+    path = write_csv(tmp_path / "p.csv", GOOD)
+    assert products.sync_csv(path) == {"imported": 4, "skipped": 3}
+    assert products.sync_csv(path) is None
+    write_csv(tmp_path / "p.csv", "sku,name,price\nZ-1,Zinc Plate,5\n")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10**9))
+    assert products.sync_csv(path) == {"imported": 1, "skipped": 0}
+    assert products.stats()["products"] == 1
+    assert products.sync_csv(str(tmp_path / "missing.csv")) is None
+    products.clear()
+    assert products.stats()["products"] == 0 and products.suggest("zinc") == []
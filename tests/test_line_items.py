@@ -0,0 +1,79 @@
+import random
+from decimal import Decimal
+
+import pytest
+
+from line_items import LineItems
+
+def dicts(n, seed=0):
+    rng = random.Random(seed)
+    return [{"desc": f"Item {i}", "qty": rng.randint(1, 50), "unit_price": Decimal(rng.randrange(0, 10**7)).scaleb(-3)}
+            for i in range(n)]
+
+def recomputed(items):
+    """Subtotal in paise summed from scratch, to check the running total against"""
+    return sum(q * p for q, p in zip(items.qtys, items.prices))
+
+def test_append_extend_and_reading():
+    items = LineItems(dicts(3))
+    items.append("Cable", 2, "19.995") # prices are rounded half up to the paisa when stored
+    assert len(items) == 4 and items
+    assert items[3] == {"desc": "Cable", "qty": 2, "unit_price": Decimal("20.00")}
+    assert list(items)[-1] == items[-1]
+    assert items.line_total_paise(3) == 4000
+    assert items.line_totals_paise()[-1] == 4000
+    assert items.subtotal_paise() == recomputed(items)
+    assert not LineItems()
+
+def test_running_subtotal_through_every_change():
+    items = LineItems()
+    rng = random.Random(1)
+    for step in range(500):
+        op = rng.random()
+        if op < 0.5 or not items:
+            items.append(f"Item {step}", rng.randint(1, 9), Decimal(rng.randrange(0, 10**6)).scaleb(-2))
+        elif op < 0.8:
+            items.update(rng.randrange(len(items)), "Changed", rng.randint(1, 9), Decimal(rng.randrange(0, 10**6)).scaleb(-2))
+        else:
+            del items[rng.randrange(len(items))]
+        assert items.subtotal_paise() == recomputed(items)
+    items.clear()
+    assert len(items) == 0 and items.subtotal_paise() == 0
+
+def test_slices_and_copies_have_their_own_subtotal():
+    items = LineItems(dicts(10))
+    part = items[2:5]
+    assert isinstance(part, LineItems)
+    assert list(part) == list(items)[2:5]
+    assert part.subtotal_paise() == recomputed(part)
+
+    copy = items.copy()
+    copy.append("Extra", 1, 100)
+    del copy[0]
+    assert items.subtotal_paise() == recomputed(items) != copy.subtotal_paise()
+    assert copy.subtotal_paise() == recomputed(copy)
+    assert len(items) == 10 and len(copy) == 10
+
+def test_from_columns():
+    items = LineItems.from_columns(["a", "b"], [2, 3], [150, 1000])
+    assert items.subtotal_paise() == 3300
+    with pytest.raises(ValueError):
+        LineItems.from_columns(["a"], [1, 2], [1])
+
+def test_failed_update_leaves_items_unchanged():
+    items = LineItems(dicts(3))
+    before, subtotal = list(items), items.subtotal_paise()
+    with pytest.raises(OverflowError):
+        items.update(1, "Huge", 1, Decimal(10) ** 20)
+    with pytest.raises(OverflowError):
+        items.append("Huge", 10**19, 1)
+    assert list(items) == before and items.subtotal_paise() == subtotal
+
+@pytest.mark.parametrize("n, tax_percent", [(0, 18.0), (1, 18.0), (7, 5.0), (200, 12.5), (1000, 28.0), (50, 0)])
+def test_totals_match_compute_totals(invoice_app, n, tax_percent):
+    raw = dicts(n, seed=n)
+    items = LineItems(raw)
+    # compute_totals rounds every line total; LineItems works from prices rounded when stored, which is the same
+    assert items.totals(tax_percent) == invoice_app.compute_totals(raw, tax_percent)
+    assert invoice_app.compute_totals(items, tax_percent) == invoice_app.compute_totals(raw, tax_percent)
+    assert items.subtotal() == sum((invoice_app.line_total(it) for it in raw), Decimal(0))
@@ -0,0 +1,114 @@
+from decimal import Decimal
+
+import pytest
+
+from money import MoneyFormat
+
+INDIAN = MoneyFormat("₹", "indian")
+WESTERN = MoneyFormat("₹", "western")
+
+@pytest.mark.parametrize("amount, indian, western", [
+    (Decimal("0"), "₹0.00", "₹0.00"),
+    (Decimal("0.05"), "₹0.05", "₹0.05"),
+    (Decimal("999"), "₹999.00", "₹999.00"),
+    (Decimal("1000"), "₹1,000.00", "₹1,000.00"),
+    (Decimal("99999.99"), "₹99,999.99", "₹99,999.99"),
+    (Decimal("100000"), "₹1,00,000.00", "₹100,000.00"),
+    (Decimal("1234567.89"), "₹12,34,567.89", "₹1,234,567.89"),
+    (Decimal("9999999.99"), "₹99,99,999.99", "₹9,999,999.99"),
+    (Decimal("10000000"), "₹1,00,00,000.00", "₹10,000,000.00"),          # 1 crore
+    (Decimal("123456789012.34"), "₹1,23,45,67,89,012.34", "₹123,456,789,012.34"),
+    (Decimal("-0.05"), "-₹0.05", "-₹0.05"),
+    (Decimal("-1234567.89"), "-₹12,34,567.89", "-₹1,234,567.89"),
+    (Decimal("-100000000"), "-₹10,00,00,000.00", "-₹100,000,000.00"),
+])
+def test_grouping(amount, indian, western):
+    assert INDIAN.format(amount) == indian
+    assert WESTERN.format(amount) == western
+    paise = int(amount * 100)
+    assert INDIAN.format_paise(paise) == indian
+    assert WESTERN.format_paise(paise) == western
+
+@pytest.mark.parametrize("amount, expected", [
+    (Decimal("99999.995"), "₹1,00,000.00"),
+    (Decimal("2.675"), "₹2.68"),
+    (Decimal("2.665"), "₹2.67"),       # half up, not half even
+    (Decimal("0.004"), "₹0.00"),
+    (Decimal("-0.004"), "₹0.00"),      # never "-₹0.00"
+    (Decimal("-0.00"), "₹0.00"),
+    (Decimal("-2.675"), "-₹2.68"),     # half away from zero
+    (Decimal("12.5"), "₹12.50"),
+    (Decimal("1.999999"), "₹2.00"),
+])
+def test_rounds_half_up_to_the_paisa(amount, expected):
+    assert INDIAN.format(amount) == expected
+
+@pytest.mark.parametrize("amount, expected", [
+    (2.675, "₹2.68"),                  # the float's repr, not its binary value (2.67499...)
+    (0.1 + 0.2, "₹0.30"),
+    (1234567.8, "₹12,34,567.80"),
+    (1e7, "₹1,00,00,000.00"),
+    (1e20, "₹10,00,00,00,00,00,00,00,00,000.00"),
+    (1.5e-3, "₹0.00"),
+    (-1234.5, "-₹1,234.50"),
+    (Decimal("1E+5"), "₹1,00,000.00"),
+    (Decimal("1.2345E+3"), "₹1,234.50"),
+    (Decimal("5E-3"), "₹0.01"),
+    (7, "₹7.00"),
+    (-100000, "-₹1,00,000.00"),
+    ("1,00,000.5", "₹1,00,000.50"),
+    ("₹ 12,34,567.89", "₹12,34,567.89"),
+    ("-₹3", "-₹3.00"),
+])
+def test_float_int_exponent_and_string_inputs(amount, expected):
+    assert INDIAN.format(amount) == expected
+
+def test_batch_apis_match_single_calls():
+    amounts = [Decimal("0.05"), Decimal("1234567.89"), 2.675, 7, Decimal("-100000"), "12.5"]
+    assert INDIAN.format_many(amounts) == [INDIAN.format(a) for a in amounts]
+    paise = [5, 123456789, -10000000, 0]
+    assert WESTERN.format_paise_many(paise) == [WESTERN.format_paise(p) for p in paise]
+
+@pytest.mark.parametrize("fmt", [INDIAN, WESTERN])
+@pytest.mark.parametrize("paise", [0, 5, 99, 100, 123456789, 10**9, 10**15 + 7, -5, -123456789])
+def test_parse_round_trips(fmt, paise):
+    text = fmt.format_paise(paise)
+    assert fmt.parse_paise(text) == paise
+    assert fmt.parse(text) == Decimal(paise).scaleb(-2)
+    # Either grouping parses the other's output
+    other = WESTERN if fmt is INDIAN else INDIAN
+    assert other.parse_paise(text) == paise
+
+@pytest.mark.parametrize("text, paise", [
+    ("12,34,567.89", 123456789),
+    ("  ₹ 1,000 ", 100000),
+    ("-0.005", -1),
+    ("2.675", 268),
+    ("1e3", 100000),
+])
+def test_parse_paise(text, paise):
+    assert INDIAN.parse_paise(text) == paise
+
+def test_parse_many():
+    assert INDIAN.parse_many(["₹1.50", "-₹2", "0"]) == [Decimal("1.50"), Decimal("-2.00"), Decimal("0.00")]
+
+@pytest.mark.parametrize("bad", ["abc", "", "₹", "nan", "NaN", "inf", "-Infinity", "1e999999", "1.2.3", "12a"])
+def test_parse_rejects_non_amounts(bad):
+    with pytest.raises(ValueError):
+        INDIAN.parse_paise(bad)
+    with pytest.raises(ValueError):
+        INDIAN.parse(bad)
+    with pytest.raises(ValueError):
+        INDIAN.format(bad)
+
+@pytest.mark.parametrize("bad", [float("nan"), float("inf"), Decimal("NaN"), Decimal("-Infinity")])
+def test_format_rejects_non_finite_numbers(bad):
+    with pytest.raises(ValueError):
+        INDIAN.format(bad)
+
+def test_other_symbol_and_unknown_grouping():
+    dollars = MoneyFormat("$", "western")
+    assert dollars.format(Decimal("-1234.5")) == "-$1,234.50"
+    assert dollars.parse_paise("-$1,234.50") == -123450
+    with pytest.raises(ValueError):
+        MoneyFormat("₹", "chinese")
@@ -0,0 +1,171 @@
+import os
+import sys
+
+import pytest
+
+from conftest import make_pdf
+from print_queue import CommandSpooler, PrintQueue
+
+# Stand-in for lp: appends the submitted file's name and page count to a log, or fails with FAKE_LP_FAIL set
+FAKE_LP = """
+import os, sys
+import fitz
+if os.environ.get("FAKE_LP_FAIL"):
+    sys.exit("printer on fire")
+with fitz.open(sys.argv[1]) as pdf, open(sys.argv[2], "a") as log:
+    log.write(f"{os.path.basename(sys.argv[1])} {len(pdf)}\\n")
+"""
+
+@pytest.fixture
+def fake_lp(tmp_path):
+    script = tmp_path / "fake_lp.py"
+    script.write_text(FAKE_LP)
+    log = tmp_path / "submissions.log"
+    spooler = CommandSpooler([sys.executable, str(script), "{file}", str(log)], printer_command=None)
+    spooler.log = log
+    return spooler
+
+def submissions(spooler):
+    return spooler.log.read_text().splitlines() if spooler.log.exists() else []
+
+def make_queue(tmp_path, spooler, **kw):
+    kw.setdefault("backoff_base", 0.01)
+    kw.setdefault("backoff_max", 0.05)
+    return PrintQueue(str(tmp_path / "queue.db"), spooler=spooler, **kw)
+
+def test_jobs_are_merged_into_one_submission(tmp_path, fake_lp):
+    pdfs = [make_pdf(tmp_path / f"Invoice_{i}.pdf", pages=i) for i in (1, 2, 3)]
+    with make_queue(tmp_path, fake_lp) as q:
+        q.add_many(pdfs)
+        counts = q.drain()
+    assert counts["done"] == 3 and counts["pending"] == counts["failed"] == 0
+    [line] = submissions(fake_lp)
+    assert line.split()[1] == "6" # one merged PDF with every page
+    assert not os.listdir(tmp_path / "spool") # the merged file is removed afterwards
+
+def test_batch_size_splits_submissions(tmp_path, fake_lp):
+    pdfs = [make_pdf(tmp_path / f"Invoice_{i}.pdf") for i in range(5)]
+    with make_queue(tmp_path, fake_lp, batch_size=2) as q:
+        q.add_many(pdfs)
+        assert q.drain()["done"] == 5
+    assert [int(line.split()[1]) for line in submissions(fake_lp)] == [2, 2, 1]
+
+def test_printers_are_never_mixed_in_one_submission(tmp_path):
+    calls = []
+    with make_queue(tmp_path, lambda path, printer: calls.append(printer)) as q:
+        q.add(make_pdf(tmp_path / "a.pdf"), printer="Front")
+        q.add(make_pdf(tmp_path / "b.pdf"))
+        q.add(make_pdf(tmp_path / "c.pdf"), printer="Front")
+        q.drain()
+    assert sorted(calls, key=str) == ["Front", None]
+
+def test_failed_submission_is_retried_with_backoff(tmp_path):
+    calls = []
+    def flaky(path, printer):
+        calls.append(path)
+        if len(calls) < 3:
+            raise RuntimeError("paper jam")
+    with make_queue(tmp_path, flaky, backoff_base=0.02) as q:
+        job = q.add(make_pdf(tmp_path / "a.pdf"))
+        assert q.process_due() == 1
+        [row] = q.jobs()
+        assert row["status"] == "pending" and row["attempts"] == 1 and row["last_error"] == "paper jam"
+        assert 0 < q.seconds_until_due() <= 0.02
+        assert q.process_due() == 0 # not due yet
+        counts = q.drain()
+        [row] = q.jobs()
+    assert counts["done"] == 1 and len(calls) == 3
+    assert row["id"] == job and row["attempts"] == 3 and row["last_error"] is None
+
+def test_backoff_doubles_up_to_the_maximum(tmp_path):
+    def failing(path, printer):
+        raise RuntimeError("offline")
+    with make_queue(tmp_path, failing, backoff_base=10, backoff_max=25, max_attempts=10) as q:
+        q.add(make_pdf(tmp_path / "a.pdf"))
+        delays = []
+        for _ in range(3):
+            q.conn.execute("UPDATE print_jobs SET next_attempt = 0") # make it due now
+            q.process_due()
+            delays.append(round(q.seconds_until_due()))
+    assert delays == [10, 20, 25]
+
+def test_command_failure_fails_the_job_after_max_attempts(tmp_path, fake_lp, monkeypatch):
+    monkeypatch.setenv("FAKE_LP_FAIL", "1")
+    with make_queue(tmp_path, fake_lp, max_attempts=2) as q:
+        q.add(make_pdf(tmp_path / "a.pdf"))
+        counts = q.drain()
+        [row] = q.jobs()
+    assert counts["failed"] == 1
+    assert row["attempts"] == 2 and "printer on fire" in row["last_error"]
+    assert submissions(fake_lp) == []
+
+def test_missing_pdf_fails_at_once_without_a_submission(tmp_path, fake_lp):
+    present = make_pdf(tmp_path / "present.pdf")
+    with make_queue(tmp_path, fake_lp) as q:
+        gone = q.add(str(tmp_path / "gone.pdf"))
+        q.add(present)
+        counts = q.drain()
+        rows = {r["id"]: r for r in q.jobs()}
+    assert counts == {"pending": 0, "printing": 0, "done": 1, "failed": 1}
+    assert rows[gone]["status"] == "failed" and rows[gone]["attempts"] == 1
+    assert rows[gone]["last_error"] == "PDF not found"
+    assert submissions(fake_lp) == ["present.pdf 1"] # only the file that exists, on its own
+
+def test_corrupt_pdf_is_left_out_of_the_batch(tmp_path, fake_lp):
+    good = [make_pdf(tmp_path / f"Invoice_{i}.pdf", pages=i) for i in (1, 2)]
+    corrupt = tmp_path / "corrupt.pdf"
+    corrupt.write_bytes(b"%PDF-1.4 this is not really a PDF")
+    with make_queue(tmp_path, fake_lp) as q:
+        [first] = q.add_many(good[:1])
+        bad = q.add(str(corrupt))
+        q.add(good[1])
+        assert q.process_due() == 3
+        rows = {r["id"]: r for r in q.jobs()}
+        counts = q.counts()
+    assert counts == {"pending": 0, "printing": 0, "done": 2, "failed": 1}
+    assert rows[bad]["attempts"] == 1 and rows[bad]["last_error"] == "PDF cannot be read"
+    assert rows[first]["status"] == "done"
+    [line] = submissions(fake_lp)
+    assert line.split()[1] == "3" # the two good invoices, in one submission
+
+def test_batch_of_only_corrupt_pdfs_is_not_submitted(tmp_path):
+    calls = []
+    for name in ("a.pdf", "b.pdf"):
+        (tmp_path / name).write_bytes(b"garbage")
+    with make_queue(tmp_path, lambda path, printer: calls.append(path)) as q:
+        q.add_many([str(tmp_path / "a.pdf"), str(tmp_path / "b.pdf")])
+        assert q.drain()["failed"] == 2
+    assert calls == []
+
+def test_interrupted_submission_is_requeued_on_restart(tmp_path, fake_lp):
+    pdf = make_pdf(tmp_path / "a.pdf")
+    q = make_queue(tmp_path, fake_lp)
+    q.add(pdf)
+    assert [j["pdf_path"] for j in q._claim_batch(now=1e12)] == [os.path.abspath(pdf)]
+    assert q.counts()["printing"] == 1
+    q.close() # "crash" before the submission finished
+
+    with make_queue(tmp_path, fake_lp) as q:
+        assert q.counts()["pending"] == 1
+        assert q.drain()["done"] == 1
+    assert submissions(fake_lp) == ["a.pdf 1"]
+
+def test_retry_failed_resets_attempts(tmp_path):
+    with make_queue(tmp_path, lambda path, printer: None) as q:
+        job = q.add(str(tmp_path / "late.pdf"))
+        assert q.drain()["failed"] == 1
+        make_pdf(tmp_path / "late.pdf")
+        assert q.retry_failed() == 1
+        assert q.drain()["done"] == 1
+        [row] = q.jobs()
+    assert row["id"] == job and row["attempts"] == 1
+
+def test_background_thread_drains_new_jobs(tmp_path, fake_lp):
+    with make_queue(tmp_path, fake_lp, linger=0.01) as q:
+        q.start()
+        q.add(make_pdf(tmp_path / "a.pdf"))
+        for _ in range(500):
+            if q.counts()["done"] == 1:
+                break
+            q._stop.wait(0.01)
+        assert q.counts()["done"] == 1
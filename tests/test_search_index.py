@@ -0,0 +1,84 @@
+import pytest
+
+from line_items import LineItems
+from search_index import SearchIndex, extract_pdf_text, match_expression, parse_invoice_text
+
+@pytest.mark.parametrize("query, fields, expected", [
+    ("", {}, ""),
+    ("   ", {"buyer": ""}, ""),
+    ("cable", {}, '"cable"*'),
+    ("Copper  cable", {}, '"Copper"* AND "cable"*'),
+    ("item:cable", {}, 'items : ("cable"*)'),
+    ("item:cable buyer:acme", {}, 'items : ("cable"*) AND buyer : ("acme"*)'),
+    ("Items:cable items:drum", {}, 'items : ("cable"* "drum"*)'),
+    ("note:urgent address:pune", {}, 'notes : ("urgent"*) AND buyer_address : ("pune"*)'),
+    ("rush item:cable", {"buyer": "Acme Ltd"}, '"rush"* AND buyer : ("Acme"* "Ltd"*) AND items : ("cable"*)'),
+    ("foo:bar", {}, '"foo"* AND "bar"*'),                 # not a field: both words are searched
+    ("item:", {}, ""),
+    ('"NOT" OR a-b (x*)', {}, '"NOT"* AND "OR"* AND "a"* AND "b"* AND "x"*'), # punctuation is never query syntax
+    ("café №5", {}, '"café"* AND "5"*'),
+])
+def test_match_expression(query, fields, expected):
+    assert match_expression(query, **fields) == expected
+
+@pytest.mark.parametrize("text, expected", [
+    ("INVOICE\nDate:\n2026-01-05\nBuyer:\nAcme Ltd\n12 Mill Road\nPune\n#\nDescription\nQty\nUnit Price\nTotal\n"
+     "1\nCopper cable\n2\n₹100.00\n₹200.00\nSubtotal:\n₹200.00\nNotes:\nDeliver by Friday\nThank you for your business!",
+     {"date": "2026-01-05", "buyer": "Acme Ltd", "buyer_address": "12 Mill Road\nPune", "notes": "Deliver by Friday",
+      "items": "Copper cable"}),
+    # Later pages repeat the page header, the table header and carried totals
+    ("#\nDescription\nQty\nUnit Price\nTotal\n1\nDrum\n3\n1,00,000.50\nCarried forward\n₹1,00,000.50\nINVOICE\nPage 2\n"
+     "2026-01-05\n#\nDescription\nQty\nUnit Price\nTotal\nBrought forward\n2\nSpool 50%\n1\n18%",
+     {"date": "", "buyer": "", "buyer_address": "", "notes": "", "items": "Drum\nSpool 50%"}),
+    ("", {"date": "", "buyer": "", "buyer_address": "", "notes": "", "items": ""}),
+    ("scanned letter\nwith no labels", {"date": "", "buyer": "", "buyer_address": "", "notes": "",
+                                        "items": "scanned letter\nwith no labels"}),
+])
+def test_parse_invoice_text(text, expected):
+    assert parse_invoice_text(text) == expected
+
+def test_parse_text_of_a_rendered_multi_page_invoice(invoice_app, tmp_path):
+    items = LineItems()
+    for i in range(120):
+        items.append(f"Widget model {i:03d}", i % 7 + 1, 10 + i)
+    subtotal, tax, total = items.totals(18.0)
+    for engine in ("platypus", "canvas", "large"):
+        pdf = str(tmp_path / f"{engine}.pdf")
+        pages = []
+        invoice_app.generate_pdf(7, "2026-02-14", invoice_app.DEFAULT_SELLER, "Acme Traders\n12 Mill Road\nPune 411001",
+                                 items, subtotal, 18.0, tax, total, "Deliver to gate 3\nCall before noon",
+                                 pdf_path=pdf, engine=engine, cache=False, on_page=pages.append)
+        assert len(pages) > 2, engine
+        path, text = extract_pdf_text(pdf)
+        doc = parse_invoice_text(text)
+        assert path == pdf
+        assert doc["date"] == "2026-02-14", engine
+        assert doc["buyer"] == "Acme Traders", engine
+        assert doc["buyer_address"] == "12 Mill Road\nPune 411001", engine
+        assert doc["notes"] == "Deliver to gate 3\nCall before noon", engine
+        assert doc["items"].splitlines() == [f"Widget model {i:03d}" for i in range(120)], engine
+
+def test_extract_pdf_text_of_an_unreadable_file(tmp_path):
+    bad = tmp_path / "bad.pdf"
+    bad.write_bytes(b"not a pdf")
+    assert extract_pdf_text(str(bad)) == (str(bad), None)
+
+def test_index_and_search(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.db"))
+    index.add(1, "2026-01-05", "Acme Ltd", "Pune", "", [{"desc": "Copper cable"}])
+    index.add(2, "2026-02-10", "Bharat Stores", "Mumbai", "urgent", ["Cable drum", "Spool"])
+    index.add(3, "2026-03-01", "Acme Ltd", "Nagpur", "", ["Spool"], source="pdf")
+    try:
+        assert [r["invoice_no"] for r in index.search("cab")] == [2, 1] # newest first
+        assert [r["invoice_no"] for r in index.search("acme spool")] == [3]
+        assert [r["invoice_no"] for r in index.search("item:spool", buyer="bharat")] == [2]
+        assert [r["invoice_no"] for r in index.search("acme", date_to="2026-02-01")] == [1]
+        assert [r["invoice_no"] for r in index.search(date_from="2026-02-01")] == [3, 2]
+        assert index.search() == []
+        assert "[Copper]" in index.search("copper")[0]["snippet"]
+        index.add(1, "2026-01-05", "Acme Ltd", "Pune", "", ["Fuse"]) # replaces the earlier entry
+        assert index.search("copper") == []
+        assert index.known([1, 2, 9]) == {1, 2}
+        assert index.stats() == {"entries": 3, "from_ledger": 2, "from_pdf": 1}
+    finally:
+        index.close()
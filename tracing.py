@@ -0,0 +1,212 @@
+"""
+Tracing
+Timing spans around the hot paths: rendering, preview, printing, ledger writes
+and invoice numbering. Durations are collected into per-span histograms in the
+running process and can be exported as JSON, or as a Chrome trace for
+chrome://tracing / Perfetto. Tracing is off by default; a span taken while it
+is off costs one global check.
+
+    with tracing.span("render.build"):
+        doc.build(story)
+"""
+
+import os
+import json
+import math
+import time
+import threading
+from collections import deque
+
+BUCKETS_PER_OCTAVE = 4 # histogram buckets are 2**(1/4) (~19%) apart
+MAX_EVENTS = 1_000_000 # Chrome trace events kept; the oldest are dropped beyond this
+
+_enabled = False
+_record_events = False
+_lock = threading.Lock()
+_histograms = {}
+_events = deque(maxlen=MAX_EVENTS)
+
+# ---------- Histograms ----------
+class Histogram:
+    """Log-scaled histogram of durations in seconds; mergeable across processes"""
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.buckets = {} # bucket index -> count; bucket b holds durations up to 2**((b+1)/BUCKETS_PER_OCTAVE)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        b = math.floor(math.log2(max(seconds, 1e-9)) * BUCKETS_PER_OCTAVE)
+        self.buckets[b] = self.buckets.get(b, 0) + 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        for b, n in other.buckets.items():
+            self.buckets[b] = self.buckets.get(b, 0) + n
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th fraction of samples (0 if empty)"""
+        target, seen = p * self.count, 0
+        for b in sorted(self.buckets):
+            seen += self.buckets[b]
+            if seen >= target:
+                return min(self.max, 2 ** ((b + 1) / BUCKETS_PER_OCTAVE))
+        return self.max
+
+    def to_dict(self):
+        ms = lambda s: round(s * 1000, 4)
+        return {"count": self.count, "total_ms": ms(self.total), "mean_ms": ms(self.total / self.count) if self.count else 0.0,
+                "min_ms": ms(self.min) if self.count else 0.0, "max_ms": ms(self.max),
+                "p50_ms": ms(self.percentile(0.5)), "p95_ms": ms(self.percentile(0.95)), "p99_ms": ms(self.percentile(0.99)),
+                "buckets": {str(b): n for b, n in sorted(self.buckets.items())}}
+
+    @classmethod
+    def from_dict(cls, d):
+        h = cls()
+        h.count = d["count"]
+        h.total = d["total_ms"] / 1000
+        h.min = d["min_ms"] / 1000 if h.count else math.inf
+        h.max = d["max_ms"] / 1000
+        h.buckets = {int(b): n for b, n in d["buckets"].items()}
+        return h
+
+# ---------- Spans ----------
+class _Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, self.start, time.perf_counter() - self.start, self.args)
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(name, **args):
+    """Context manager timing the enclosed block as `name` (args only go into the Chrome trace)"""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+def record(name, start, duration, args=None):
+    """Adds one timing (perf_counter start, duration in seconds)"""
+    with _lock:
+        h = _histograms.get(name)
+        if h is None:
+            h = _histograms[name] = Histogram()
+        h.add(duration)
+        if _record_events:
+            _events.append((name, start, duration, os.getpid(), threading.get_ident(), args or None))
+
+# ---------- Control ----------
+def enable(events=False):
+    """Turns tracing on; with events, every span is also kept for the Chrome trace export"""
+    global _enabled, _record_events
+    _record_events = _record_events or events
+    _enabled = True
+
+def disable():
+    global _enabled, _record_events
+    _enabled = _record_events = False
+
+def enabled():
+    return _enabled
+
+def events_enabled():
+    return _record_events
+
+def init_worker(on, events=False):
+    """Pool initializer: starts a worker with an empty trace (forked workers inherit the parent's)"""
+    disable()
+    reset()
+    if on:
+        enable(events)
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _events.clear()
+
+def take():
+    """Returns everything recorded so far and clears it (pool workers send this back to the parent)"""
+    with _lock:
+        snapshot = {"spans": {name: h.to_dict() for name, h in _histograms.items()}, "events": list(_events)}
+        _histograms.clear()
+        _events.clear()
+    return snapshot
+
+def merge(snapshot):
+    """Adds a take() result from another process"""
+    if not snapshot:
+        return
+    with _lock:
+        for name, d in snapshot["spans"].items():
+            h = _histograms.get(name)
+            if h is None:
+                h = _histograms[name] = Histogram()
+            h.merge(Histogram.from_dict(d))
+        if _record_events:
+            _events.extend(snapshot["events"])
+
+# ---------- Export ----------
+def stats(buckets=True):
+    """Per-span summaries (counts and milliseconds), by span name"""
+    with _lock:
+        out = {name: h.to_dict() for name, h in sorted(_histograms.items())}
+    if not buckets:
+        for s in out.values():
+            del s["buckets"]
+    return out
+
+def summary(title="Per-phase timings"):
+    """Text table of the spans, slowest total first"""
+    rows = sorted(stats().items(), key=lambda kv: -kv[1]["total_ms"])
+    if not rows:
+        return f"{title}: nothing recorded"
+    width = max(len(name) for name, _ in rows)
+    lines = [title, f"  {'phase':<{width}} {'count':>8} {'total ms':>11} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+    for name, s in rows:
+        lines.append(f"  {name:<{width}} {s['count']:>8} {s['total_ms']:>11.1f} {s['mean_ms']:>9.2f} "
+                     f"{s['p50_ms']:>9.2f} {s['p95_ms']:>9.2f} {s['max_ms']:>9.2f}")
+    return "\n".join(lines)
+
+def export_json(path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"pid": os.getpid(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "spans": stats()}, f, indent=2)
+    return path
+
+def export_chrome_trace(path):
+    """Writes the recorded spans in the Chrome trace event format (needs enable(events=True))"""
+    with _lock:
+        events = list(_events)
+    trace = [{"name": name, "cat": name.split(".")[0], "ph": "X", "ts": round(start * 1e6, 3), "dur": round(duration * 1e6, 3),
+              "pid": pid, "tid": tid, **({"args": args} if args else {})}
+             for name, start, duration, pid, tid, args in events]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f, default=str)
+    return path